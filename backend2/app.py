@@ -12,7 +12,7 @@ from functools import wraps
 from datetime import datetime
 from dotenv import load_dotenv
 import socket
-from flask import Flask, request, jsonify, current_app
+from flask import Flask, Response, request, jsonify, current_app
 from flask_cors import CORS
 from flask_restful import Api, Resource
 from flasgger import Swagger, swag_from
@@ -23,7 +23,24 @@ from decimal import Decimal
 
 from services.product_service import (
     get_all_products_service,
+    get_products_page_service,
+    get_products_total_service,
+    stream_all_products_service,
+    search_products_service,
+    suggest_products_service,
+    get_product_facets_service,
+    get_products_by_ids_service,
+    parse_product_ids,
+    get_products_by_serials_service,
+    parse_serials,
+    get_catalog_bootstrap_service,
+    warm_product_indexes,
+    DEFAULT_PRODUCT_SORT,
+    parse_product_fields,
+    parse_product_filters,
     get_product_by_id_service,
+    snapshot_product,
+    snapshot_products_page,
     create_product_service,
     update_product_service,
     delete_product_service,
@@ -31,9 +48,26 @@ from services.product_service import (
     get_categories_service,
     get_subcategories_by_category_service,
     get_db_connection,
+    forget_product,
+    product_written,
     create_category_service,
     create_subcategory_service  # Import new service
 )
+from services.db_pool import get_pool_stats
+from services.storage import get_storage_stats
+from services.search import get_search_stats
+from services.autocomplete import get_suggest_stats
+from services.serial_cache import get_serial_cache_stats
+from services.product_cache import get_product_cache_stats
+from services.taxonomy import get_taxonomy_stats
+from services.catalog_snapshot import get_catalog_snapshot_stats
+from services.invalidation_bus import get_invalidation_stats
+from services.single_flight import get_single_flight_stats
+from services.replicas import get_replica_stats
+from services.unit_of_work import init_unit_of_work
+from services.query_metrics import init_query_metrics, query_stats
+from services.deadline import DEADLINE_HEADER, init_deadlines, parse_endpoint_deadlines
+from services.retry import commit, retry_metrics, rollback
 
 load_dotenv()
 
@@ -48,12 +82,118 @@ app.config['SECRET_KEY'] = os.environ.get(
 )
 
 
+# Motor de almacenamiento: 'mysql' o 'sqlite' (embebido, sin servidor)
+app.config['STORAGE_ENGINE'] = os.environ.get('STORAGE_ENGINE', 'mysql')
+app.config['SQLITE_PATH'] = os.environ.get('SQLITE_PATH', 'catalog.db')
+app.config['SQLITE_BUSY_TIMEOUT'] = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+
 # Configuración MySQL
 app.config['MYSQL_HOST'] = os.environ.get('MYSQL_HOST')
 app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER')
 app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD')
 app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB')
-app.config['MYSQL_PORT'] = int(os.environ.get('MYSQL_PORT'))
+app.config['MYSQL_PORT'] = int(os.environ.get('MYSQL_PORT', 3306))
+
+# Pool de conexiones MySQL
+app.config['MYSQL_POOL_MIN_SIZE'] = int(os.environ.get('MYSQL_POOL_MIN_SIZE', 1))
+app.config['MYSQL_POOL_MAX_SIZE'] = int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10))
+app.config['MYSQL_POOL_TIMEOUT'] = float(os.environ.get('MYSQL_POOL_TIMEOUT', 5))
+app.config['MYSQL_POOL_RECYCLE'] = int(os.environ.get('MYSQL_POOL_RECYCLE', 3600))
+app.config['MYSQL_POOL_PRE_PING'] = os.environ.get('MYSQL_POOL_PRE_PING', 'true').lower() == 'true'
+app.config['MYSQL_POOL_PING_INTERVAL'] = int(os.environ.get('MYSQL_POOL_PING_INTERVAL', 30))
+# Pool asyncio del punto de entrada ASGI (asgi.py)
+app.config['MYSQL_ASYNC_POOL_MAX_SIZE'] = int(os.environ.get('MYSQL_ASYNC_POOL_MAX_SIZE', 50))
+
+# Réplicas de lectura (host[:puerto] separados por comas)
+app.config['MYSQL_REPLICA_HOSTS'] = os.environ.get('MYSQL_REPLICA_HOSTS', '')
+app.config['MYSQL_REPLICA_MAX_LAG'] = int(os.environ.get('MYSQL_REPLICA_MAX_LAG', 5))
+app.config['MYSQL_REPLICA_CHECK_INTERVAL'] = int(os.environ.get('MYSQL_REPLICA_CHECK_INTERVAL', 10))
+# Segundos como máximo para conectar con una réplica y comprobarla (en segundo plano)
+app.config['MYSQL_REPLICA_CHECK_TIMEOUT'] = float(os.environ.get('MYSQL_REPLICA_CHECK_TIMEOUT', 2.0))
+
+# Sharding: 'host:puerto/base,...' (vacío = una sola base). El shard 0 es el de la taxonomía
+app.config['MYSQL_SHARDS'] = os.environ.get('MYSQL_SHARDS', '')
+# 'subcategory' (tabla de rutas o subcategory_id % shards) o 'hash'
+app.config['MYSQL_SHARD_KEY'] = os.environ.get('MYSQL_SHARD_KEY', 'subcategory')
+# Tabla de rutas 'subcategory_id=shard,...'
+app.config['MYSQL_SHARD_ROUTES'] = os.environ.get('MYSQL_SHARD_ROUTES', '')
+
+# Paginación del listado de productos
+app.config['PRODUCT_PAGE_SIZE'] = int(os.environ.get('PRODUCT_PAGE_SIZE', 50))
+app.config['PRODUCT_PAGE_MAX_SIZE'] = int(os.environ.get('PRODUCT_PAGE_MAX_SIZE', 200))
+# Segundos que se reutiliza el total aproximado de productos
+app.config['PRODUCT_TOTAL_CACHE_TTL'] = int(os.environ.get('PRODUCT_TOTAL_CACHE_TTL', 60))
+
+# Búsqueda de productos: 'database' (FULLTEXT/FTS5) o 'memory' (índice invertido en el proceso)
+app.config['SEARCH_ENGINE'] = os.environ.get('SEARCH_ENGINE', 'database')
+# Resultados máximos por búsqueda, sumando todas las páginas
+app.config['SEARCH_MAX_RESULTS'] = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+# Productos como máximo en el índice de autocompletado (acota su memoria)
+app.config['AUTOCOMPLETE_MAX_PRODUCTS'] = int(os.environ.get('AUTOCOMPLETE_MAX_PRODUCTS', 100000))
+
+# Ids como máximo por consulta múltiple (GET ?ids= y POST /api/products/batch)
+app.config['PRODUCT_MULTI_GET_MAX'] = int(os.environ.get('PRODUCT_MULTI_GET_MAX', 500))
+
+# Entradas de la caché número de serie -> id (0 la desactiva)
+app.config['SERIAL_CACHE_SIZE'] = int(os.environ.get('SERIAL_CACHE_SIZE', 10000))
+
+# Caché en proceso de productos por id y de páginas del listado (tamaño 0 la desactiva)
+app.config['PRODUCT_CACHE_SIZE'] = int(os.environ.get('PRODUCT_CACHE_SIZE', 5000))
+app.config['PRODUCT_CACHE_TTL'] = int(os.environ.get('PRODUCT_CACHE_TTL', 60))
+app.config['PRODUCT_PAGE_CACHE_SIZE'] = int(os.environ.get('PRODUCT_PAGE_CACHE_SIZE', 500))
+app.config['PRODUCT_PAGE_CACHE_TTL'] = int(os.environ.get('PRODUCT_PAGE_CACHE_TTL', 15))
+# Fracción final del TTL en la que un acierto recarga la entrada en segundo plano
+app.config['PRODUCT_CACHE_REFRESH_AHEAD'] = float(os.environ.get('PRODUCT_CACHE_REFRESH_AHEAD', 0.2))
+# Precarga de índices y caché de productos al importar la app (false en tests)
+app.config['PRODUCT_WARMUP'] = os.environ.get('PRODUCT_WARMUP', 'true').lower() == 'true'
+
+# Segundos de vida de la instantánea en memoria de categorías y subcategorías
+app.config['TAXONOMY_SNAPSHOT_TTL'] = int(os.environ.get('TAXONOMY_SNAPSHOT_TTL', 300))
+
+# Instantánea del catálogo compartida entre workers vía mmap (vacío la desactiva)
+# y segundos de espera tras una escritura antes de volver a publicarla
+app.config['CATALOG_SNAPSHOT_PATH'] = os.environ.get('CATALOG_SNAPSHOT_PATH', '')
+app.config['CATALOG_SNAPSHOT_DELAY'] = float(os.environ.get('CATALOG_SNAPSHOT_DELAY', 1.0))
+
+# Bus de invalidación entre instancias: 'database' (tabla cache_invalidations),
+# 'multicast' (UDP), 'memory' (un solo proceso) o 'none'
+app.config['INVALIDATION_TRANSPORT'] = os.environ.get('INVALIDATION_TRANSPORT', 'database')
+app.config['INVALIDATION_FLUSH_INTERVAL'] = float(os.environ.get('INVALIDATION_FLUSH_INTERVAL', 0.1))
+app.config['INVALIDATION_POLL_INTERVAL'] = float(os.environ.get('INVALIDATION_POLL_INTERVAL', 1.0))
+# Sin noticias del bus durante más segundos que este, se vacían las cachés locales
+app.config['INVALIDATION_MAX_STALENESS'] = float(os.environ.get('INVALIDATION_MAX_STALENESS', 10.0))
+app.config['INVALIDATION_RETAIN'] = int(os.environ.get('INVALIDATION_RETAIN', 10000))
+app.config['INVALIDATION_MULTICAST_GROUP'] = os.environ.get('INVALIDATION_MULTICAST_GROUP', '239.255.42.99:5701')
+app.config['INVALIDATION_MULTICAST_TTL'] = int(os.environ.get('INVALIDATION_MULTICAST_TTL', 1))
+
+# Segundos que una lectura espera a la consulta idéntica ya en curso antes de rendirse
+app.config['SINGLE_FLIGHT_TIMEOUT'] = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 5.0))
+
+# Segundos que clientes y proxies pueden reutilizar /api/catalog/bootstrap
+app.config['BOOTSTRAP_MAX_AGE'] = int(os.environ.get('BOOTSTRAP_MAX_AGE', 30))
+
+# Facetas del catálogo: límites de las franjas de precio y segundos de caché
+app.config['PRODUCT_PRICE_BUCKETS'] = os.environ.get('PRODUCT_PRICE_BUCKETS', '100,250,500,1000,2000')
+app.config['FACETS_CACHE_TTL'] = int(os.environ.get('FACETS_CACHE_TTL', 30))
+
+# Instrumentación de consultas
+app.config['MYSQL_SLOW_QUERY_MS'] = float(os.environ.get('MYSQL_SLOW_QUERY_MS', 200))
+app.config['MYSQL_SLOW_QUERY_LOG'] = os.environ.get('MYSQL_SLOW_QUERY_LOG', '')
+# Máximo de sentencias por request (0 desactiva); 'raise' en tests, 'warn' en producción
+app.config['MYSQL_QUERY_BUDGET'] = int(os.environ.get('MYSQL_QUERY_BUDGET', 25))
+app.config['MYSQL_QUERY_BUDGET_MODE'] = os.environ.get('MYSQL_QUERY_BUDGET_MODE', '')
+
+# Tiempo límite por request (ms, 0 desactiva), por endpoint o desde la cabecera X-Request-Timeout
+app.config['REQUEST_DEADLINE_MS'] = int(os.environ.get('REQUEST_DEADLINE_MS', 15000))
+app.config['REQUEST_DEADLINE_MAX_MS'] = int(os.environ.get('REQUEST_DEADLINE_MAX_MS', 60000))
+app.config['REQUEST_DEADLINES'] = parse_endpoint_deadlines(os.environ.get('REQUEST_DEADLINES', ''))
+
+# Reintentos ante deadlocks, lock wait timeouts y conexiones caídas
+app.config['MYSQL_RETRY_MAX_ATTEMPTS'] = int(os.environ.get('MYSQL_RETRY_MAX_ATTEMPTS', 3))
+app.config['MYSQL_RETRY_BASE_DELAY_MS'] = int(os.environ.get('MYSQL_RETRY_BASE_DELAY_MS', 50))
+app.config['MYSQL_RETRY_MAX_DELAY_MS'] = int(os.environ.get('MYSQL_RETRY_MAX_DELAY_MS', 1000))
+# Fracción de llamadas que puede convertirse en reintentos
+app.config['MYSQL_RETRY_BUDGET_RATIO'] = float(os.environ.get('MYSQL_RETRY_BUDGET_RATIO', 0.2))
 
 # Configuración CORS simplificada - Colocar después de la creación de app
 frontend_urls = [
@@ -79,11 +219,16 @@ CORS(app,
      origins=frontend_urls,
      supports_credentials=True,
      methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS'],
-     allow_headers=['Content-Type', 'Authorization', 'X-Requested-With', 'Accept', 'Origin'],
+     allow_headers=['Content-Type', 'Authorization', 'X-Requested-With', 'Accept', 'Origin', DEADLINE_HEADER],
      max_age=600)
 
 api = Api(app)
 
+# Una conexión por request, compartida por todos los servicios
+init_unit_of_work(app)
+init_query_metrics(app)
+init_deadlines(app)
+
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -240,6 +385,83 @@ def inventory_access_required(f):
     return decorated
 
 # --- Recursos de la API ---
+def page_limit():
+    """Page size from ?limit=, clamped to PRODUCT_PAGE_MAX_SIZE"""
+    default = app.config['PRODUCT_PAGE_SIZE']
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise ValueError("limit debe ser un número entero")
+    return min(max(limit, 1), app.config['PRODUCT_PAGE_MAX_SIZE'])
+
+def requested_fields():
+    """Projection from ?fields= or ?view=, None for the full representation"""
+    return parse_product_fields(request.args.get('fields'), request.args.get('view'))
+
+def products_by_ids_response(ids, fields):
+    """Multi-get payload: products in request order plus the ids not found"""
+    products, missing = get_products_by_ids_service(ids, fields)
+    if products is None:
+        return {'success': False, 'message': 'Error de conexión a la base de datos'}, 500
+    return {'success': True, 'data': products, 'count': len(products), 'missing': missing}
+
+def snapshot_page_body(limit, cursor, sort):
+    """
+    /api/products page as JSON bytes assembled from the shared catalog
+    snapshot, or None when the request has to go to the database
+    """
+    page = snapshot_products_page(limit, cursor, sort)
+    if page is None:
+        return None
+    items, has_more, next_cursor = page
+    return b''.join((
+        b'{"success":true,"data":[', b','.join(item.tobytes() + b'}' for item in items),
+        f'],"count":{len(items)},"next_cursor":{json.dumps(next_cursor)},'
+        f'"has_more":{json.dumps(has_more)}}}'.encode('utf-8'),
+    ))
+
+def snapshot_product_body(product_id):
+    """/api/products/<id> as JSON bytes from the shared catalog snapshot, or None"""
+    product = snapshot_product(product_id)
+    if product is None:
+        return None
+    return b'{"success":true,"data":' + product.tobytes() + b'}'
+
+# Productos por chunk en las respuestas por streaming
+STREAM_CHUNK_ROWS = 200
+
+def stream_products_response(fields=None, filters=None):
+    """
+    Whole catalog as a chunked JSON response built row by row.
+    success goes last: it is only known once every row has been sent.
+    """
+    products = stream_all_products_service(fields, filters)
+    encoder = CustomJSONEncoder(separators=(',', ':'))
+    
+    def generate():
+        # First byte as soon as the query is running
+        yield '{"data":['
+        count = 0
+        chunk = []
+        try:
+            for product in products:
+                chunk.append(('' if count == 0 else ',') + encoder.encode(product))
+                count += 1
+                if len(chunk) >= STREAM_CHUNK_ROWS:
+                    yield ''.join(chunk)
+                    chunk = []
+            chunk.append(f'],"count":{count},"success":true}}')
+        except Exception as e:
+            print(f"Error en streaming de /api/products: {e}")
+            chunk.append(f'],"count":{count},"success":false,"message":{json.dumps(str(e))}}}')
+        products.close()
+        yield ''.join(chunk)
+    
+    response = Response(generate(), mimetype='application/json')
+    # Also runs when the client goes away mid-stream
+    response.call_on_close(products.close)
+    return response
+
 class ProductListResource(Resource):
     def get(self):
         """
@@ -247,8 +469,86 @@ class ProductListResource(Resource):
         ---
         tags:
           - Productos
-        summary: Listar todos los productos
-        description: Obtiene la lista completa de productos disponibles
+        summary: Listar productos paginados
+        description: >
+          Devuelve una página de productos con paginación por cursor (keyset).
+          Para seguir, enviar next_cursor como cursor con el mismo sort y filtros.
+          La lista completa sin paginar solo se devuelve con all=true.
+          Los filtros se aplican en la base de datos sobre índices.
+        parameters:
+          - in: query
+            name: limit
+            type: integer
+            description: Productos por página (por defecto PRODUCT_PAGE_SIZE, máximo PRODUCT_PAGE_MAX_SIZE)
+          - in: query
+            name: cursor
+            type: string
+            description: Cursor opaco devuelto como next_cursor por la página anterior
+          - in: query
+            name: sort
+            type: string
+            enum: [id, -id, name, -name, sale_price, -sale_price, stock, -stock]
+            default: -id
+          - in: query
+            name: include_total
+            type: boolean
+            description: Incluir el total aproximado de productos (cacheado)
+          - in: query
+            name: category_id
+            type: integer
+            description: Solo productos de esta categoría
+          - in: query
+            name: subcategory_id
+            type: integer
+            description: Solo productos de esta subcategoría
+          - in: query
+            name: min_price
+            type: number
+            description: Precio de venta mínimo
+          - in: query
+            name: max_price
+            type: number
+            description: Precio de venta máximo
+          - in: query
+            name: in_stock
+            type: boolean
+            description: true para productos con stock, false para agotados
+          - in: query
+            name: low_stock
+            type: integer
+            description: Solo productos con stock menor o igual a este umbral
+          - in: query
+            name: serial_prefix
+            type: string
+            description: Prefijo del número de serie
+          - in: query
+            name: brand
+            type: string
+            description: Marca (specifications.marca)
+          - in: query
+            name: ids
+            type: string
+            description: >
+              Ids separados por comas (p. ej. 12,7,31); devuelve esos productos en ese
+              orden, con los inexistentes en missing. Ignora paginación y filtros.
+          - in: query
+            name: all
+            type: boolean
+            description: Devolver el catálogo completo sin paginar
+          - in: query
+            name: stream
+            type: boolean
+            description: Catálogo completo como JSON por chunks, con memoria constante
+          - in: query
+            name: fields
+            type: string
+            description: Campos a devolver separados por comas (p. ej. id,name,sale_price); id siempre se incluye
+          - in: query
+            name: view
+            type: string
+            enum: [full, summary]
+            default: full
+            description: Representación con nombre; summary devuelve id, name, sale_price y stock
         responses:
           200:
             description: Lista de productos obtenida exitosamente
@@ -265,14 +565,72 @@ class ProductListResource(Resource):
                 count:
                   type: integer
                   example: 50
+                next_cursor:
+                  type: string
+                has_more:
+                  type: boolean
+                total:
+                  type: integer
+                  description: Total aproximado, solo con include_total=true
+          400:
+            description: Parámetros de paginación o campos inválidos
           500:
             description: Error interno del servidor
             schema:
               $ref: '#/definitions/ErrorResponse'
         """
         try:
-            products = get_all_products_service()
-            return {'success': True, 'data': products, 'count': len(products)}
+            try:
+                fields = requested_fields()
+                filters = parse_product_filters(request.args)
+                ids = request.args.get('ids')
+                if ids is not None:
+                    ids = parse_product_ids(ids, app.config['PRODUCT_MULTI_GET_MAX'])
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}, 400
+            
+            if ids is not None:
+                return products_by_ids_response(ids, fields)
+            
+            if request.args.get('stream', '').lower() == 'true':
+                return stream_products_response(fields, filters)
+            
+            if request.args.get('all', '').lower() == 'true':
+                products = get_all_products_service(fields, filters)
+                return {'success': True, 'data': products, 'count': len(products)}
+            
+            if not fields and not filters and request.args.get('include_total', '').lower() != 'true':
+                try:
+                    body = snapshot_page_body(
+                        page_limit(), request.args.get('cursor'), request.args.get('sort', DEFAULT_PRODUCT_SORT)
+                    )
+                except ValueError as e:
+                    return {'success': False, 'message': str(e)}, 400
+                if body is not None:
+                    return Response(body, mimetype='application/json')
+            
+            try:
+                page = get_products_page_service(
+                    page_limit(),
+                    cursor=request.args.get('cursor'),
+                    sort=request.args.get('sort', DEFAULT_PRODUCT_SORT),
+                    fields=fields,
+                    filters=filters
+                )
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}, 400
+            
+            response = {
+                'success': True,
+                'data': page['items'],
+                'count': len(page['items']),
+                'next_cursor': page['next_cursor'],
+                'has_more': page['has_more']
+            }
+            if request.args.get('include_total', '').lower() == 'true':
+                response['total'] = get_products_total_service(filters)
+                response['total_is_approximate'] = True
+            return response
         except Exception as e:
             print(f"Error en GET /api/products: {e}")
             return {'success': False, 'message': str(e)}, 500
@@ -381,6 +739,546 @@ class ProductListResource(Resource):
             print(f"Error en POST /api/products: {e}")
             return {'success': False, 'message': str(e)}, 500
 
+class ProductSearchResource(Resource):
+    def get(self):
+        """
+        Buscar productos
+        ---
+        tags:
+          - Productos
+        summary: Búsqueda de texto completo en el catálogo
+        description: >
+          Busca en nombre, descripción y valores de especificaciones, ordenando
+          por relevancia. Admite los mismos filtros, campos y paginación por
+          cursor que el listado de productos.
+        parameters:
+          - in: query
+            name: q
+            type: string
+            required: true
+            description: Texto a buscar
+            example: laptop gaming
+          - in: query
+            name: limit
+            type: integer
+            description: Resultados por página (por defecto PRODUCT_PAGE_SIZE, máximo PRODUCT_PAGE_MAX_SIZE)
+          - in: query
+            name: cursor
+            type: string
+            description: Cursor devuelto como next_cursor por la página anterior de la misma búsqueda
+          - in: query
+            name: fields
+            type: string
+            description: Campos a devolver separados por comas; id siempre se incluye
+          - in: query
+            name: view
+            type: string
+            enum: [full, summary]
+            default: full
+          - in: query
+            name: category_id
+            type: integer
+          - in: query
+            name: subcategory_id
+            type: integer
+          - in: query
+            name: min_price
+            type: number
+          - in: query
+            name: max_price
+            type: number
+          - in: query
+            name: in_stock
+            type: boolean
+          - in: query
+            name: low_stock
+            type: integer
+          - in: query
+            name: serial_prefix
+            type: string
+          - in: query
+            name: brand
+            type: string
+        responses:
+          200:
+            description: Resultados de la búsqueda, del más relevante al menos relevante
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  type: array
+                  items:
+                    $ref: '#/definitions/Product'
+                count:
+                  type: integer
+                next_cursor:
+                  type: string
+                has_more:
+                  type: boolean
+                query:
+                  type: string
+          400:
+            description: Búsqueda, filtros o cursor inválidos
+          500:
+            description: Error interno del servidor
+            schema:
+              $ref: '#/definitions/ErrorResponse'
+        """
+        try:
+            text = request.args.get('q', '').strip()
+            try:
+                page = search_products_service(
+                    text,
+                    page_limit(),
+                    cursor=request.args.get('cursor'),
+                    fields=requested_fields(),
+                    filters=parse_product_filters(request.args)
+                )
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}, 400
+            
+            return {
+                'success': True,
+                'data': page['items'],
+                'count': len(page['items']),
+                'next_cursor': page['next_cursor'],
+                'has_more': page['has_more'],
+                'query': text
+            }
+        except Exception as e:
+            print(f"Error en GET /api/products/search: {e}")
+            return {'success': False, 'message': str(e)}, 500
+
+class ProductFacetsResource(Resource):
+    def get(self):
+        """
+        Facetas del catálogo
+        ---
+        tags:
+          - Productos
+        summary: Conteos para la barra de filtros
+        description: >
+          Cuenta los productos que cumplen los filtros por categoría, subcategoría,
+          marca, franja de precio y disponibilidad. Cada faceta ignora sus propios
+          filtros, para seguir mostrando las alternativas a la selección actual.
+        parameters:
+          - in: query
+            name: category_id
+            type: integer
+          - in: query
+            name: subcategory_id
+            type: integer
+          - in: query
+            name: min_price
+            type: number
+          - in: query
+            name: max_price
+            type: number
+          - in: query
+            name: in_stock
+            type: boolean
+          - in: query
+            name: low_stock
+            type: integer
+          - in: query
+            name: serial_prefix
+            type: string
+          - in: query
+            name: brand
+            type: string
+        responses:
+          200:
+            description: Conteos por faceta
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  type: object
+                  properties:
+                    categories:
+                      type: array
+                      items:
+                        type: object
+                    subcategories:
+                      type: array
+                      items:
+                        type: object
+                    brands:
+                      type: array
+                      items:
+                        type: object
+                    price:
+                      type: array
+                      items:
+                        type: object
+                    stock:
+                      type: object
+          400:
+            description: Filtros inválidos
+          500:
+            description: Error interno del servidor
+            schema:
+              $ref: '#/definitions/ErrorResponse'
+        """
+        try:
+            filters = parse_product_filters(request.args)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}, 400
+        
+        facets = get_product_facets_service(filters)
+        if facets is None:
+            return {'success': False, 'message': 'Error calculando las facetas'}, 500
+        return {'success': True, 'data': facets}
+
+class ProductBatchResource(Resource):
+    def post(self):
+        """
+        Obtener varios productos por ID
+        ---
+        tags:
+          - Productos
+        summary: Consulta múltiple de productos
+        description: >
+          Variante POST de GET /api/products?ids= para listas largas. Devuelve los
+          productos en el orden pedido con una sola consulta, e informa en missing
+          los ids que no existen.
+        parameters:
+          - in: body
+            name: body
+            required: true
+            schema:
+              type: object
+              required:
+                - ids
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: integer
+                  example: [12, 7, 31]
+                fields:
+                  type: string
+                  example: id,name,sale_price,stock
+                view:
+                  type: string
+                  enum: [full, summary]
+        responses:
+          200:
+            description: Productos encontrados y ids inexistentes
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  type: array
+                  items:
+                    $ref: '#/definitions/Product'
+                count:
+                  type: integer
+                missing:
+                  type: array
+                  items:
+                    type: integer
+          400:
+            description: Lista de ids inválida
+          500:
+            description: Error interno del servidor
+            schema:
+              $ref: '#/definitions/ErrorResponse'
+        """
+        data = request.get_json(silent=True) or {}
+        try:
+            ids = parse_product_ids(data.get('ids'), app.config['PRODUCT_MULTI_GET_MAX'])
+            fields = parse_product_fields(data.get('fields'), data.get('view'))
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}, 400
+        return products_by_ids_response(ids, fields)
+
+class ProductBySerialResource(Resource):
+    def get(self, serial):
+        """
+        Obtener producto por número de serie
+        ---
+        tags:
+          - Productos
+        summary: Buscar un producto por su número de serie (código de barras)
+        parameters:
+          - in: path
+            name: serial
+            type: string
+            required: true
+            example: PRD-001199-635
+          - in: query
+            name: fields
+            type: string
+            description: Campos a devolver separados por comas; id siempre se incluye
+          - in: query
+            name: view
+            type: string
+            enum: [full, summary]
+        responses:
+          200:
+            description: Producto encontrado
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  $ref: '#/definitions/Product'
+          404:
+            description: Producto no encontrado
+            schema:
+              $ref: '#/definitions/ErrorResponse'
+        """
+        try:
+            fields = requested_fields()
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}, 400
+        
+        products, _ = get_products_by_serials_service([serial], fields)
+        if products is None:
+            return {'success': False, 'message': 'Error de conexión a la base de datos'}, 500
+        if not products:
+            return {'success': False, 'message': 'Producto no encontrado'}, 404
+        return {'success': True, 'data': products[0]}
+
+class ProductBySerialBatchResource(Resource):
+    def post(self):
+        """
+        Obtener varios productos por número de serie
+        ---
+        tags:
+          - Productos
+        summary: Resolver en bloque los números de serie escaneados
+        description: >
+          Una sola consulta sobre el índice único de serial_number. Devuelve los
+          productos en el orden pedido e informa en missing los números no encontrados.
+        parameters:
+          - in: body
+            name: body
+            required: true
+            schema:
+              type: object
+              required:
+                - serials
+              properties:
+                serials:
+                  type: array
+                  items:
+                    type: string
+                  example: [PRD-001199-635, PRD-001198-182]
+                fields:
+                  type: string
+                  example: id,name,stock,serial_number
+                view:
+                  type: string
+                  enum: [full, summary]
+        responses:
+          200:
+            description: Productos encontrados y números de serie inexistentes
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  type: array
+                  items:
+                    $ref: '#/definitions/Product'
+                count:
+                  type: integer
+                missing:
+                  type: array
+                  items:
+                    type: string
+          400:
+            description: Lista de números de serie inválida
+        """
+        data = request.get_json(silent=True) or {}
+        try:
+            serials = parse_serials(data.get('serials'), app.config['PRODUCT_MULTI_GET_MAX'])
+            fields = parse_product_fields(data.get('fields'), data.get('view'))
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}, 400
+        
+        products, missing = get_products_by_serials_service(serials, fields)
+        if products is None:
+            return {'success': False, 'message': 'Error de conexión a la base de datos'}, 500
+        return {'success': True, 'data': products, 'count': len(products), 'missing': missing}
+
+class CatalogBootstrapResource(Resource):
+    def get(self):
+        """
+        Datos iniciales del catálogo
+        ---
+        tags:
+          - Productos
+        summary: Categorías, primera página de productos y facetas en una sola llamada
+        description: >
+          Ejecuta en paralelo las consultas de la primera carga del catálogo y
+          devuelve un único documento cacheable (Cache-Control y ETag).
+          Acepta los parámetros de página, campos y filtros del listado de productos.
+        parameters:
+          - in: query
+            name: limit
+            type: integer
+          - in: query
+            name: sort
+            type: string
+            default: -id
+          - in: query
+            name: fields
+            type: string
+          - in: query
+            name: view
+            type: string
+            enum: [full, summary]
+          - in: query
+            name: category_id
+            type: integer
+          - in: query
+            name: subcategory_id
+            type: integer
+          - in: query
+            name: min_price
+            type: number
+          - in: query
+            name: max_price
+            type: number
+          - in: query
+            name: in_stock
+            type: boolean
+          - in: query
+            name: brand
+            type: string
+        responses:
+          200:
+            description: Documento de arranque del catálogo
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  type: object
+                  properties:
+                    categories:
+                      type: array
+                      items:
+                        type: object
+                    products:
+                      type: object
+                    facets:
+                      type: object
+          304:
+            description: Sin cambios respecto al ETag enviado en If-None-Match
+          400:
+            description: Parámetros inválidos
+        """
+        try:
+            try:
+                bootstrap = get_catalog_bootstrap_service(
+                    page_limit(),
+                    sort=request.args.get('sort', DEFAULT_PRODUCT_SORT),
+                    fields=requested_fields(),
+                    filters=parse_product_filters(request.args)
+                )
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}, 400
+            
+            page = bootstrap['products']
+            response = jsonify({
+                'success': True,
+                'data': {
+                    'categories': bootstrap['categories'],
+                    'products': {
+                        'data': page['items'],
+                        'count': len(page['items']),
+                        'next_cursor': page['next_cursor'],
+                        'has_more': page['has_more']
+                    },
+                    'facets': bootstrap['facets']
+                }
+            })
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['BOOTSTRAP_MAX_AGE']
+            response.add_etag()
+            return response.make_conditional(request)
+        except Exception as e:
+            print(f"Error en GET /api/catalog/bootstrap: {e}")
+            return {'success': False, 'message': str(e)}, 500
+
+# Sugerencias por defecto y máximas en el autocompletado
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 25
+
+class ProductSuggestResource(Resource):
+    def get(self):
+        """
+        Autocompletar nombres de productos
+        ---
+        tags:
+          - Productos
+        summary: Sugerencias mientras se escribe
+        description: >
+          Nombres de productos que empiezan por el texto escrito o se le parecen
+          (tolera errores de tipeo). Se responde desde memoria, sin consultar la base de datos.
+        parameters:
+          - in: query
+            name: q
+            type: string
+            required: true
+            description: Texto escrito hasta ahora; la última palabra puede estar incompleta
+            example: galx s2
+          - in: query
+            name: limit
+            type: integer
+            default: 10
+            description: Sugerencias a devolver (máximo 25)
+        responses:
+          200:
+            description: Sugerencias, de la más a la menos relevante
+            schema:
+              type: object
+              properties:
+                success:
+                  type: boolean
+                  example: true
+                data:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: integer
+                      name:
+                        type: string
+                count:
+                  type: integer
+          400:
+            description: limit inválido
+        """
+        try:
+            limit = int(request.args.get('limit', SUGGEST_LIMIT))
+        except ValueError:
+            return {'success': False, 'message': 'limit debe ser un número entero'}, 400
+        limit = min(max(limit, 1), SUGGEST_MAX_LIMIT)
+        
+        suggestions = suggest_products_service(request.args.get('q', ''), limit)
+        return {'success': True, 'data': suggestions, 'count': len(suggestions)}
+
 class ProductResource(Resource):
     def get(self, id):
         """
@@ -397,6 +1295,16 @@ class ProductResource(Resource):
             required: true
             description: ID del producto
             example: 1
+          - in: query
+            name: fields
+            type: string
+            description: Campos a devolver separados por comas (p. ej. id,name,sale_price); id siempre se incluye
+          - in: query
+            name: view
+            type: string
+            enum: [full, summary]
+            default: full
+            description: Representación con nombre; summary devuelve id, name, sale_price y stock
         responses:
           200:
             description: Producto encontrado
@@ -408,6 +1316,8 @@ class ProductResource(Resource):
                   example: true
                 data:
                   $ref: '#/definitions/Product'
+          400:
+            description: Campos o vista inválidos
           404:
             description: Producto no encontrado
             schema:
@@ -418,7 +1328,17 @@ class ProductResource(Resource):
               $ref: '#/definitions/ErrorResponse'
         """
         try:
-            product = get_product_by_id_service(id)
+            try:
+                fields = requested_fields()
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}, 400
+            
+            if not fields:
+                body = snapshot_product_body(id)
+                if body is not None:
+                    return Response(body, mimetype='application/json')
+            
+            product = get_product_by_id_service(id, fields=fields)
             if not product:
                 return {'success': False, 'message': 'Producto no encontrado'}, 404
             
@@ -1017,7 +1937,8 @@ class ProductStockResource(Resource):
             description: Producto no encontrado
         """
         try:
-            product = get_product_by_id_service(id)
+            # Real-time stock check: read from the primary, never a replica
+            product = get_product_by_id_service(id, use_primary=True)
             if not product:
                 return {'error': 'Producto no encontrado'}, 404
             
@@ -1068,6 +1989,7 @@ class ProductStockResource(Resource):
           404:
             description: Producto no encontrado
         """
+        connection = None
         try:
             data = request.get_json()
             if not data or 'stock' not in data:
@@ -1077,20 +1999,22 @@ class ProductStockResource(Resource):
             if not isinstance(new_stock, int) or new_stock < 0:
                 return {'error': 'Stock debe ser un número entero no negativo'}, 400
             
-            connection = get_db_connection()
+            connection = get_db_connection(product_id=id)
             if not connection:
                 return {'error': 'Error de conexión a la base de datos'}, 500
             
             with connection.cursor() as cursor:
-                # Check if product exists
-                cursor.execute("SELECT id, name FROM products WHERE id = %s", (id,))
-                product = cursor.fetchone()
-                if not product:
+                # Update first: a matched row doubles as the existence check
+                cursor.execute("UPDATE products SET stock = %s WHERE id = %s", (new_stock, id))
+                if cursor.rowcount == 0:
+                    rollback(connection)
                     return {'error': 'Producto no encontrado'}, 404
                 
-                # Update stock
-                cursor.execute("UPDATE products SET stock = %s WHERE id = %s", (new_stock, id))
-                connection.commit()
+                cursor.execute("SELECT name FROM products WHERE id = %s", (id,))
+                product = cursor.fetchone()
+                commit(connection)
+                forget_product(id)
+                product_written(id, stock_only=True)
                 
                 return {
                     'success': True,
@@ -1103,9 +2027,12 @@ class ProductStockResource(Resource):
                 }, 200
                 
         except Exception as e:
+            if connection:
+                rollback(connection)
             return {'error': f'Error interno: {str(e)}'}, 500
         finally:
-            if 'connection' in locals():
+            # Return the connection to the pool
+            if connection:
                 connection.close()
 
 @app.errorhandler(404)
@@ -1129,8 +2056,38 @@ def health_check():
         'version': '1.0.0'
     })
 
+@app.route('/metrics', methods=['GET'])
+@token_required
+@admin_required
+def metrics(current_user):
+    return jsonify({
+        'success': True,
+        'data': {
+            'storage': get_storage_stats(app),
+            'db_pool': get_pool_stats(app),
+            'db_replicas': get_replica_stats(app),
+            'queries': query_stats.top(),
+            'retries': retry_metrics.snapshot(),
+            'search': get_search_stats(app),
+            'autocomplete': get_suggest_stats(app),
+            'serial_cache': get_serial_cache_stats(app),
+            'product_cache': get_product_cache_stats(app),
+            'taxonomy': get_taxonomy_stats(app),
+            'catalog_snapshot': get_catalog_snapshot_stats(app),
+            'invalidation_bus': get_invalidation_stats(app),
+            'single_flight': get_single_flight_stats(app)
+        }
+    })
+
 # Registrar recursos
 api.add_resource(ProductListResource, '/api/products')
+api.add_resource(ProductSearchResource, '/api/products/search')
+api.add_resource(ProductSuggestResource, '/api/products/suggest')
+api.add_resource(ProductFacetsResource, '/api/products/facets')
+api.add_resource(ProductBatchResource, '/api/products/batch')
+api.add_resource(ProductBySerialResource, '/api/products/by-serial/<string:serial>')
+api.add_resource(ProductBySerialBatchResource, '/api/products/by-serial')
+api.add_resource(CatalogBootstrapResource, '/api/catalog/bootstrap')
 api.add_resource(ProductResource, '/api/products/<int:id>')
 api.add_resource(ProductDecreaseStockResource, '/api/products/<int:id>/decrease-stock')
 api.add_resource(CategoryListResource, '/api/categories')
@@ -1138,6 +2095,10 @@ api.add_resource(SubcategoryListResource, '/api/categories/<int:category_id>/sub
 api.add_resource(CategoryManagementResource, '/api/categories/manage')
 api.add_resource(ProductStockResource, '/api/products/<int:id>/stock')
 
+# Al importar, no solo en __main__: gunicorn y los demás servidores WSGI no lo ejecutan
+if app.config['PRODUCT_WARMUP']:
+    warm_product_indexes(app)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Backend 2 - Punto de entrada ASGI
+Las lecturas del catálogo se sirven con servicios asyncio (aiomysql);
+el resto de rutas se delega a la app Flask.
+
+Mismo contrato que Flask en esas rutas: cachés de productos, tiempo límite
+por request (X-Request-Timeout, REQUEST_DEADLINES con el endpoint de Flask
+equivalente; 504 al agotarse), métricas y presupuesto de consultas.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+"""
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app, CustomJSONEncoder, frontend_urls, snapshot_page_body, snapshot_product_body
+from services import async_product_service as catalog
+from services.product_service import (
+    parse_product_fields,
+    parse_product_filters,
+    parse_product_ids,
+    warm_product_indexes,
+)
+from services.deadline import DEADLINE_EXCEEDED_BODY, DEADLINE_HEADER, AsyncDeadline, DeadlineExceeded, request_timeout_ms
+from services.query_metrics import async_request_budget
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+# Los servicios asyncio solo cubren MySQL sin shards; con SQLite o shards todo va a Flask
+ASYNC_CATALOG = flask_app.config['STORAGE_ENGINE'] == 'mysql' and not flask_app.config['MYSQL_SHARDS']
+
+
+def _fields(query):
+    return parse_product_fields(query.get('fields'), query.get('view'))
+
+
+async def list_products(query):
+    try:
+        fields = _fields(query)
+        filters = parse_product_filters(query)
+        ids = query.get('ids')
+        if ids is not None:
+            ids = parse_product_ids(ids, flask_app.config['PRODUCT_MULTI_GET_MAX'])
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    if ids is not None:
+        products, missing = await catalog.get_products_by_ids_service(ids, fields)
+        if products is None:
+            return {'success': False, 'message': 'Error de conexión a la base de datos'}, 500
+        return {'success': True, 'data': products, 'count': len(products), 'missing': missing}, 200
+
+    if query.get('all', '').lower() == 'true':
+        products = await catalog.get_all_products_service(fields, filters)
+        return {'success': True, 'data': products, 'count': len(products)}, 200
+
+    try:
+        limit = int(query.get('limit', flask_app.config['PRODUCT_PAGE_SIZE']))
+    except ValueError:
+        return {'success': False, 'message': 'limit debe ser un número entero'}, 400
+    limit = min(max(limit, 1), flask_app.config['PRODUCT_PAGE_MAX_SIZE'])
+    if not fields and not filters and query.get('include_total', '').lower() != 'true':
+        try:
+            body = snapshot_page_body(limit, query.get('cursor'), query.get('sort'))
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}, 400
+        if body is not None:
+            return body, 200
+    try:
+        page = await catalog.get_products_page_service(limit, query.get('cursor'), query.get('sort'), fields, filters)
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    payload = {
+        'success': True,
+        'data': page['items'],
+        'count': len(page['items']),
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more'],
+    }
+    if query.get('include_total', '').lower() == 'true':
+        payload['total'] = await catalog.get_products_total_service(filters)
+        payload['total_is_approximate'] = True
+    return payload, 200
+
+
+async def get_product(query, id):
+    try:
+        fields = _fields(query)
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+    if not fields:
+        body = snapshot_product_body(int(id))
+        if body is not None:
+            return body, 200
+    product = await catalog.get_product_by_id_service(int(id), fields)
+    if not product:
+        return {'success': False, 'message': 'Producto no encontrado'}, 404
+    return {'success': True, 'data': product}, 200
+
+
+async def list_categories(query):
+    categories = await catalog.get_categories_service()
+    return {'success': True, 'data': categories, 'count': len(categories)}, 200
+
+
+async def list_subcategories(query, category_id):
+    subcategories = await catalog.get_subcategories_by_category_service(int(category_id))
+    return {'success': True, 'data': subcategories, 'count': len(subcategories)}, 200
+
+
+# Solo lecturas: cualquier otro método o ruta pasa a Flask
+ROUTES = [
+    (re.compile(r'^/api/products/?$'), list_products),
+    (re.compile(r'^/api/products/(?P<id>\d+)/?$'), get_product),
+    (re.compile(r'^/api/categories/?$'), list_categories),
+    (re.compile(r'^/api/categories/(?P<category_id>\d+)/subcategories/?$'), list_subcategories),
+]
+
+# Endpoint de Flask de cada ruta, para REQUEST_DEADLINES
+ENDPOINTS = {
+    list_products: 'productlistresource',
+    get_product: 'productresource',
+    list_categories: 'categorylistresource',
+    list_subcategories: 'subcategorylistresource',
+}
+
+
+def _match(scope):
+    if scope['method'] != 'GET' or not ASYNC_CATALOG:
+        return None, None
+    for pattern, handler in ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            return handler, match.groupdict()
+    return None, None
+
+
+def _cors_headers(scope):
+    """Same CORS policy Flask-CORS applies to the Flask routes"""
+    headers = dict(scope.get('headers') or [])
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    if origin not in frontend_urls:
+        return []
+    return [
+        (b'access-control-allow-origin', origin.encode('latin-1')),
+        (b'access-control-allow-credentials', b'true'),
+        (b'vary', b'Origin'),
+    ]
+
+
+async def _send_json(scope, send, payload, status):
+    # bytes: JSON already assembled (catalog snapshot)
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, cls=CustomJSONEncoder).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ] + _cors_headers(scope),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # No-op when importing app already started it (PRODUCT_WARMUP)
+            warm_product_indexes(flask_app)
+            if ASYNC_CATALOG:
+                try:
+                    await catalog.init_async_pool(flask_app.config)
+                except Exception as e:
+                    # Pool creation is retried on the first catalog request
+                    print(f"⚠️ No se pudo crear el pool async de MySQL: {e}")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await catalog.close_async_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    handler, params = _match(scope) if scope['type'] == 'http' else (None, None)
+    query = {
+        key: values[-1]
+        for key, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()
+    } if handler else {}
+    if handler is list_products and query.get('stream', '').lower() == 'true':
+        # El streaming por cursor de servidor lo sirve Flask
+        handler = None
+    if handler is None:
+        await flask_asgi(scope, receive, send)
+        return
+
+    header = dict(scope.get('headers') or []).get(DEADLINE_HEADER.lower().encode('latin-1'))
+    timeout_ms = request_timeout_ms(
+        flask_app.config, header.decode('latin-1') if header else None, ENDPOINTS[handler]
+    )
+    with AsyncDeadline(timeout_ms) as deadline:
+        try:
+            with flask_app.app_context(), async_request_budget(flask_app, f"GET {scope['path']}"):
+                await catalog.init_async_pool(flask_app.config)
+                payload, status = await asyncio.wait_for(handler(query, **params), deadline.timeout)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            deadline.exceeded = True
+        except Exception as e:
+            print(f"Error en GET {scope['path']}: {e}")
+            payload, status = {'success': False, 'message': str(e)}, 500
+    if deadline.exceeded:
+        # Los servicios se tragan el error: como en Flask, el estado se corrige al final
+        payload, status = DEADLINE_EXCEEDED_BODY, 504
+    await _send_json(scope, send, payload, status)
@@ -2,11 +2,67 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key'
+    STORAGE_ENGINE = os.environ.get('STORAGE_ENGINE') or 'mysql'
+    SQLITE_PATH = os.environ.get('SQLITE_PATH') or 'catalog.db'
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5)
     MYSQL_HOST = os.environ.get('MYSQL_HOST') or 'localhost'
     MYSQL_USER = os.environ.get('MYSQL_USER') or 'root'
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD') or ''
     MYSQL_DB = os.environ.get('MYSQL_DB') or 'soa_products'
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT') or 3306)
+    MYSQL_POOL_MIN_SIZE = int(os.environ.get('MYSQL_POOL_MIN_SIZE') or 1)
+    MYSQL_POOL_MAX_SIZE = int(os.environ.get('MYSQL_POOL_MAX_SIZE') or 10)
+    MYSQL_POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT') or 5)
+    MYSQL_POOL_RECYCLE = int(os.environ.get('MYSQL_POOL_RECYCLE') or 3600)
+    MYSQL_POOL_PRE_PING = (os.environ.get('MYSQL_POOL_PRE_PING') or 'true').lower() == 'true'
+    MYSQL_POOL_PING_INTERVAL = int(os.environ.get('MYSQL_POOL_PING_INTERVAL') or 30)
+    MYSQL_ASYNC_POOL_MAX_SIZE = int(os.environ.get('MYSQL_ASYNC_POOL_MAX_SIZE') or 50)
+    MYSQL_REPLICA_HOSTS = os.environ.get('MYSQL_REPLICA_HOSTS') or ''
+    MYSQL_REPLICA_MAX_LAG = int(os.environ.get('MYSQL_REPLICA_MAX_LAG') or 5)
+    MYSQL_REPLICA_CHECK_INTERVAL = int(os.environ.get('MYSQL_REPLICA_CHECK_INTERVAL') or 10)
+    MYSQL_REPLICA_CHECK_TIMEOUT = float(os.environ.get('MYSQL_REPLICA_CHECK_TIMEOUT') or 2.0)
+    MYSQL_SHARDS = os.environ.get('MYSQL_SHARDS') or ''
+    MYSQL_SHARD_KEY = os.environ.get('MYSQL_SHARD_KEY') or 'subcategory'
+    MYSQL_SHARD_ROUTES = os.environ.get('MYSQL_SHARD_ROUTES') or ''
+    PRODUCT_PAGE_SIZE = int(os.environ.get('PRODUCT_PAGE_SIZE') or 50)
+    PRODUCT_PAGE_MAX_SIZE = int(os.environ.get('PRODUCT_PAGE_MAX_SIZE') or 200)
+    PRODUCT_TOTAL_CACHE_TTL = int(os.environ.get('PRODUCT_TOTAL_CACHE_TTL') or 60)
+    SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE') or 'database'
+    SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS') or 1000)
+    AUTOCOMPLETE_MAX_PRODUCTS = int(os.environ.get('AUTOCOMPLETE_MAX_PRODUCTS') or 100000)
+    PRODUCT_MULTI_GET_MAX = int(os.environ.get('PRODUCT_MULTI_GET_MAX') or 500)
+    SERIAL_CACHE_SIZE = int(os.environ.get('SERIAL_CACHE_SIZE') or 10000)
+    PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE') or 5000)
+    PRODUCT_CACHE_TTL = int(os.environ.get('PRODUCT_CACHE_TTL') or 60)
+    PRODUCT_PAGE_CACHE_SIZE = int(os.environ.get('PRODUCT_PAGE_CACHE_SIZE') or 500)
+    PRODUCT_PAGE_CACHE_TTL = int(os.environ.get('PRODUCT_PAGE_CACHE_TTL') or 15)
+    PRODUCT_CACHE_REFRESH_AHEAD = float(os.environ.get('PRODUCT_CACHE_REFRESH_AHEAD') or 0.2)
+    PRODUCT_WARMUP = (os.environ.get('PRODUCT_WARMUP') or 'true').lower() == 'true'
+    TAXONOMY_SNAPSHOT_TTL = int(os.environ.get('TAXONOMY_SNAPSHOT_TTL') or 300)
+    CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH') or ''
+    CATALOG_SNAPSHOT_DELAY = float(os.environ.get('CATALOG_SNAPSHOT_DELAY') or 1.0)
+    INVALIDATION_TRANSPORT = os.environ.get('INVALIDATION_TRANSPORT') or 'database'
+    INVALIDATION_FLUSH_INTERVAL = float(os.environ.get('INVALIDATION_FLUSH_INTERVAL') or 0.1)
+    INVALIDATION_POLL_INTERVAL = float(os.environ.get('INVALIDATION_POLL_INTERVAL') or 1.0)
+    INVALIDATION_MAX_STALENESS = float(os.environ.get('INVALIDATION_MAX_STALENESS') or 10.0)
+    INVALIDATION_RETAIN = int(os.environ.get('INVALIDATION_RETAIN') or 10000)
+    INVALIDATION_MULTICAST_GROUP = os.environ.get('INVALIDATION_MULTICAST_GROUP') or '239.255.42.99:5701'
+    INVALIDATION_MULTICAST_TTL = int(os.environ.get('INVALIDATION_MULTICAST_TTL') or 1)
+    SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT') or 5.0)
+    BOOTSTRAP_MAX_AGE = int(os.environ.get('BOOTSTRAP_MAX_AGE') or 30)
+    PRODUCT_PRICE_BUCKETS = os.environ.get('PRODUCT_PRICE_BUCKETS') or '100,250,500,1000,2000'
+    FACETS_CACHE_TTL = int(os.environ.get('FACETS_CACHE_TTL') or 30)
+    MYSQL_SLOW_QUERY_MS = float(os.environ.get('MYSQL_SLOW_QUERY_MS') or 200)
+    MYSQL_SLOW_QUERY_LOG = os.environ.get('MYSQL_SLOW_QUERY_LOG') or ''
+    MYSQL_QUERY_BUDGET = int(os.environ.get('MYSQL_QUERY_BUDGET') or 25)
+    MYSQL_QUERY_BUDGET_MODE = os.environ.get('MYSQL_QUERY_BUDGET_MODE') or ''
+    REQUEST_DEADLINE_MS = int(os.environ.get('REQUEST_DEADLINE_MS') or 15000)
+    REQUEST_DEADLINE_MAX_MS = int(os.environ.get('REQUEST_DEADLINE_MAX_MS') or 60000)
+    REQUEST_DEADLINES = os.environ.get('REQUEST_DEADLINES') or ''
+    MYSQL_RETRY_MAX_ATTEMPTS = int(os.environ.get('MYSQL_RETRY_MAX_ATTEMPTS') or 3)
+    MYSQL_RETRY_BASE_DELAY_MS = int(os.environ.get('MYSQL_RETRY_BASE_DELAY_MS') or 50)
+    MYSQL_RETRY_MAX_DELAY_MS = int(os.environ.get('MYSQL_RETRY_MAX_DELAY_MS') or 1000)
+    MYSQL_RETRY_BUDGET_RATIO = float(os.environ.get('MYSQL_RETRY_BUDGET_RATIO') or 0.2)
     JWT_SECRET = os.environ.get('JWT_SECRET') or 'your-jwt-secret'
 
 class DevelopmentConfig(Config):
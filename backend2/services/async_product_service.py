@@ -0,0 +1,232 @@
+"""
+Asyncio variant of the catalog read services on aiomysql.
+Shares SQL and row shaping with services.product_service so both
+execution modes return identical response data, and goes through the
+same row and page caches, request deadline and query accounting.
+Services need an app context.
+"""
+import asyncio
+import copy
+import time
+
+import aiomysql
+
+from services.deadline import mark_deadline_exceeded, remaining, with_max_execution_time
+from services.product_cache import get_product_cache
+from services.product_service import (
+    DEFAULT_PRODUCT_SORT,
+    build_products,
+    build_products_page,
+    build_products_page_query,
+    build_products_count_query,
+    build_products_list_query,
+    cached_product_total,
+    decode_cursor,
+    page_cache_key,
+    page_cache_tags,
+    parse_product_sort,
+    product_detail_query,
+    products_by_ids_query,
+    project,
+    store_product_total,
+    parse_specifications,
+    convert_decimals
+)
+from services.query_metrics import record_query
+from services.single_flight import SingleFlightTimeout, get_async_single_flight
+from services.taxonomy import (
+    TAXONOMY_CATEGORIES_QUERY, TAXONOMY_SUBCATEGORIES_QUERY, Taxonomy, current_taxonomy, swap_taxonomy
+)
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_async_pool(config):
+    """Create the aiomysql pool from the Flask app config"""
+    global _pool
+    if _pool is not None:
+        return _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await aiomysql.create_pool(
+                host=config['MYSQL_HOST'],
+                user=config['MYSQL_USER'],
+                password=config['MYSQL_PASSWORD'],
+                db=config['MYSQL_DB'],
+                port=config['MYSQL_PORT'],
+                charset='utf8mb4',
+                cursorclass=aiomysql.DictCursor,
+                autocommit=True,  # Read-only services, no transactions to manage
+                minsize=config.get('MYSQL_POOL_MIN_SIZE', 1),
+                maxsize=config.get('MYSQL_ASYNC_POOL_MAX_SIZE', 50),
+                pool_recycle=config.get('MYSQL_POOL_RECYCLE', 3600),
+            )
+    return _pool
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+def get_async_pool_stats():
+    """Pool statistics in the same shape as the sync pool where possible"""
+    if _pool is None:
+        return None
+    return {
+        'size': _pool.size,
+        'in_use': _pool.size - _pool.freesize,
+        'idle': _pool.freesize,
+        'min_size': _pool.minsize,
+        'max_size': _pool.maxsize,
+    }
+
+
+async def _fetch(query, args=None, one=False):
+    """One read, bounded by the request deadline and recorded in the query metrics"""
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            raise mark_deadline_exceeded()
+        query = with_max_execution_time(query, max(int(left * 1000), 1))
+    async with _pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            start = time.perf_counter()
+            try:
+                await cursor.execute(query, args)
+                return await (cursor.fetchone() if one else cursor.fetchall())
+            except asyncio.CancelledError:
+                # Cut off mid-result by the deadline: the connection cannot go back to the pool
+                connection.close()
+                raise
+            finally:
+                record_query(query, time.perf_counter() - start, cursor.rowcount)
+
+
+async def get_all_products_service(fields=None, filters=None):
+    """Get all products with categories and subcategories, or only fields"""
+    try:
+        return build_products(list(await _fetch(*build_products_list_query(fields, filters))))
+    except Exception as e:
+        print(f"Error getting all products: {e}")
+        return []
+
+
+async def get_products_page_service(limit, cursor=None, sort=DEFAULT_PRODUCT_SORT, fields=None, filters=None):
+    """One page of products after cursor; raises ValueError for a bad sort or cursor"""
+    sort = sort or DEFAULT_PRODUCT_SORT
+    parse_product_sort(sort)
+    after = decode_cursor(cursor, sort) if cursor else None
+    query, args = build_products_page_query(sort, after, limit, fields, filters)
+    caches = get_product_cache()
+    if caches is not None:
+        key = page_cache_key(limit, cursor, sort, fields, filters)
+        cached = caches.pages.get_many([key]).get(key)
+        if cached is not None:
+            return cached
+        generation = caches.pages.generation
+    try:
+        page = build_products_page(list(await _fetch(query, args)), sort, limit, fields)
+    except Exception as e:
+        print(f"Error getting products page: {e}")
+        return {'items': [], 'has_more': False, 'next_cursor': None}
+    if caches is not None:
+        caches.pages.put(key, page, generation, page_cache_tags(page, sort, filters))
+    return page
+
+
+async def get_products_total_service(filters=None):
+    """Approximate product count, sharing the sync services' cache; filtered counts are not cached"""
+    if not filters:
+        total = cached_product_total()
+        if total is not None:
+            return total
+    query, args = build_products_count_query(filters)
+    try:
+        total = (await _fetch(query, args, one=True))['total']
+        return total if filters else store_product_total(total)
+    except Exception as e:
+        print(f"Error counting products: {e}")
+        return None
+
+
+async def _read_product(product_id, fields):
+    product = parse_specifications(await _fetch(product_detail_query(fields), (product_id,), one=True))
+    return convert_decimals(product) if product else None
+
+
+async def get_product_by_id_service(product_id, fields=None):
+    """
+    Get product by ID with category information, or only fields, from the
+    shared row cache when it holds it. Concurrent misses share one query.
+    """
+    caches = get_product_cache()
+    if caches is not None:
+        cached = caches.rows.get_many([product_id]).get(product_id)
+        if cached is not None:
+            return project(cached, fields)
+        generation = caches.rows.generation
+    try:
+        product, shared = await get_async_single_flight().do(('product', product_id, fields), _read_product, product_id, fields)
+        if shared:
+            product = copy.deepcopy(product)
+    except SingleFlightTimeout as e:
+        # Not a missing product: the handler's 404 becomes a 504
+        mark_deadline_exceeded()
+        print(f"Error getting product by ID: {e}")
+        return None
+    except Exception as e:
+        print(f"Error getting product by ID: {e}")
+        return None
+    if caches is not None and not fields:
+        caches.rows.put(product_id, product, generation)
+    return product
+
+
+async def get_products_by_ids_service(product_ids, fields=None):
+    """Many products by id in one IN (...) query: (products in request order, missing ids)"""
+    try:
+        rows = await _fetch(products_by_ids_query(len(product_ids), fields), product_ids)
+    except Exception as e:
+        print(f"Error getting products by ids: {e}")
+        return None, None
+    found = {product['id']: product for product in build_products(list(rows))}
+    products = [found[product_id] for product_id in product_ids if product_id in found]
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    return products, missing
+
+
+async def _taxonomy():
+    """The taxonomy snapshot shared with the Flask services; needs an app context"""
+    snapshot = current_taxonomy()
+    if snapshot is None:
+        snapshot, _ = await get_async_single_flight().do(('taxonomy',), _load_taxonomy)
+    return snapshot
+
+
+async def _load_taxonomy():
+    categories = await _fetch(TAXONOMY_CATEGORIES_QUERY)
+    subcategories = await _fetch(TAXONOMY_SUBCATEGORIES_QUERY)
+    return swap_taxonomy(Taxonomy(categories, subcategories))
+
+
+async def get_categories_service():
+    """Get all categories with subcategories"""
+    try:
+        return (await _taxonomy()).tree()
+    except Exception as e:
+        print(f"Error getting categories: {e}")
+        return []
+
+
+async def get_subcategories_by_category_service(category_id):
+    """Get subcategories for a specific category"""
+    try:
+        return (await _taxonomy()).subcategories_of(category_id)
+    except Exception as e:
+        print(f"Error getting subcategories: {e}")
+        return []
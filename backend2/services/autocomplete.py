@@ -0,0 +1,260 @@
+"""
+In-memory autocomplete over product names for search-as-you-type.
+Word prefixes come from a sorted vocabulary (bisect), typos from a
+trigram index over the same vocabulary checked with a bounded edit
+distance. Lookups never touch the database.
+"""
+import bisect
+import heapq
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+
+from flask import current_app
+
+from services.search import tokenize
+
+# Longest name kept per product; longer names are truncated
+MAX_NAME_LENGTH = 120
+# Vocabulary words expanded per prefix or typo, bounds the cost of short queries
+MAX_EXPANSIONS = 64
+# Approximate cost of one set/dict/list slot, for the running memory estimate
+SLOT_BYTES = 16
+EMPTY_SET_BYTES = sys.getsizeof(set())
+
+_index_lock = threading.Lock()
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_typos(word):
+    """Edits tolerated for a query word: none for short words, more for long ones"""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+class SuggestIndex:
+    """
+    Product names by word, for prefix and typo-tolerant lookups.
+    Holds at most max_products names: a new product evicts the one least
+    recently added or suggested, so new products are always suggested.
+    """
+
+    def __init__(self, max_products=100000):
+        self.max_products = max_products
+        # Least recently added or suggested first
+        self._names = OrderedDict()
+        self._words = {}
+        self._postings = defaultdict(set)
+        self._vocabulary = []
+        self._trigrams = defaultdict(set)
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.built = False
+        self.evicted = 0
+
+    def _add_word(self, word, product_id):
+        postings = self._postings[word]
+        if not postings:
+            bisect.insort(self._vocabulary, word)
+            self._bytes += sys.getsizeof(word) + EMPTY_SET_BYTES + 2 * SLOT_BYTES
+            for gram in trigrams(word):
+                words = self._trigrams[gram]
+                if not words:
+                    self._bytes += sys.getsizeof(gram) + EMPTY_SET_BYTES + SLOT_BYTES
+                words.add(word)
+                self._bytes += SLOT_BYTES
+        postings.add(product_id)
+        self._bytes += SLOT_BYTES
+
+    def _remove_word(self, word, product_id):
+        postings = self._postings.get(word)
+        if postings is None or product_id not in postings:
+            return
+        postings.discard(product_id)
+        self._bytes -= SLOT_BYTES
+        if postings:
+            return
+        del self._postings[word]
+        self._bytes -= sys.getsizeof(word) + EMPTY_SET_BYTES + 2 * SLOT_BYTES
+        position = bisect.bisect_left(self._vocabulary, word)
+        if position < len(self._vocabulary) and self._vocabulary[position] == word:
+            del self._vocabulary[position]
+        for gram in trigrams(word):
+            words = self._trigrams.get(gram)
+            if words is not None and word in words:
+                words.discard(word)
+                self._bytes -= SLOT_BYTES
+                if not words:
+                    del self._trigrams[gram]
+                    self._bytes -= sys.getsizeof(gram) + EMPTY_SET_BYTES + SLOT_BYTES
+
+    def add(self, product_id, name):
+        with self._lock:
+            self._remove(product_id)
+            while len(self._names) >= self.max_products > 0:
+                self._remove(next(iter(self._names)))
+                self.evicted += 1
+            if self.max_products <= 0:
+                return
+            name = (name or '')[:MAX_NAME_LENGTH]
+            words = tuple(dict.fromkeys(tokenize(name)))
+            self._names[product_id] = name
+            self._words[product_id] = words
+            self._bytes += sys.getsizeof(name) + sys.getsizeof(words) + 2 * SLOT_BYTES
+            for word in words:
+                self._add_word(word, product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        name = self._names.pop(product_id, None)
+        if name is None:
+            return
+        words = self._words.pop(product_id, ())
+        self._bytes -= sys.getsizeof(name) + sys.getsizeof(words) + 2 * SLOT_BYTES
+        for word in words:
+            self._remove_word(word, product_id)
+
+    def build(self, products):
+        """Replace the contents; products newest first, as SUGGEST_NAMES_QUERY returns them"""
+        with self._lock:
+            for product_id in list(self._names):
+                self._remove(product_id)
+            self.evicted = 0
+            # Oldest added first, so they are the first evicted
+            for product in reversed(list(products)):
+                self.add(product['id'], product['name'])
+            self.built = True
+
+    def _prefixed(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for word in self._vocabulary[start:start + MAX_EXPANSIONS]:
+            if not word.startswith(prefix):
+                break
+            yield word
+
+    def _similar(self, word, as_prefix):
+        """(vocabulary word, edits) pairs within max_typos(word) of word"""
+        limit = max_typos(word)
+        if not limit:
+            return []
+        overlap = defaultdict(int)
+        for gram in trigrams(word):
+            for candidate in self._trigrams.get(gram, ()):
+                overlap[candidate] += 1
+        candidates = heapq.nlargest(MAX_EXPANSIONS, overlap.items(), key=lambda item: item[1])
+        similar = []
+        for candidate, _ in candidates:
+            target = candidate[:len(word)] if as_prefix else candidate
+            edits = edit_distance(word, target, limit)
+            if edits <= limit:
+                similar.append((candidate, edits))
+        return similar
+
+    def _word_scores(self, word, as_prefix):
+        """product_id -> best score for one query word"""
+        scores = {}
+
+        def credit(candidate, score):
+            for product_id in self._postings.get(candidate, ()):
+                if scores.get(product_id, 0) < score:
+                    scores[product_id] = score
+
+        credit(word, 3.0)
+        if as_prefix:
+            for candidate in self._prefixed(word):
+                credit(candidate, 2.0)
+        for candidate, edits in self._similar(word, as_prefix):
+            credit(candidate, 2.0 - 0.5 * edits)
+        return scores
+
+    def suggest(self, text, limit=10):
+        """
+        Up to limit {'id', 'name'} matches for text, best first. Every word
+        must match; the last one may be an unfinished prefix.
+        """
+        words = tokenize(text)
+        if not words:
+            return []
+        with self._lock:
+            totals = None
+            for position, word in enumerate(words):
+                scores = self._word_scores(word, as_prefix=position == len(words) - 1)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {pid: totals[pid] + score for pid, score in scores.items() if pid in totals}
+                if not totals:
+                    return []
+            ranked = heapq.nlargest(
+                limit, totals.items(),
+                # Higher score, then shorter name, then newer product
+                key=lambda item: (item[1], -len(self._names[item[0]]), item[0])
+            )
+            for product_id, _ in ranked:
+                # Suggested products are the last to be evicted
+                self._names.move_to_end(product_id)
+            return [{'id': product_id, 'name': self._names[product_id]} for product_id, _ in ranked]
+
+    def memory_bytes(self):
+        """Approximate size of names, postings and vocabulary, kept up to date by add/remove"""
+        return self._bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'built': self.built,
+                'products': len(self._names),
+                'max_products': self.max_products,
+                'evicted': self.evicted,
+                'words': len(self._vocabulary),
+                'trigrams': len(self._trigrams),
+            }
+
+
+def get_suggest_index(app=None):
+    """The app's autocomplete index, created empty on first use"""
+    app = app or current_app._get_current_object()
+    index = app.extensions.get('suggest_index')
+    if index is None:
+        with _index_lock:
+            index = app.extensions.get('suggest_index')
+            if index is None:
+                index = SuggestIndex(app.config.get('AUTOCOMPLETE_MAX_PRODUCTS', 100000))
+                app.extensions['suggest_index'] = index
+    return index
+
+
+def get_suggest_stats(app=None):
+    """Index size and approximate memory, or None before first use"""
+    app = app or current_app._get_current_object()
+    index = app.extensions.get('suggest_index')
+    if index is None:
+        return None
+    return dict(index.stats(), memory_bytes=index.memory_bytes())
@@ -0,0 +1,392 @@
+"""
+Catalog snapshot shared by every worker process through a memory-mapped file.
+
+One process builds the file (products as ready-to-send JSON behind an
+id-sorted offset index) and publishes it with an atomic rename; every worker
+maps it read-only, so the catalog is held once per host whatever the worker
+count, and responses are assembled from byte slices without decoding rows.
+
+A generation counter in a second mapped file says which writes a snapshot
+includes: writers bump it after commit, readers only use a snapshot built
+for the current generation, so a stale snapshot is never served. Stock-only
+writes leave it alone: their new stock is patched into the published file
+in place, in a fixed-width slot at the start of every product.
+"""
+import bisect
+import contextlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock(), so no shared snapshot (see supported())
+    fcntl = None
+
+MAGIC = b'CATSNAP1'
+# magic, generation, build time (ns since epoch), product count
+HEADER = struct.Struct('<8sQQI4x')
+COUNTER = struct.Struct('<Q')
+# Every product starts with its stock, padded so any INT fits in place
+STOCK_PREFIX = b'{"stock":'
+STOCK_WIDTH = 11
+
+_catalog_lock = threading.Lock()
+_catalogs = weakref.WeakSet()
+
+
+def encode_stock(stock):
+    """Fixed-width JSON of stock (leading spaces are JSON whitespace), or None if it does not fit"""
+    if not isinstance(stock, int):
+        return None
+    text = str(stock).rjust(STOCK_WIDTH)
+    return text.encode('ascii') if len(text) == STOCK_WIDTH else None
+
+
+def encode_product(product, list_fields):
+    """
+    Detail JSON of product laid out as its list JSON plus the detail-only
+    keys, so the list item is a prefix. Returns (bytes, prefix length).
+    A listed stock goes first, in the slot patch_stock() rewrites.
+    """
+    listed = {field: product[field] for field in list_fields if field in product}
+    extra = {field: value for field, value in product.items() if field not in listed}
+    stock = encode_stock(listed.get('stock'))
+    if stock is not None:
+        del listed['stock']
+    prefix = json.dumps(listed, separators=(',', ':'))[:-1]
+    if stock is not None:
+        prefix = STOCK_PREFIX.decode('ascii') + stock.decode('ascii') + (',' + prefix[1:] if listed else '')
+    if not extra:
+        return (prefix + '}').encode('utf-8'), len(prefix.encode('utf-8'))
+    detail = prefix + ',' + json.dumps(extra, separators=(',', ':'))[1:]
+    return detail.encode('utf-8'), len(prefix.encode('utf-8'))
+
+
+def write_snapshot(path, generation, products, list_fields):
+    """Write products (any order) to path atomically; readers see the old or the new file"""
+    entries = sorted(
+        ((product['id'],) + encode_product(product, list_fields) for product in products),
+        key=lambda entry: entry[0]
+    )
+    count = len(entries)
+    offsets, position = [], 0
+    for _, data, _ in entries:
+        offsets.append(position)
+        position += len(data)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, generation, time.time_ns(), count))
+        output.write(struct.pack(f'<{count}Q', *(entry[0] for entry in entries)))
+        output.write(struct.pack(f'<{count}Q', *offsets))
+        output.write(struct.pack(f'<{count}I', *(len(entry[1]) for entry in entries)))
+        output.write(struct.pack(f'<{count}I', *(entry[2] for entry in entries)))
+        for _, data, _ in entries:
+            output.write(data)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
+    return count
+
+
+class CatalogSnapshot:
+    """Read-only view of one snapshot file; slices point into the mapping"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as source:
+            self.identity = _identity(os.fstat(source.fileno()))
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.generation, self.built_at_ns, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es una instantánea del catálogo")
+        view = memoryview(self._map)
+        start = HEADER.size
+        self._ids = view[start:start + 8 * self.count].cast('Q')
+        start += 8 * self.count
+        self._offsets = view[start:start + 8 * self.count].cast('Q')
+        start += 8 * self.count
+        self._lengths = view[start:start + 4 * self.count].cast('I')
+        start += 4 * self.count
+        self._prefixes = view[start:start + 4 * self.count].cast('I')
+        self._data_start = start + 4 * self.count
+        self._data = view[self._data_start:]
+
+    def _position(self, product_id):
+        position = bisect.bisect_left(self._ids, product_id)
+        if position < self.count and self._ids[position] == product_id:
+            return position
+        return None
+
+    def product(self, product_id):
+        """Detail JSON of product_id, or None when it is not in the snapshot"""
+        position = self._position(product_id)
+        if position is None:
+            return None
+        offset = self._offsets[position]
+        return self._data[offset:offset + self._lengths[position]]
+
+    def patch_stock(self, path, product_id, stock):
+        """
+        Write stock into product_id's slot of the file at path, which must be
+        this snapshot's; False when the product or its slot is not there.
+        Mapped readers see the new bytes at once: the page cache is shared.
+        """
+        position = self._position(product_id)
+        value = encode_stock(stock)
+        if position is None or value is None:
+            return False
+        offset = self._offsets[position]
+        if self._lengths[position] < len(STOCK_PREFIX) + STOCK_WIDTH or \
+                self._data[offset:offset + len(STOCK_PREFIX)] != STOCK_PREFIX:
+            return False
+        descriptor = os.open(path, os.O_WRONLY)
+        try:
+            os.pwrite(descriptor, value, self._data_start + offset + len(STOCK_PREFIX))
+        finally:
+            os.close(descriptor)
+        return True
+
+    def page(self, limit, after_id=None, descending=True):
+        """(list JSON items, has_more, last id) of the page after after_id in id order"""
+        if descending:
+            end = bisect.bisect_left(self._ids, after_id) if after_id is not None else self.count
+            positions = range(end - 1, max(end - limit, 0) - 1, -1)
+            has_more = end - limit > 0
+        else:
+            start = bisect.bisect_right(self._ids, after_id) if after_id is not None else 0
+            positions = range(start, min(start + limit, self.count))
+            has_more = start + limit < self.count
+        items = []
+        for position in positions:
+            offset = self._offsets[position]
+            items.append(self._data[offset:offset + self._prefixes[position]])
+        last_id = self._ids[positions[-1]] if positions else None
+        return items, has_more, last_id
+
+
+class GenerationCounter:
+    """Shared uint64 in a mapped file: reads are a memory load, bumps take a file lock"""
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < COUNTER.size:
+            os.ftruncate(self._fd, COUNTER.size)
+        self._map = mmap.mmap(self._fd, COUNTER.size)
+
+    @property
+    def value(self):
+        return COUNTER.unpack_from(self._map, 0)[0]
+
+    def bump(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = self.value + 1
+            COUNTER.pack_into(self._map, 0, value)
+            return value
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class SharedCatalog:
+    """
+    This process's side of the shared snapshot: the current mapping, the
+    generation counter and a background builder that republishes the file
+    CATALOG_SNAPSHOT_DELAY seconds after the last write it was told about.
+    stock_loader(product_id=None) returns {id: stock} from the primaries,
+    of one product or of all of them.
+    """
+
+    def __init__(self, app, loader, list_fields, stock_loader):
+        self.path = app.config['CATALOG_SNAPSHOT_PATH']
+        self.delay = app.config.get('CATALOG_SNAPSHOT_DELAY', 1.0)
+        self._app = app
+        self._loader = loader
+        self._stock_loader = stock_loader
+        self._list_fields = list_fields
+        self._snapshot = None
+        self._reset_state()
+        self.served = 0
+        self.stale = 0
+        self.builds = 0
+        self.patches = 0
+        self.last_build_ms = None
+        _catalogs.add(self)
+
+    def _reset_state(self):
+        self._counter = GenerationCounter(f"{self.path}.gen")
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._builder = None
+
+    def _after_fork(self):
+        """The builder thread did not survive the fork, and flock() must not share the parent's counter fd"""
+        self._reset_state()
+
+    def current(self):
+        """The mapped snapshot if it includes every write so far, else None"""
+        generation = self._counter.value
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.generation != generation:
+            snapshot = self._remap()
+            if snapshot is None or snapshot.generation != generation:
+                self.stale += 1
+                return None
+        self.served += 1
+        return snapshot
+
+    def _remap(self):
+        """Map the published file if it is not the one already mapped"""
+        with self._lock:
+            try:
+                identity = _identity(os.stat(self.path))
+            except FileNotFoundError:
+                return None
+            if self._snapshot is None or self._snapshot.identity != identity:
+                # The old mapping lives on until its last slice is released
+                self._snapshot = CatalogSnapshot(self.path)
+            return self._snapshot
+
+    def changed(self):
+        """A product write committed: later reads skip the snapshot until it is rebuilt"""
+        self._counter.bump()
+        self.request_build()
+
+    def stock_changed(self, product_id):
+        """A stock-only write committed: patch the published snapshot, rebuilding only if that fails"""
+        try:
+            if self._patch_stock(product_id):
+                return
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el stock en la instantánea del catálogo: {e}")
+        self.changed()
+
+    def _patch_stock(self, product_id):
+        with _file_lock(f"{self.path}.patch"):
+            snapshot = self._remap()
+            if snapshot is None or snapshot.generation != self._counter.value:
+                # The pending rebuild reads the stock after this write
+                return True
+            # Read under the lock: the last patcher writes the last committed stock
+            stock = self._stock_loader(product_id).get(product_id)
+            if stock is None or not snapshot.patch_stock(self.path, product_id, stock):
+                return False
+        with self._lock:
+            self.patches += 1
+        return True
+
+    def request_build(self):
+        with self._lock:
+            if self._builder is None:
+                self._builder = threading.Thread(target=self._run, name='catalog-snapshot', daemon=True)
+                self._builder.start()
+        self._wanted.set()
+
+    def _run(self):
+        while True:
+            self._wanted.wait()
+            # Writes arriving during the delay share one rebuild
+            time.sleep(self.delay)
+            self._wanted.clear()
+            try:
+                self._build()
+            except Exception as e:
+                print(f"⚠️ No se pudo publicar la instantánea del catálogo: {e}")
+
+    def _build(self):
+        # One builder per host; the others find the work done
+        with _file_lock(f"{self.path}.lock"):
+            generation = self._counter.value
+            published = self._remap()
+            if published is not None and published.generation == generation:
+                return
+            started = time.perf_counter()
+            with self._app.app_context():
+                products = self._loader()
+                with _file_lock(f"{self.path}.patch"):
+                    # Stock patches made while loading went to the old file
+                    stock = self._stock_loader()
+                    for product in products:
+                        product['stock'] = stock.get(product['id'], product['stock'])
+                    count = write_snapshot(self.path, generation, products, self._list_fields)
+            self.builds += 1
+            self.last_build_ms = round((time.perf_counter() - started) * 1000, 1)
+            print(f"📦 Instantánea del catálogo publicada: {count} productos, generación {generation}")
+        if self._counter.value != generation:
+            # Written to while building: that snapshot is already stale
+            self._wanted.set()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'path': self.path,
+            'generation': self._counter.value,
+            'mapped_generation': snapshot.generation if snapshot else None,
+            'products': snapshot.count if snapshot else None,
+            'bytes': len(snapshot._map) if snapshot else None,
+            'served': self.served,
+            'stale': self.stale,
+            'builds': self.builds,
+            'stock_patches': self.patches,
+            'last_build_ms': self.last_build_ms,
+        }
+
+
+def _identity(stat):
+    # Not st_mtime_ns: stock patches rewrite the published file in place
+    return stat.st_ino, stat.st_size
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Exclusive lock across the host's processes (and threads: each holds its own open file)"""
+    with open(path, 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _reset_catalogs_after_fork():
+    for catalog in list(_catalogs):
+        catalog._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_catalogs_after_fork)
+
+
+def supported():
+    """Whether this platform has the file locks and positional writes the snapshot needs"""
+    return fcntl is not None and hasattr(os, 'pwrite')
+
+
+def get_shared_catalog(loader, list_fields, stock_loader, app=None):
+    """The app's shared snapshot, or None when CATALOG_SNAPSHOT_PATH is empty or unsupported here"""
+    app = app or current_app._get_current_object()
+    if not app.config.get('CATALOG_SNAPSHOT_PATH'):
+        return None
+    if not supported():
+        if not app.extensions.get('catalog_snapshot_unsupported'):
+            app.extensions['catalog_snapshot_unsupported'] = True
+            print("⚠️ CATALOG_SNAPSHOT_PATH ignorado: la instantánea del catálogo necesita fcntl y os.pwrite (POSIX)")
+        return None
+    catalog = app.extensions.get('catalog_snapshot')
+    if catalog is None:
+        with _catalog_lock:
+            catalog = app.extensions.get('catalog_snapshot')
+            if catalog is None:
+                catalog = SharedCatalog(app, loader, list_fields, stock_loader)
+                app.extensions['catalog_snapshot'] = catalog
+    return catalog
+
+
+def get_catalog_snapshot_stats(app=None):
+    app = app or current_app._get_current_object()
+    catalog = app.extensions.get('catalog_snapshot')
+    return catalog.stats() if catalog else None
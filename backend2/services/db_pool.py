@@ -0,0 +1,366 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import pymysql
+from pymysql.constants import CLIENT, SERVER_STATUS
+from flask import current_app
+
+from services.query_metrics import InstrumentedDictCursor
+
+# Pools alive in this process, reset in the child after a fork
+_pools = weakref.WeakSet()
+_pools_lock = threading.Lock()
+# Guards lazy creation of the per-app pools
+_app_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class _PoolEntry:
+    """Raw connection plus the bookkeeping the pool needs for it"""
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """Proxy around a pymysql connection; close() returns it to the pool"""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        # A checkout dropped without close() gives its slot back when collected
+        self._finalizer = weakref.finalize(self, pool._collected, entry, pool._pid)
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get('_entry')
+        if entry is None:
+            raise pymysql.err.InterfaceError(0, "Conexión ya devuelta al pool")
+        return getattr(entry.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def raw(self):
+        return self._entry.raw if self._entry else None
+
+    def close(self):
+        """Return the connection to the pool instead of closing the socket"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._finalizer.detach()
+            self._pool._release(entry)
+
+    def discard(self):
+        """Close the underlying socket and drop it from the pool"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._finalizer.detach()
+            self._pool._discard(entry)
+
+
+class ConnectionPool:
+    """Thread-safe pool of pymysql connections with pre-ping and recycling"""
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, timeout=5.0,
+                 recycle=3600, pre_ping=True, ping_interval=30, connect=None):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Tamaño de pool inválido")
+        self.connect_kwargs = dict(connect_kwargs)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.ping_interval = ping_interval
+        self._connect = connect or pymysql.connect
+        self._reset_state()
+        with _pools_lock:
+            _pools.add(self)
+
+    def _reset_state(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        # Entries of checkouts collected without close(), see _collected()
+        self._leaked = deque()
+        self._size = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'leaked': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _after_fork(self):
+        """Forget connections inherited from the parent without touching their sockets"""
+        self._reset_state()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._after_fork()
+
+    def _new_entry(self):
+        entry = _PoolEntry(self._connect(**self.connect_kwargs))
+        with self._cond:
+            self._stats['created'] += 1
+        return entry
+
+    def _close_raw(self, entry):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, entry, now):
+        """Recycle old connections and ping the ones that sat idle too long"""
+        if self.recycle and now - entry.created_at > self.recycle:
+            reason = 'recycled'
+        elif self.pre_ping and now - entry.last_used >= self.ping_interval:
+            try:
+                entry.raw.ping(reconnect=False)
+                return True
+            except Exception:
+                reason = 'discarded'
+        else:
+            return True
+        with self._cond:
+            self._stats[reason] += 1
+        return False
+
+    def prefill(self):
+        """Open connections until min_size is reached"""
+        self._check_pid()
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._new_entry()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Check out a connection, waiting up to timeout seconds for a free slot"""
+        self._check_pid()
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        entry = None
+        leaked = []
+        with self._cond:
+            while True:
+                leaked += self._drain_leaked()
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No hay conexiones disponibles tras {timeout}s "
+                        f"(máximo {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+        self._close_all(leaked)
+
+        if entry is not None and not self._is_usable(entry, time.monotonic()):
+            self._close_raw(entry)
+            entry = None
+
+        if entry is None:
+            try:
+                entry = self._new_entry()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        return PooledConnection(self, entry)
+
+    def _release(self, entry):
+        if self._pid != os.getpid():
+            return
+        raw = entry.raw
+        try:
+            if not raw.open:
+                raise pymysql.err.InterfaceError(0, "Conexión cerrada")
+            # Only pay the round trip when a transaction was left open
+            if raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                raw.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+            leaked = self._drain_leaked()
+        self._close_all(leaked)
+
+    def _discard(self, entry):
+        self._close_raw(entry)
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def _collected(self, entry, pid):
+        """
+        Finalizer of a checkout garbage collected without close(): its
+        state is unknown, so the socket is closed and the slot freed.
+        """
+        if pid != self._pid:
+            # Checked out before a fork: the socket belongs to the parent
+            return
+        self._leaked.append(entry)
+        # Never block here: the collector may run while this thread holds the lock
+        if self._cond.acquire(blocking=False):
+            try:
+                leaked = self._drain_leaked()
+            finally:
+                self._cond.release()
+            self._close_all(leaked)
+
+    def _drain_leaked(self):
+        """Free the slots of collected checkouts; caller holds the lock and closes them"""
+        leaked = []
+        while self._leaked:
+            leaked.append(self._leaked.popleft())
+        if leaked:
+            self._size -= len(leaked)
+            self._stats['leaked'] += len(leaked)
+            self._cond.notify(len(leaked))
+        return leaked
+
+    def _close_all(self, entries):
+        for entry in entries:
+            self._close_raw(entry)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._close_raw(entry)
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            idle = len(self._idle)
+            checkouts = self._stats['checkouts']
+            return {
+                'size': self._size,
+                'in_use': self._size - idle,
+                'idle': idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': checkouts,
+                'timeouts': self._stats['timeouts'],
+                'created': self._stats['created'],
+                'recycled': self._stats['recycled'],
+                'discarded': self._stats['discarded'],
+                'leaked': self._stats['leaked'],
+                'wait_time_avg_ms': round(
+                    self._stats['wait_time_total'] * 1000 / checkouts, 3
+                ) if checkouts else 0.0,
+                'wait_time_max_ms': round(self._stats['wait_time_max'] * 1000, 3),
+            }
+
+
+def _reset_pools_after_fork():
+    for pool in list(_pools):
+        pool._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def mysql_connect_kwargs(config):
+    """pymysql.connect() arguments taken from a Flask config mapping"""
+    return {
+        'host': config['MYSQL_HOST'],
+        'user': config['MYSQL_USER'],
+        'password': config['MYSQL_PASSWORD'],
+        'database': config['MYSQL_DB'],
+        'port': config['MYSQL_PORT'],
+        'charset': 'utf8mb4',
+        'cursorclass': InstrumentedDictCursor,
+        'autocommit': False,  # Ensure manual transaction control
+        # rowcount counts matched rows, so an UPDATE that changes nothing still finds its row
+        'client_flag': CLIENT.FOUND_ROWS,
+    }
+
+
+def create_pool_from_config(config, connect_kwargs=None):
+    """Build a ConnectionPool from the MYSQL_POOL_* settings"""
+    return ConnectionPool(
+        connect_kwargs or mysql_connect_kwargs(config),
+        min_size=config.get('MYSQL_POOL_MIN_SIZE', 1),
+        max_size=config.get('MYSQL_POOL_MAX_SIZE', 10),
+        timeout=config.get('MYSQL_POOL_TIMEOUT', 5.0),
+        recycle=config.get('MYSQL_POOL_RECYCLE', 3600),
+        pre_ping=config.get('MYSQL_POOL_PRE_PING', True),
+        ping_interval=config.get('MYSQL_POOL_PING_INTERVAL', 30),
+    )
+
+
+def get_pool(app=None):
+    """Return the primary pool for the app, creating it on first use"""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('mysql_pool')
+    if pool is None:
+        with _app_pools_lock:
+            pool = app.extensions.get('mysql_pool')
+            if pool is None:
+                pool = create_pool_from_config(app.config)
+                app.extensions['mysql_pool'] = pool
+        try:
+            pool.prefill()
+        except Exception as e:
+            print(f"⚠️ No se pudo precargar el pool de MySQL: {e}")
+    return pool
+
+
+def get_pool_stats(app=None):
+    """Pool statistics, or None when the pool was never used"""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('mysql_pool')
+    return pool.stats() if pool else None
@@ -0,0 +1,187 @@
+import re
+import time
+from contextvars import ContextVar
+
+import pymysql
+from pymysql.constants import CR
+from flask import current_app, g, has_request_context, jsonify, request
+
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+# MySQL aborts a SELECT that hits its MAX_EXECUTION_TIME with this error
+ER_QUERY_TIMEOUT = 3024
+
+_SELECT = re.compile(r'^\s*SELECT\b(?!\s*/\*\+)', re.I)
+
+# Deadline of the current ASGI request, which has no Flask request context
+_async_deadline = ContextVar('request_deadline', default=None)
+
+DEADLINE_EXCEEDED_BODY = {
+    'success': False,
+    'message': 'Tiempo de espera agotado',
+    'code': 'DEADLINE_EXCEEDED'
+}
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before or during a database statement"""
+
+
+def parse_endpoint_deadlines(value):
+    """Parse 'productlistresource=10000,categorylistresource=3000' into a dict"""
+    deadlines = {}
+    for item in (value or '').split(','):
+        endpoint, _, ms = item.strip().partition('=')
+        if endpoint and ms:
+            deadlines[endpoint.strip()] = int(ms)
+    return deadlines
+
+
+def _request_timeout_ms():
+    return request_timeout_ms(current_app.config, request.headers.get(DEADLINE_HEADER), request.endpoint)
+
+
+def request_timeout_ms(config, header, endpoint):
+    """Client header first (capped), then the endpoint setting, then the default"""
+    if header:
+        try:
+            return min(max(int(header), 1), config.get('REQUEST_DEADLINE_MAX_MS', 60000))
+        except ValueError:
+            pass
+    endpoint_deadlines = config.get('REQUEST_DEADLINES') or {}
+    if isinstance(endpoint_deadlines, str):
+        endpoint_deadlines = parse_endpoint_deadlines(endpoint_deadlines)
+    return endpoint_deadlines.get(endpoint, config.get('REQUEST_DEADLINE_MS', 0))
+
+
+def _start_deadline():
+    timeout_ms = _request_timeout_ms()
+    g._deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+
+
+class AsyncDeadline:
+    """Deadline of one ASGI request; services flag it like g._deadline_exceeded"""
+
+    def __init__(self, timeout_ms):
+        self.timeout = timeout_ms / 1000 if timeout_ms else None
+        self.at = time.monotonic() + self.timeout if timeout_ms else None
+        self.exceeded = False
+        self._token = None
+
+    def __enter__(self):
+        self._token = _async_deadline.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _async_deadline.reset(self._token)
+
+
+def remaining():
+    """Seconds left for the current request, or None when it has no deadline"""
+    if not has_request_context():
+        deadline = _async_deadline.get()
+        return None if deadline is None or deadline.at is None else deadline.at - time.monotonic()
+    deadline = g.get('_deadline')
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def release_deadline():
+    """Lift the deadline for the rest of the request, for responses streamed past it"""
+    if has_request_context():
+        g._deadline = None
+
+
+def mark_deadline_exceeded():
+    if has_request_context():
+        g._deadline_exceeded = True
+    elif _async_deadline.get() is not None:
+        _async_deadline.get().exceeded = True
+    return DeadlineExceeded("Tiempo límite de la solicitud agotado")
+
+
+def is_timeout(error):
+    """Whether error means a caller ran out of time, rather than something about what it read"""
+    if isinstance(error, (DeadlineExceeded, TimeoutError)):
+        return True
+    code = error.args[0] if isinstance(error, pymysql.err.OperationalError) and error.args else None
+    return code in (ER_QUERY_TIMEOUT, CR.CR_SERVER_LOST)
+
+
+def mark_pool_exhausted():
+    if has_request_context():
+        g._pool_exhausted = True
+
+
+def checkout_timeout(default):
+    """Pool checkout timeout, never longer than the time the request has left"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise mark_deadline_exceeded()
+    return min(default, left)
+
+
+def with_max_execution_time(query, timeout_ms):
+    """Add a MAX_EXECUTION_TIME optimizer hint to a SELECT"""
+    if isinstance(query, str) and _SELECT.match(query):
+        return _SELECT.sub(lambda m: f"{m.group(0)} /*+ MAX_EXECUTION_TIME({timeout_ms}) */", query, count=1)
+    return query
+
+
+class DeadlineCursorMixin:
+    """Bounds every statement by the time the current request has left"""
+
+    def execute(self, query, args=None):
+        left = remaining()
+        if left is None:
+            return super().execute(query, args)
+        if left <= 0:
+            raise mark_deadline_exceeded()
+
+        query = with_max_execution_time(query, max(int(left * 1000), 1))
+        sock = getattr(self.connection, '_sock', None)
+        if sock is not None:
+            # Covers writes and lock waits, which the SELECT hint cannot bound
+            sock.settimeout(left)
+        try:
+            return super().execute(query, args)
+        except pymysql.err.OperationalError as e:
+            code = e.args[0] if e.args else None
+            if code == ER_QUERY_TIMEOUT or (code == CR.CR_SERVER_LOST and remaining() <= 0):
+                raise mark_deadline_exceeded() from e
+            raise
+        finally:
+            sock = getattr(self.connection, '_sock', None)
+            if sock is not None:
+                sock.settimeout(self.connection._read_timeout)
+
+
+def _deadline_response(response):
+    """Turn a response into 504/503 when a deadline or the pool gave out underneath it"""
+    if g.get('_deadline_exceeded'):
+        response = jsonify(DEADLINE_EXCEEDED_BODY)
+        response.status_code = 504
+    elif g.get('_pool_exhausted'):
+        response = jsonify({
+            'success': False,
+            'message': 'Servicio saturado, intente de nuevo',
+            'code': 'DB_POOL_EXHAUSTED'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+    return response
+
+
+def _handle_deadline_exceeded(error):
+    g._deadline_exceeded = True
+    return _deadline_response(jsonify({}))
+
+
+def init_deadlines(app):
+    """Per-request deadlines; services swallow errors, so the status is fixed up after the view"""
+    app.before_request(_start_deadline)
+    app.after_request(_deadline_response)
+    app.register_error_handler(DeadlineExceeded, _handle_deadline_exceeded)
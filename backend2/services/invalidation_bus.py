@@ -0,0 +1,433 @@
+"""
+Cross-instance invalidation bus for the in-process product and taxonomy caches.
+
+Write services publish what they changed after commit; a background thread
+per process batches and coalesces those events, hands them to a transport,
+polls the transport for other processes' events and applies them locally.
+
+Transports (INVALIDATION_TRANSPORT):
+  database   cache_invalidations change-version table on the home primary,
+             polled by primary key (default)
+  multicast  UDP datagrams to a multicast group; per-origin sequence
+             numbers detect lost batches
+  memory     in-process stand-in, for a single process or tests
+  none       disabled
+
+Staleness is bounded: a peer applies a write within INVALIDATION_FLUSH_INTERVAL
++ INVALIDATION_POLL_INTERVAL; when the transport fails for longer than
+INVALIDATION_MAX_STALENESS, or loses a batch, local caches are dropped instead.
+"""
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+import weakref
+
+from flask import current_app
+
+TRANSPORTS = ('database', 'multicast', 'memory', 'none')
+
+# Same table as the seeder's; SQLite gets its own from the engine schema
+CREATE_INVALIDATIONS = """
+    CREATE TABLE IF NOT EXISTS cache_invalidations (
+        version BIGINT AUTO_INCREMENT PRIMARY KEY,
+        origin VARCHAR(100) NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        entity_id INT NULL,
+        stock_only BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+INSERT_INVALIDATION = """
+    INSERT INTO cache_invalidations (origin, kind, entity_id, stock_only)
+    VALUES (%s, %s, %s, %s)
+"""
+SELECT_INVALIDATIONS = """
+    SELECT version, origin, kind, entity_id, stock_only
+    FROM cache_invalidations
+    WHERE version > %s
+    ORDER BY version
+    LIMIT %s
+"""
+LAST_INVALIDATION = "SELECT MAX(version) AS version FROM cache_invalidations"
+PRUNE_INVALIDATIONS = "DELETE FROM cache_invalidations WHERE version <= %s"
+
+# Rows read per poll query; a fuller backlog takes several queries
+POLL_BATCH = 1000
+# Multicast payloads stay under a typical datagram size
+MAX_DATAGRAM_EVENTS = 200
+
+_bus_lock = threading.Lock()
+_buses = weakref.WeakSet()
+
+
+def event_key(event):
+    return event['kind'], event.get('id')
+
+
+def coalesce(events):
+    """
+    One event per (kind, id), in first-seen order. A full invalidation
+    absorbs a stock-only one for the same product.
+    """
+    merged = {}
+    for event in events:
+        key = event_key(event)
+        if key in merged:
+            merged[key] = dict(merged[key], stock_only=merged[key]['stock_only'] and event['stock_only'])
+        else:
+            merged[key] = event
+    return list(merged.values())
+
+
+class DatabaseTransport:
+    """Change-version table: publish is one multi-row insert, poll a primary key range scan"""
+
+    def __init__(self, app, connect):
+        self.retain = app.config.get('INVALIDATION_RETAIN', 10000)
+        self._create_table = (app.config.get('STORAGE_ENGINE') or 'mysql').lower() == 'mysql'
+        self._connect = connect
+        self._last_version = None
+        self._since_prune = 0
+
+    def _run(self, fn):
+        connection = self._connect()
+        if not connection:
+            raise RuntimeError("Error de conexión a la base de datos")
+        try:
+            with connection.cursor() as cursor:
+                result = fn(cursor)
+            connection.commit()
+            return result
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _last(cursor):
+        cursor.execute(LAST_INVALIDATION)
+        row = cursor.fetchone()
+        return (row or {}).get('version') or 0
+
+    def start(self):
+        if self._create_table:
+            # Databases created before the bus existed, or never seeded, lack the table
+            self._run(lambda cursor: cursor.execute(CREATE_INVALIDATIONS))
+            self._create_table = False
+        # Caches start empty: only writes after this point matter
+        self._last_version = self._run(self._last)
+
+    def publish(self, origin, events):
+        def insert(cursor):
+            cursor.executemany(INSERT_INVALIDATION, [
+                (origin, event['kind'], event.get('id'), event['stock_only']) for event in events
+            ])
+        self._run(insert)
+        self._since_prune += len(events)
+        if self._since_prune >= self.retain:
+            # Keep the last retain versions; a peer further behind has dropped its caches anyway
+            self._since_prune = 0
+            def prune(cursor):
+                cursor.execute(PRUNE_INVALIDATIONS, (self._last(cursor) - self.retain,))
+            self._run(prune)
+
+    def poll(self, origin):
+        """(events of other origins, complete)"""
+        if self._last_version is None:
+            self.start()
+        
+        def fetch(cursor):
+            cursor.execute(SELECT_INVALIDATIONS, (self._last_version, POLL_BATCH))
+            return cursor.fetchall()
+        
+        events = []
+        while True:
+            rows = self._run(fetch)
+            for row in rows:
+                self._last_version = row['version']
+                if row['origin'] != origin:
+                    events.append({
+                        'kind': row['kind'], 'id': row['entity_id'],
+                        'stock_only': bool(row['stock_only']), 'origin': row['origin'],
+                    })
+            if len(rows) < POLL_BATCH:
+                return events, True
+
+
+class MulticastTransport:
+    """UDP multicast: every process on the group gets every batch, without a broker"""
+
+    def __init__(self, app, connect=None):
+        host, _, port = app.config.get('INVALIDATION_MULTICAST_GROUP', '239.255.42.99:5701').rpartition(':')
+        self.group = (host, int(port))
+        self.ttl = app.config.get('INVALIDATION_MULTICAST_TTL', 1)
+        self._sequences = {}
+        self._sequence = 0
+        self._socket = None
+
+    def start(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        receiver.bind(('', self.group[1]))
+        membership = struct.pack('4sl', socket.inet_aton(self.group[0]), socket.INADDR_ANY)
+        receiver.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        receiver.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+        receiver.setblocking(False)
+        self._socket = receiver
+
+    def publish(self, origin, events):
+        if self._socket is None:
+            self.start()
+        for start in range(0, len(events), MAX_DATAGRAM_EVENTS):
+            self._sequence += 1
+            payload = {'o': origin, 'n': self._sequence, 'e': events[start:start + MAX_DATAGRAM_EVENTS]}
+            self._socket.sendto(json.dumps(payload, separators=(',', ':')).encode('utf-8'), self.group)
+
+    def poll(self, origin):
+        if self._socket is None:
+            self.start()
+        events, complete = [], True
+        while True:
+            try:
+                data, _ = self._socket.recvfrom(65535)
+            except BlockingIOError:
+                return events, complete
+            payload = json.loads(data)
+            sender = payload['o']
+            if sender == origin:
+                continue
+            expected = self._sequences.get(sender)
+            if expected is not None and payload['n'] != expected + 1:
+                # A batch from this peer was lost: what it invalidated is unknown
+                complete = False
+            self._sequences[sender] = payload['n']
+            events.extend(dict(event, origin=sender) for event in payload['e'])
+
+
+class MemoryTransport:
+    """In-process stand-in for a broker: a shared log every bus reads from its own position"""
+
+    _log = []
+    _lock = threading.Lock()
+
+    def __init__(self, app=None, connect=None):
+        self._position = 0
+
+    def start(self):
+        with self._lock:
+            self._position = len(self._log)
+
+    def publish(self, origin, events):
+        with self._lock:
+            self._log.extend(dict(event, origin=origin) for event in events)
+
+    def poll(self, origin):
+        with self._lock:
+            events = self._log[self._position:]
+            self._position = len(self._log)
+        return [event for event in events if event['origin'] != origin], True
+
+
+TRANSPORT_CLASSES = {
+    'database': DatabaseTransport,
+    'multicast': MulticastTransport,
+    'memory': MemoryTransport,
+}
+
+
+class InvalidationBus:
+    """
+    Publishes this process's events and applies everyone else's, from one
+    daemon thread. apply(events, other_host) and on_stale() run in an app
+    context; other_host says whether any event came from another machine.
+    """
+
+    def __init__(self, app, transport, apply, on_stale):
+        self.flush_interval = app.config.get('INVALIDATION_FLUSH_INTERVAL', 0.1)
+        self.poll_interval = app.config.get('INVALIDATION_POLL_INTERVAL', 1.0)
+        self.max_staleness = app.config.get('INVALIDATION_MAX_STALENESS', 10.0)
+        self._app = app
+        self._transport = transport
+        self._apply = apply
+        self._on_stale = on_stale
+        self._reset_state()
+        self._last_poll = None
+        self._failing = False
+        self.published = 0
+        self.batches = 0
+        self.coalesced = 0
+        self.received = 0
+        self.applied = 0
+        self.stale_drops = 0
+        self.errors = 0
+        _buses.add(self)
+
+    def _reset_state(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _after_fork(self):
+        """
+        The parent's thread did not survive the fork: start() runs a new one,
+        under a new origin, from the transport position inherited at the fork.
+        """
+        self._reset_state()
+
+    @staticmethod
+    def host_of(origin):
+        return origin.rsplit(':', 2)[0]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._last_poll = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name='invalidation-bus', daemon=True)
+                self._thread.start()
+
+    def publish(self, kind, entity_id=None, stock_only=False):
+        """Queue an event; it leaves within flush_interval, merged with its duplicates"""
+        self.start()
+        with self._lock:
+            self._pending.append({'kind': kind, 'id': entity_id, 'stock_only': stock_only})
+        self._wake.set()
+
+    @property
+    def healthy(self):
+        """Whether every peer write up to max_staleness ago has been applied here"""
+        return self._last_poll is not None and time.monotonic() - self._last_poll <= self.max_staleness
+
+    def _run(self):
+        with self._app.app_context():
+            try:
+                self._transport.start()
+            except Exception as e:
+                print(f"⚠️ Bus de invalidación sin transporte todavía: {e}")
+            next_poll = time.monotonic()
+            while True:
+                self._wake.wait(timeout=max(0.0, next_poll - time.monotonic()))
+                # Let a burst of writes gather into one batch
+                time.sleep(self.flush_interval)
+                self._wake.clear()
+                self._flush()
+                if time.monotonic() >= next_poll:
+                    self._poll()
+                    next_poll = time.monotonic() + self.poll_interval
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        events = coalesce(pending)
+        try:
+            self._transport.publish(self.origin, events)
+            self.published += len(events)
+            self.coalesced += len(pending) - len(events)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ No se pudieron publicar {len(events)} invalidaciones: {e}")
+
+    def _poll(self):
+        try:
+            events, complete = self._transport.poll(self.origin)
+        except Exception as e:
+            self.errors += 1
+            if not self._failing:
+                print(f"❌ Bus de invalidación sin lectura: {e}")
+            self._failing = True
+            if not self.healthy:
+                self._drop_caches()
+            return
+        if self._failing:
+            print("✅ Bus de invalidación recuperado")
+            self._failing = False
+            # Writes missed while failing are unknown
+            self._drop_caches()
+        self._last_poll = time.monotonic()
+        if not complete:
+            self._drop_caches()
+        if events:
+            self.received += len(events)
+            host = self.host_of(self.origin)
+            other_host = any(self.host_of(event['origin']) != host for event in events)
+            events = coalesce(events)
+            try:
+                self._apply(events, other_host)
+                self.applied += len(events)
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Error aplicando invalidaciones: {e}")
+                self._drop_caches()
+
+    def _drop_caches(self):
+        self.stale_drops += 1
+        try:
+            self._on_stale()
+        except Exception as e:
+            print(f"❌ Error vaciando cachés: {e}")
+
+    def stats(self):
+        return {
+            'transport': type(self._transport).__name__,
+            'origin': self.origin,
+            'healthy': self.healthy,
+            'last_poll_age_s': round(time.monotonic() - self._last_poll, 2) if self._last_poll else None,
+            'published': self.published,
+            'batches': self.batches,
+            'coalesced': self.coalesced,
+            'received': self.received,
+            'applied': self.applied,
+            'stale_drops': self.stale_drops,
+            'errors': self.errors,
+        }
+
+
+def _reset_buses_after_fork():
+    for bus in list(_buses):
+        bus._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_buses_after_fork)
+
+
+def transport_name(app=None):
+    app = app or current_app._get_current_object()
+    name = (app.config.get('INVALIDATION_TRANSPORT') or 'database').lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Transporte de invalidación desconocido: {name}")
+    return name
+
+
+def get_invalidation_bus(connect, apply, on_stale, app=None):
+    """The app's bus, or None when INVALIDATION_TRANSPORT is 'none'"""
+    app = app or current_app._get_current_object()
+    name = transport_name(app)
+    if name == 'none':
+        return None
+    bus = app.extensions.get('invalidation_bus')
+    if bus is None:
+        with _bus_lock:
+            bus = app.extensions.get('invalidation_bus')
+            if bus is None:
+                bus = InvalidationBus(app, TRANSPORT_CLASSES[name](app, connect), apply, on_stale)
+                app.extensions['invalidation_bus'] = bus
+    return bus
+
+
+def get_invalidation_stats(app=None):
+    app = app or current_app._get_current_object()
+    bus = app.extensions.get('invalidation_bus')
+    return bus.stats() if bus else None
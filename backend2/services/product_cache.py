@@ -0,0 +1,293 @@
+"""
+In-process caches for product rows and product list pages: bounded LRU
+with TTL, refresh-ahead for hot entries and write-through invalidation
+from the product write services.
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+_cache_lock = threading.Lock()
+# Background reloads of hot entries close to expiry
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='product-cache-refresh')
+# hook(app) runs once in every process that uses an app's caches, see on_product_cache()
+_cache_hooks = []
+
+
+class TTLCache:
+    """
+    LRU of at most max_size entries, each valid for ttl seconds. A hit in
+    the last refresh_ahead fraction of its life reloads the entry in the
+    background, so hot keys never expire under load.
+    Values are copied in and out: callers may modify what they get.
+    """
+
+    def __init__(self, name, max_size, ttl, refresh_ahead=0.2):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        # Bumped by every invalidation; loads that raced one are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.refreshes = 0
+
+    def get_or_load(self, key, loader):
+        """Cached value for key, else loader() (stored unless None)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value, expires, tags = entry
+                refresh = (
+                    expires - now < self.ttl * self.refresh_ahead and key not in self._refreshing
+                )
+                if refresh:
+                    self._refreshing.add(key)
+            else:
+                self.misses += 1
+            generation = self._generation
+
+        if entry is not None:
+            if refresh:
+                self._schedule_refresh(key, loader)
+            return copy.deepcopy(value)
+
+        value, tags = self._call(loader)
+        self._store(key, value, tags, generation)
+        return copy.deepcopy(value)
+
+    @property
+    def generation(self):
+        """Snapshot to pass to put() for a value read outside get_or_load()"""
+        with self._lock:
+            return self._generation
+
+    def get_many(self, keys):
+        """{key: value} of the cached keys; the rest count as misses"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {key: copy.deepcopy(value) for key, value in found.items()}
+
+    def put(self, key, value, generation, tags=None):
+        self._store(key, value, tags, generation)
+
+    @staticmethod
+    def _call(loader):
+        """loader() returns a value, or a Tagged value with its tags"""
+        result = loader()
+        if isinstance(result, Tagged):
+            return result.value, result.tags
+        return result, None
+
+    def _store(self, key, value, tags, generation):
+        if value is None or self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (copy.deepcopy(value), time.monotonic() + self.ttl, tags)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _schedule_refresh(self, key, loader):
+        app = current_app._get_current_object()
+        with self._lock:
+            generation = self._generation
+
+        def refresh():
+            try:
+                with app.app_context():
+                    value, tags = self._call(loader)
+                self._store(key, value, tags, generation)
+                with self._lock:
+                    self.refreshes += 1
+            except Exception as e:
+                print(f"⚠️ No se pudo refrescar la caché {self.name}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _refresher.submit(refresh)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """Drop the entries whose (key, tags) match predicate"""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (_, _, tags) in self._entries.items() if predicate(key, tags)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'refreshes': self.refreshes,
+            }
+
+
+class Tagged:
+    """Loader result carrying tags that invalidate_where() can match on"""
+
+    def __init__(self, value, tags):
+        self.value = value
+        self.tags = tags
+
+
+class ProductCaches:
+    """
+    Row cache by product id and page cache by list query. For lag_window
+    seconds after a write, reloads of what it invalidated must read the
+    primary: a lagging replica would put the stale row back for a full TTL.
+    """
+
+    def __init__(self, config):
+        refresh_ahead = config.get('PRODUCT_CACHE_REFRESH_AHEAD', 0.2)
+        self.rows = TTLCache(
+            'products', config.get('PRODUCT_CACHE_SIZE', 5000),
+            config.get('PRODUCT_CACHE_TTL', 60), refresh_ahead
+        )
+        self.pages = TTLCache(
+            'product_pages', config.get('PRODUCT_PAGE_CACHE_SIZE', 500),
+            config.get('PRODUCT_PAGE_CACHE_TTL', 15), refresh_ahead
+        )
+        # Longest a healthy replica can lag: beyond MAX_LAG it is only dropped at the next check
+        self.lag_window = (
+            config.get('MYSQL_REPLICA_MAX_LAG', 5) + config.get('MYSQL_REPLICA_CHECK_INTERVAL', 10)
+            if config.get('MYSQL_REPLICA_HOSTS') else 0
+        )
+        self._written = {}
+        self._all_written = float('-inf')
+        self._pages_written = float('-inf')
+        self._written_lock = threading.Lock()
+        # Process the hooks last ran in; a forked child runs them again
+        self.pid = None
+
+    def written(self, product_id=None):
+        """Call before invalidating a write to product_id (None: possibly every product)"""
+        if not self.lag_window:
+            return
+        now = time.monotonic()
+        with self._written_lock:
+            self._pages_written = now
+            if product_id is None:
+                self._all_written = now
+                self._written.clear()
+                return
+            self._written[product_id] = now
+            if len(self._written) > self.rows.max_size:
+                cutoff = now - self.lag_window
+                self._written = {key: at for key, at in self._written.items() if at > cutoff}
+
+    def row_from_primary(self, product_id):
+        """True while a replica may still hold a copy of product_id older than its last write"""
+        if not self.lag_window:
+            return False
+        cutoff = time.monotonic() - self.lag_window
+        with self._written_lock:
+            if self._all_written > cutoff:
+                return True
+            at = self._written.get(product_id)
+            if at is not None and at <= cutoff:
+                del self._written[product_id]
+                return False
+            return at is not None
+
+    def pages_from_primary(self):
+        """True while a replica may still list rows older than the last write"""
+        if not self.lag_window:
+            return False
+        with self._written_lock:
+            return self._pages_written > time.monotonic() - self.lag_window
+
+    def stats(self):
+        stats = {'rows': self.rows.stats(), 'pages': self.pages.stats()}
+        if self.lag_window:
+            with self._written_lock:
+                stats['primary_reads'] = {'lag_window_s': self.lag_window, 'recent_writes': len(self._written)}
+        return stats
+
+
+def on_product_cache(hook):
+    """
+    Register hook(app) to run in every process that creates or inherits an
+    app's caches, before they are first used there: whatever fills them
+    must also be told when they go stale.
+    """
+    _cache_hooks.append(hook)
+    return hook
+
+
+def get_product_cache(app=None):
+    """The app's product caches, or None when PRODUCT_CACHE_SIZE is 0"""
+    app = app or current_app._get_current_object()
+    if app.config.get('PRODUCT_CACHE_SIZE', 5000) <= 0:
+        return None
+    caches = app.extensions.get('product_cache')
+    if caches is None or caches.pid != os.getpid():
+        with _cache_lock:
+            caches = app.extensions.get('product_cache')
+            if caches is None:
+                caches = ProductCaches(app.config)
+                app.extensions['product_cache'] = caches
+            if caches.pid != os.getpid():
+                caches.pid = os.getpid()
+                for hook in _cache_hooks:
+                    hook(app)
+    return caches
+
+
+def get_product_cache_stats(app=None):
+    app = app or current_app._get_current_object()
+    caches = app.extensions.get('product_cache')
+    return caches.stats() if caches else None
@@ -1,24 +1,274 @@
 import pymysql
+from pymysql.constants.ER import NO_REFERENCED_ROW_2 as ER_NO_REFERENCED_ROW_2
 from decimal import Decimal
+import base64
+import contextvars
+import copy
+import heapq
 import json
-from flask import current_app
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
 
-def get_db_connection():
-    """Get database connection using Flask app config"""
+from services.db_pool import PoolTimeout
+from services.deadline import checkout_timeout, mark_deadline_exceeded, mark_pool_exhausted, release_deadline
+from services.retry import commit, raise_if_retryable, retry_transient, rollback
+from services.autocomplete import get_suggest_index
+from services.catalog_snapshot import get_shared_catalog
+from services.invalidation_bus import get_invalidation_bus
+from services.product_cache import Tagged, get_product_cache, on_product_cache
+from services.serial_cache import get_serial_cache, serial_key
+from services.search import (
+    fall_back_to_memory_search, fulltext_schema_missing, get_search_index, match_clause, search_engine_name, tokenize
+)
+from services.sharding import HOME_SHARD, merge_sorted
+from services.single_flight import SingleFlightTimeout, get_single_flight
+from services.storage import get_storage
+from services.taxonomy import (
+    TAXONOMY_CATEGORIES_QUERY, TAXONOMY_SUBCATEGORIES_QUERY, Taxonomy, current_taxonomy, swap_taxonomy
+)
+from services.unit_of_work import begin_unit_of_work, current_unit_of_work, run_detached
+
+# Selectable product fields: SQL expression and the join it needs
+PRODUCT_COLUMNS = {
+    'id': ('p.id', None),
+    'name': ('p.name', None),
+    'description': ('p.description', None),
+    'purchase_price': ('p.purchase_price', None),
+    'sale_price': ('p.sale_price', None),
+    'stock': ('p.stock', None),
+    'image_url': ('p.image_url', None),
+    'serial_number': ('p.serial_number', None),
+    'specifications': ('p.specifications', None),
+    'subcategory_name': ('s.name', 's'),
+    'subcategory_id': ('s.id', 's'),
+    'category_name': ('c.name', 'c'),
+    'category_id': ('c.id', 'c'),
+}
+
+PRODUCT_LIST_FIELDS = (
+    'id', 'name', 'description', 'purchase_price', 'sale_price',
+    'stock', 'image_url', 'serial_number', 'specifications',
+    'subcategory_name', 'category_name'
+)
+PRODUCT_DETAIL_FIELDS = (
+    'id', 'name', 'description', 'purchase_price', 'sale_price',
+    'stock', 'image_url', 'serial_number', 'specifications',
+    'subcategory_name', 'subcategory_id', 'category_name', 'category_id'
+)
+
+# Named representations for ?view=; 'full' is the endpoint's complete row
+PRODUCT_VIEWS = {
+    'summary': ('id', 'name', 'sale_price', 'stock'),
+}
+
+def product_select(fields, extra_columns=()):
+    """SELECT list and joins for the given fields only, so unneeded TEXT/JSON columns are never read"""
+    columns = ', '.join([
+        PRODUCT_COLUMNS[field][0] if PRODUCT_COLUMNS[field][0] == f"p.{field}"
+        else f"{PRODUCT_COLUMNS[field][0]} as {field}"
+        for field in fields
+    ] + list(extra_columns))
+    joins = {PRODUCT_COLUMNS[field][1] for field in fields}
+    sql = f"\n    SELECT {columns}\n    FROM products p\n"
+    if 's' in joins or 'c' in joins:
+        sql += "    LEFT JOIN subcategories s ON p.subcategory_id = s.id\n"
+    if 'c' in joins:
+        sql += "    LEFT JOIN categories c ON s.category_id = c.id\n"
+    return sql
+
+def parse_product_fields(fields=None, view=None):
+    """
+    ?fields=a,b or ?view=summary|full into a tuple of fields, or None for
+    the endpoint's full row. id is always included.
+    """
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in PRODUCT_COLUMNS]
+        if unknown:
+            raise ValueError(
+                f"Campos no permitidos: {', '.join(unknown)}. Use: {', '.join(PRODUCT_COLUMNS)}"
+            )
+        return tuple(dict.fromkeys(['id'] + names))
+    if view and view != 'full':
+        if view not in PRODUCT_VIEWS:
+            raise ValueError(f"Vista desconocida: {view}. Use: full, {', '.join(PRODUCT_VIEWS)}")
+        return PRODUCT_VIEWS[view]
+    return None
+
+def project(row, fields):
+    """Only the requested fields of an already loaded row"""
+    if row is None or fields is None:
+        return row
+    return {field: row[field] for field in fields if field in row}
+
+def product_list_query(fields=None):
+    return product_select(fields or PRODUCT_LIST_FIELDS) + "    ORDER BY p.id DESC\n"
+
+PRODUCT_LIST_SELECT = product_select(PRODUCT_LIST_FIELDS)
+
+PRODUCT_LIST_QUERY = product_list_query()
+
+PRODUCT_COUNT_QUERY = "SELECT COUNT(*) as total FROM products"
+
+# Text the in-process search index is built from
+SEARCH_DOCUMENTS_QUERY = "SELECT p.id, p.name, p.description, p.specifications FROM products p"
+# Names for the autocomplete index, newest first so a capped index keeps recent products
+SUGGEST_NAMES_QUERY = "SELECT p.id, p.name FROM products p ORDER BY p.id DESC LIMIT %s"
+
+# Sort keys allowed for paginated listings; p.id breaks ties so the order is total
+PRODUCT_SORTS = {
+    'id': 'p.id',
+    'name': 'p.name',
+    'sale_price': 'p.sale_price',
+    'stock': 'p.stock',
+}
+DEFAULT_PRODUCT_SORT = '-id'
+# List filters whose matches change with the stock column
+STOCK_FILTERS = ('in_stock', 'low_stock')
+
+# List filters: query parameter -> (parser, SQL condition). Each matches an
+# index on products, (subcategory_id, id), (sale_price, id) or (stock, id),
+# so filtered pages are range scans rather than full table reads.
+def _parse_int(value):
+    return int(value)
+
+def _parse_price(value):
+    return float(value)
+
+def _parse_bool(value):
+    value = value.lower()
+    if value not in ('true', 'false', '1', '0'):
+        raise ValueError
+    return value in ('true', '1')
+
+def _parse_text(value):
+    value = value.strip()
+    if not value:
+        raise ValueError
+    return value
+
+def _like_prefix(value):
+    """LIKE pattern matching value literally at the start"""
+    return value.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+# Brand as stored in the specifications JSON (no index: filter sidebars combine it with indexed filters)
+BRAND_EXPRESSION = "JSON_UNQUOTE(JSON_EXTRACT(p.specifications, '$.marca'))"
+
+PRODUCT_FILTERS = {
+    'category_id': (_parse_int, "p.subcategory_id IN (SELECT id FROM subcategories WHERE category_id = %s)"),
+    'subcategory_id': (_parse_int, "p.subcategory_id = %s"),
+    'min_price': (_parse_price, "p.sale_price >= %s"),
+    'max_price': (_parse_price, "p.sale_price <= %s"),
+    'in_stock': (_parse_bool, "p.stock > 0"),
+    'low_stock': (_parse_int, "p.stock <= %s"),
+    'serial_prefix': (_like_prefix, "p.serial_number LIKE %s ESCAPE '!'"),
+    'brand': (_parse_text, f"{BRAND_EXPRESSION} = %s"),
+}
+
+# Get-or-create in one statement: a duplicate name turns the insert into a
+# no-op that reports the existing id (LAST_INSERT_ID on MySQL, RETURNING on SQLite)
+CATEGORY_GET_OR_CREATE = {
+    'mysql': """
+        INSERT INTO categories (name, description) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+    """,
+    'sqlite': """
+        INSERT INTO categories (name, description) VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET name = name
+        RETURNING id
+    """,
+}
+SUBCATEGORY_GET_OR_CREATE = {
+    'mysql': """
+        INSERT INTO subcategories (name, category_id) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+    """,
+    'sqlite': """
+        INSERT INTO subcategories (name, category_id) VALUES (%s, %s)
+        ON CONFLICT (name, category_id) DO UPDATE SET name = name
+        RETURNING id
+    """,
+}
+
+def product_detail_query(fields=None):
+    return product_select(fields or PRODUCT_DETAIL_FIELDS) + "    WHERE p.id = %s\n"
+
+PRODUCT_DETAIL_QUERY = product_detail_query()
+
+DECREASE_STOCK_QUERY = """
+    UPDATE products SET stock = stock - %s
+    WHERE id = %s AND stock >= %s
+"""
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+# Copy taxonomy rows from the home shard to the others, keeping their ids
+CATEGORY_ROW_QUERY = "SELECT id, name, description, created_at FROM categories WHERE id = %s"
+CATEGORY_UPSERT = """
+    INSERT INTO categories (id, name, description, created_at)
+    VALUES (%(id)s, %(name)s, %(description)s, %(created_at)s)
+    ON DUPLICATE KEY UPDATE name = VALUES(name), description = VALUES(description)
+"""
+SUBCATEGORY_ROW_QUERY = "SELECT id, name, category_id, created_at FROM subcategories WHERE id = %s"
+SUBCATEGORY_UPSERT = """
+    INSERT INTO subcategories (id, name, category_id, created_at)
+    VALUES (%(id)s, %(name)s, %(category_id)s, %(created_at)s)
+    ON DUPLICATE KEY UPDATE name = VALUES(name), category_id = VALUES(category_id)
+"""
+
+def _acquire(pool):
+    """Check out from pool without waiting past the request deadline"""
+    return pool.acquire(timeout=checkout_timeout(pool.timeout))
+
+def _acquire_read_connection(shard=HOME_SHARD):
+    """Replica connection, falling back to the primary when none is healthy"""
+    storage = get_storage()
+    primary = storage.pool(shard)
+    timeout = checkout_timeout(primary.timeout)
+    return storage.acquire_read(timeout, shard) or primary.acquire(timeout=timeout)
+
+def _route(route, shard):
+    """Unit-of-work route for a shard; the home shard keeps the plain name"""
+    return route if shard == HOME_SHARD else f"{route}:{shard}"
+
+def get_db_connection(read_only=False, shard=HOME_SHARD, product_id=None):
+    """
+    Get a database connection from the configured storage engine
+    (STORAGE_ENGINE: MySQL or embedded SQLite).
+    product_id selects the shard holding that product (MYSQL_SHARDS);
+    otherwise shard, the home shard by default, which also holds the taxonomy.
+    read_only=True routes to a healthy read replica (MYSQL_REPLICA_HOSTS),
+    unless the current request already used the primary, so reads after a
+    write in the same request always see that write.
+    Inside a request this is the request-scoped connection shared by every
+    service call (close() is a no-op); otherwise a pooled connection whose
+    close() returns it to the pool.
+    """
     try:
-        connection = pymysql.connect(
-            host=current_app.config['MYSQL_HOST'],
-            user=current_app.config['MYSQL_USER'],
-            password=current_app.config['MYSQL_PASSWORD'],
-            database=current_app.config['MYSQL_DB'],
-            port=current_app.config['MYSQL_PORT'],
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=False  # Ensure manual transaction control
-        )
-        return connection
+        storage = get_storage()
+        if product_id is not None:
+            shard = storage.shard_for_product(product_id)
+        unit_of_work = begin_unit_of_work()
+        if unit_of_work is not None:
+            primary_route = _route(PRIMARY, shard)
+            if read_only and not unit_of_work.has_connection(primary_route):
+                return unit_of_work.connection(
+                    _route(REPLICA, shard), lambda: _acquire_read_connection(shard)
+                )
+            return unit_of_work.connection(primary_route, lambda: _acquire(storage.pool(shard)))
+        if read_only:
+            return _acquire_read_connection(shard)
+        return _acquire(storage.pool(shard))
+    except PoolTimeout as e:
+        mark_pool_exhausted()
+        print(f"❌ Pool de base de datos agotado: {e}")
+        return None
     except Exception as e:
-        print(f"❌ Error conectando a MySQL: {e}")
+        print(f"❌ Error conectando a la base de datos: {e}")
         return None
 
 def convert_decimals(data):
@@ -31,168 +281,1313 @@ def convert_decimals(data):
         return float(data)
     return data
 
+def parse_specifications(product):
+    """Convert the specifications JSON string of a row back to a dict"""
+    if product and product.get('specifications'):
+        try:
+            product['specifications'] = json.loads(product['specifications'])
+        except (json.JSONDecodeError, TypeError):
+            product['specifications'] = {}
+    return product
+
+def build_products(products):
+    """Shape product rows for JSON responses"""
+    # Convert specifications JSON string back to dict
+    for product in products:
+        parse_specifications(product)
+    return convert_decimals(products)
+
+
+def fan_out_query(query, args=None):
+    """Rows of a read query from every shard, one list per shard, queried in parallel"""
+    def run(shard):
+        connection = _acquire_read_connection(shard)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query, args)
+                return cursor.fetchall()
+        finally:
+            connection.close()
+    return get_storage().fan_out(run)
+
+def replicate_taxonomy(category_id=None, subcategory_id=None):
+    """Copy taxonomy rows committed on the home shard to every other shard"""
+    storage = get_storage()
+    if storage.shard_count == 1:
+        return
+    
+    connection = get_db_connection()
+    if not connection:
+        raise Exception("Error de conexión a la base de datos")
+    try:
+        rows = []
+        with connection.cursor() as cursor:
+            if subcategory_id is not None:
+                cursor.execute(SUBCATEGORY_ROW_QUERY, (subcategory_id,))
+                subcategory = cursor.fetchone()
+                if subcategory:
+                    category_id = subcategory['category_id']
+                    rows.append((SUBCATEGORY_UPSERT, subcategory))
+            if category_id is not None:
+                cursor.execute(CATEGORY_ROW_QUERY, (category_id,))
+                category = cursor.fetchone()
+                if category:
+                    # Parent first, for the subcategory foreign key
+                    rows.insert(0, (CATEGORY_UPSERT, category))
+    finally:
+        connection.close()
+    
+    def copy(shard):
+        if shard == HOME_SHARD or not rows:
+            return
+        shard_connection = _acquire(storage.pool(shard))
+        try:
+            with shard_connection.cursor() as cursor:
+                for upsert, row in rows:
+                    cursor.execute(upsert, row)
+            commit(shard_connection)
+        except Exception:
+            rollback(shard_connection)
+            raise
+        finally:
+            shard_connection.close()
+    storage.fan_out(copy)
+
+def parse_product_filters(args):
+    """
+    Filters present in args (request.args or any mapping), parsed.
+    Raises ValueError naming the offending parameter.
+    """
+    filters = {}
+    for name, (parse, _) in PRODUCT_FILTERS.items():
+        value = args.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            filters[name] = parse(value)
+        except ValueError:
+            raise ValueError(f"Valor inválido para el filtro {name}: {value}") from None
+    return filters
+
+def build_product_filter_clause(filters):
+    """SQL conditions and arguments for parsed filters, ANDed together"""
+    conditions, args = [], []
+    for name, value in (filters or {}).items():
+        if name == 'in_stock':
+            # Boolean filter: no argument, the value picks the condition
+            conditions.append(PRODUCT_FILTERS[name][1] if value else "p.stock <= 0")
+            continue
+        conditions.append(PRODUCT_FILTERS[name][1])
+        args.append(value)
+    return conditions, args
+
+def build_products_list_query(fields=None, filters=None):
+    """Full list query, newest first, restricted by filters"""
+    conditions, args = build_product_filter_clause(filters)
+    if not conditions:
+        return product_list_query(fields), None
+    where = "    WHERE " + " AND ".join(conditions) + "\n"
+    return product_select(fields or PRODUCT_LIST_FIELDS) + where + "    ORDER BY p.id DESC\n", args
+
+def build_products_count_query(filters=None):
+    conditions, args = build_product_filter_clause(filters)
+    if not conditions:
+        return PRODUCT_COUNT_QUERY, None
+    return f"SELECT COUNT(*) as total FROM products p WHERE {' AND '.join(conditions)}", args
+
+def parse_product_sort(sort):
+    """'-sale_price' -> ('sale_price', True); only whitelisted keys"""
+    sort = sort or DEFAULT_PRODUCT_SORT
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field not in PRODUCT_SORTS:
+        raise ValueError(f"Orden no permitido: {field}. Use: {', '.join(PRODUCT_SORTS)}")
+    return field, descending
+
+def _encode_token(payload):
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_token(token):
+    padded = token + '=' * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+def encode_cursor(sort, row):
+    """Opaque cursor pointing just after row in the given order"""
+    field, _ = parse_product_sort(sort)
+    return _encode_token({'s': sort, 'v': row[field], 'id': row['id']})
+
+def decode_cursor(cursor, sort):
+    """(last sort value, last id) from a cursor issued for the same sort"""
+    try:
+        payload = _decode_token(cursor)
+        if payload['s'] != sort:
+            raise ValueError
+        return payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError("Cursor inválido o de otro orden") from None
+
+def encode_search_cursor(query, offset):
+    """Search results are ranked, not keyed: the cursor is a position in the ranking"""
+    return _encode_token({'q': query, 'o': offset})
+
+def decode_search_cursor(cursor, query):
+    try:
+        payload = _decode_token(cursor)
+        if payload['q'] != query:
+            raise ValueError
+        return max(0, int(payload['o']))
+    except (ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError("Cursor inválido o de otra búsqueda") from None
+
+def build_products_page_query(sort, after, limit, fields=None, filters=None):
+    """
+    Keyset page query: rows strictly after (value, id) in the sort order,
+    one extra row to know whether another page follows. No OFFSET scans.
+    The sort field is always selected, the cursor is built from it.
+    """
+    field, descending = parse_product_sort(sort)
+    select = product_select(tuple(dict.fromkeys(fields + (field,)))) if fields else PRODUCT_LIST_SELECT
+    column = PRODUCT_SORTS[field]
+    op, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+    conditions, args = build_product_filter_clause(filters)
+    if after is not None:
+        value, last_id = after
+        if field == 'id':
+            conditions.append(f"p.id {op} %s")
+            args.append(last_id)
+        else:
+            conditions.append(f"({column} {op} %s OR ({column} = %s AND p.id {op} %s))")
+            args += [value, value, last_id]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = f"ORDER BY {column} {direction}" if field == 'id' else f"ORDER BY {column} {direction}, p.id {direction}"
+    return f"{select} {where} {order} LIMIT %s", args + [limit + 1]
+
+def sort_key(field):
+    """Python ordering matching ORDER BY <field>, p.id, to merge shard pages"""
+    if field == 'name':
+        return lambda row: (str(row[field]).casefold(), row['id'])
+    return lambda row: (row[field], row['id'])
+
+def build_products_page(rows, sort, limit, fields=None):
+    """Trim the extra row of a page query and attach the next cursor"""
+    has_more = len(rows) > limit
+    items = build_products(list(rows[:limit]))
+    return {
+        'items': [project(item, fields) for item in items] if fields else items,
+        'has_more': has_more,
+        'next_cursor': encode_cursor(sort, items[-1]) if has_more else None,
+    }
+
+_total_cache = {'value': None, 'expires': 0.0}
+_total_lock = threading.Lock()
+
+def cached_product_total():
+    """Cached product count, or None when missing or expired"""
+    with _total_lock:
+        if _total_cache['value'] is not None and time.monotonic() < _total_cache['expires']:
+            return _total_cache['value']
+    return None
+
+def store_product_total(total):
+    ttl = current_app.config.get('PRODUCT_TOTAL_CACHE_TTL', 60) if has_app_context() else 60
+    with _total_lock:
+        _total_cache['value'] = total
+        _total_cache['expires'] = time.monotonic() + ttl
+    return total
+
+def fetch_product(cursor, product_id, fields=None):
+    """Read one product with category information on an existing cursor"""
+    cursor.execute(product_detail_query(fields), (product_id,))
+    product = parse_specifications(cursor.fetchone())
+    return convert_decimals(product) if product else None
+
+def remember_product(product_id, product):
+    """Store a loaded or written row in the request identity map"""
+    unit_of_work = current_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.remember('product', product_id, product)
+    return product
+
+def forget_product(product_id):
+    unit_of_work = current_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.forget('product', product_id)
+
+_taxonomy_lock = threading.Lock()
+
+def load_taxonomy(use_primary=False):
+    """Read every category and subcategory into a new snapshot"""
+    connection = get_db_connection(read_only=not use_primary)
+    if not connection:
+        raise RuntimeError("Error de conexión a la base de datos")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(TAXONOMY_CATEGORIES_QUERY)
+            categories = cursor.fetchall()
+            cursor.execute(TAXONOMY_SUBCATEGORIES_QUERY)
+            subcategories = cursor.fetchall()
+    finally:
+        connection.close()
+    return Taxonomy(categories, subcategories)
+
+def get_taxonomy():
+    """
+    The taxonomy snapshot, loaded on first use and again once older than
+    TAXONOMY_SNAPSHOT_TTL. None only if it was never loaded and cannot be.
+    """
+    snapshot = current_taxonomy()
+    if snapshot is None:
+        try:
+            # Readers arriving during the load wait for it instead of queueing on the lock
+            snapshot, _ = get_single_flight().do(('taxonomy',), _load_current_taxonomy)
+        except Exception as e:
+            print(f"Error loading taxonomy: {e}")
+            # A stale snapshot beats none
+            snapshot = current_app.extensions.get('taxonomy')
+    return snapshot
+
+def _load_current_taxonomy():
+    with _taxonomy_lock:
+        return current_taxonomy() or swap_taxonomy(load_taxonomy())
+
+def reload_taxonomy():
+    """Swap in a snapshot read from the primary"""
+    try:
+        with _taxonomy_lock:
+            swap_taxonomy(load_taxonomy(use_primary=True))
+    except Exception as e:
+        # Readers load it again instead of missing the write
+        current_app.extensions.pop('taxonomy', None)
+        print(f"Error refreshing taxonomy: {e}")
+
+def refresh_taxonomy(subcategory_id=None):
+    """
+    Reload the snapshot here and on every peer after a committed taxonomy
+    write. With subcategory_id, only if the current snapshot lacks it.
+    """
+    snapshot = current_taxonomy()
+    if subcategory_id is not None and snapshot is not None and subcategory_id in snapshot.subcategories:
+        return
+    reload_taxonomy()
+    publish_invalidation('taxonomy')
+
+def _get_or_create_id(cursor, statements, args):
+    """Run a *_GET_OR_CREATE statement for the storage engine, return the row id"""
+    if get_storage().name == 'sqlite':
+        cursor.execute(statements['sqlite'], args)
+        return cursor.fetchone()['id']
+    cursor.execute(statements['mysql'], args)
+    return cursor.lastrowid
+
+def _known_subcategory(category_name, subcategory_name):
+    """(category_id, subcategory_id) from the snapshot, None for the unknown ones"""
+    taxonomy = get_taxonomy()
+    if taxonomy is None:
+        return None, None
+    category_id = taxonomy.category_id(category_name)
+    if category_id is None:
+        return None, None
+    return category_id, taxonomy.subcategory_id(category_id, subcategory_name)
+
+def _upsert_subcategory(cursor, category_id, category_name, subcategory_name):
+    if category_id is None:
+        category_id = _get_or_create_id(
+            cursor, CATEGORY_GET_OR_CREATE, (category_name, f"Categoría {category_name}")
+        )
+    return _get_or_create_id(cursor, SUBCATEGORY_GET_OR_CREATE, (subcategory_name, category_id))
+
+@retry_transient(idempotent=True)
 def get_or_create_subcategory(category_name, subcategory_name="General"):
     """Get or create category and subcategory, return subcategory_id"""
+    category_id, subcategory_id = _known_subcategory(category_name, subcategory_name)
+    if subcategory_id is not None:
+        return subcategory_id, None
+    
     connection = get_db_connection()
     if not connection:
         return None, "Error de conexión a la base de datos"
     
     try:
         with connection.cursor() as cursor:
-            # Get or create category
-            cursor.execute("SELECT id FROM categories WHERE name = %s", (category_name,))
-            category = cursor.fetchone()
-            
-            if not category:
-                # Create new category
-                cursor.execute(
-                    "INSERT INTO categories (name, description) VALUES (%s, %s)",
-                    (category_name, f"Categoría {category_name}")
-                )
-                category_id = cursor.lastrowid
-            else:
-                category_id = category['id']
-            
-            # Get or create subcategory
-            cursor.execute(
-                "SELECT id FROM subcategories WHERE name = %s AND category_id = %s",
-                (subcategory_name, category_id)
-            )
-            subcategory = cursor.fetchone()
-            
-            if not subcategory:
-                # Create new subcategory
-                cursor.execute(
-                    "INSERT INTO subcategories (name, category_id) VALUES (%s, %s)",
-                    (subcategory_name, category_id)
-                )
-                subcategory_id = cursor.lastrowid
-            else:
-                subcategory_id = subcategory['id']
-            
-            connection.commit()
-            return subcategory_id, None
+            subcategory_id = _upsert_subcategory(cursor, category_id, category_name, subcategory_name)
+            commit(connection)
+        # Also re-copies rows another writer created, healing a shard that missed them
+        replicate_taxonomy(subcategory_id=subcategory_id)
+        refresh_taxonomy(subcategory_id)
+        return subcategory_id, None
             
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error creating category/subcategory: {e}")
         return None, f"Error creando categoría/subcategoría: {str(e)}"
     finally:
         connection.close()
 
 def get_or_create_subcategory_atomic(cursor, category_name, subcategory_name="General"):
-    """Get or create category and subcategory within existing transaction"""
+    """
+    Get or create category and subcategory within existing transaction.
+    Known names are answered by the taxonomy snapshot without a query; the
+    caller refreshes it with refresh_taxonomy(subcategory_id) after commit.
+    """
     try:
-        # Get or create category
-        cursor.execute("SELECT id FROM categories WHERE name = %s", (category_name,))
-        category = cursor.fetchone()
-        
-        if not category:
-            # Create new category
-            cursor.execute(
-                "INSERT INTO categories (name, description) VALUES (%s, %s)",
-                (category_name, f"Categoría {category_name}")
-            )
-            category_id = cursor.lastrowid
-        else:
-            category_id = category['id']
-        
-        # Get or create subcategory
-        cursor.execute(
-            "SELECT id FROM subcategories WHERE name = %s AND category_id = %s",
-            (subcategory_name, category_id)
-        )
-        subcategory = cursor.fetchone()
-        
-        if not subcategory:
-            # Create new subcategory
-            cursor.execute(
-                "INSERT INTO subcategories (name, category_id) VALUES (%s, %s)",
-                (subcategory_name, category_id)
-            )
-            subcategory_id = cursor.lastrowid
-        else:
-            subcategory_id = subcategory['id']
-        
-        return subcategory_id, None
+        category_id, subcategory_id = _known_subcategory(category_name, subcategory_name)
+        if subcategory_id is not None:
+            return subcategory_id, None
+        return _upsert_subcategory(cursor, category_id, category_name, subcategory_name), None
         
     except Exception as e:
         print(f"Error creating category/subcategory: {e}")
         return None, f"Error creando categoría/subcategoría: {str(e)}"
 
-def get_all_products_service():
-    """Get all products with categories and subcategories"""
-    connection = get_db_connection()
+def get_all_products_service(fields=None, filters=None):
+    """Get all products with categories and subcategories, or only fields"""
+    query, args = build_products_list_query(fields, filters)
+    if get_storage().shard_count > 1:
+        return _get_all_products_sharded(query, args)
+    
+    connection = get_db_connection(read_only=True)
     if not connection:
         return []
     
     try:
         with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT 
-                    p.id, p.name, p.description, p.purchase_price, p.sale_price, 
-                    p.stock, p.image_url, p.serial_number, p.specifications,
-                    s.name as subcategory_name,
-                    c.name as category_name
-                FROM products p
-                LEFT JOIN subcategories s ON p.subcategory_id = s.id
-                LEFT JOIN categories c ON s.category_id = c.id
-                ORDER BY p.id DESC
-            """)
-            products = cursor.fetchall()
-            
-            # Convert specifications JSON string back to dict
-            for product in products:
-                if product.get('specifications'):
-                    try:
-                        product['specifications'] = json.loads(product['specifications'])
-                    except (json.JSONDecodeError, TypeError):
-                        product['specifications'] = {}
-            
-            return convert_decimals(products)
+            cursor.execute(query, args)
+            return build_products(cursor.fetchall())
     except Exception as e:
         print(f"Error getting all products: {e}")
         return []
     finally:
         connection.close()
 
-def get_product_by_id_service(product_id):
-    """Get product by ID with category information"""
-    connection = get_db_connection()
+def _get_all_products_sharded(query, args=None):
+    """Fan the product list out to every shard and merge it, newest first"""
+    try:
+        shard_rows = fan_out_query(query, args)
+        return build_products(merge_sorted(shard_rows, key=lambda row: row['id'], reverse=True))
+    except PoolTimeout as e:
+        mark_pool_exhausted()
+        print(f"❌ Pool de base de datos agotado: {e}")
+        return []
+    except Exception as e:
+        print(f"Error getting all products: {e}")
+        return []
+
+class _ProductStream:
+    """Unbuffered product list on one shard, over a connection of its own"""
+
+    def __init__(self, shard, query, args=None):
+        self.connection = _acquire(get_storage().pool(shard))
+        self.query = query
+        self.args = args
+        self.cursor = None
+        self.finished = False
+
+    def start(self):
+        self.cursor = self.connection.cursor(get_storage().streaming_cursor)
+        self.cursor.execute(self.query, self.args)
+
+    def __iter__(self):
+        yield from iter(self.cursor.fetchone, None)
+        self.finished = True
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        if self.cursor is None:
+            connection.close()
+        elif self.finished:
+            self.cursor.close()
+            connection.close()
+        else:
+            # Draining the rest of an unbuffered result could take as long as reading it
+            connection.discard()
+
+class ProductStream:
+    """Products merged from the shard streams; close() releases their connections"""
+
+    def __init__(self, streams):
+        self._streams = streams
+
+    def __iter__(self):
+        streams = self._streams
+        rows = streams[0] if len(streams) == 1 else heapq.merge(
+            *streams, key=lambda row: row['id'], reverse=True
+        )
+        for row in rows:
+            yield convert_decimals(parse_specifications(row))
+
+    def close(self):
+        for stream in self._streams:
+            stream.close()
+
+def stream_all_products_service(fields=None, filters=None):
+    """
+    Every product, newest first, one row at a time from unbuffered
+    server-side cursors, so memory stays flat whatever the catalog size.
+    The queries start before this returns (errors raise here); the
+    returned ProductStream must be closed, even if never iterated.
+    """
+    query, args = build_products_list_query(fields, filters)
+    streams = []
+    try:
+        for shard in range(get_storage().shard_count):
+            streams.append(_ProductStream(shard, query, args))
+        # Checkout honoured the deadline; the stream itself may outlast it
+        release_deadline()
+        for stream in streams:
+            stream.start()
+    except Exception as e:
+        if isinstance(e, PoolTimeout):
+            mark_pool_exhausted()
+        for stream in streams:
+            stream.close()
+        raise
+    return ProductStream(streams)
+
+def _load_products_page(query, args, sort, limit, fields, use_primary=False):
+    """Run a page query; raises on database errors so failures are never cached"""
+    field, descending = parse_product_sort(sort)
+    if get_storage().shard_count > 1:
+        # Every shard returns its own first limit + 1 rows; the merged head is the page
+        rows = merge_sorted(fan_out_query(query, args), key=sort_key(field), reverse=descending)
+        return build_products_page(rows, sort, limit, fields)
+    
+    connection = get_db_connection(read_only=not use_primary)
     if not connection:
-        return None
+        raise RuntimeError("Error de conexión a la base de datos")
+    try:
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(query, args)
+            return build_products_page(db_cursor.fetchall(), sort, limit, fields)
+    finally:
+        connection.close()
+
+def page_cache_key(limit, cursor, sort, fields, filters):
+    return (sort, cursor, limit, fields, tuple(sorted((filters or {}).items())))
+
+def page_cache_tags(page, sort, filters):
+    """Ids listed on a cached page, and whether a stock change can reshuffle it"""
+    field, _ = parse_product_sort(sort)
+    return {
+        'ids': frozenset(item['id'] for item in page['items']),
+        'stock': field == 'stock' or any(name in STOCK_FILTERS for name in filters or ()),
+    }
+
+def get_products_page_service(limit, cursor=None, sort=DEFAULT_PRODUCT_SORT, fields=None, filters=None):
+    """
+    One page of products in a stable order, resuming after cursor.
+    Pages are served from the product page cache when it is enabled.
+    Raises ValueError for an unknown sort key or a malformed cursor.
+    """
+    sort = sort or DEFAULT_PRODUCT_SORT
+    parse_product_sort(sort)
+    after = decode_cursor(cursor, sort) if cursor else None
+    query, args = build_products_page_query(sort, after, limit, fields, filters)
+    
+    def load():
+        page = _load_products_page(query, args, sort, limit, fields, caches.pages_from_primary())
+        return Tagged(page, page_cache_tags(page, sort, filters))
     
+    try:
+        caches = get_product_cache()
+        if caches is None:
+            return _load_products_page(query, args, sort, limit, fields)
+        return caches.pages.get_or_load(page_cache_key(limit, cursor, sort, fields, filters), load)
+    except Exception as e:
+        print(f"Error getting products page: {e}")
+        return {'items': [], 'has_more': False, 'next_cursor': None}
+
+def get_products_total_service(filters=None):
+    """
+    Approximate product count, cached for PRODUCT_TOTAL_CACHE_TTL seconds.
+    Filtered counts are always computed and never cached.
+    """
+    if not filters:
+        total = cached_product_total()
+        if total is not None:
+            return total
+    store = (lambda total: total) if filters else store_product_total
+    query, args = build_products_count_query(filters)
+    
+    try:
+        if get_storage().shard_count > 1:
+            return store(sum(rows[0]['total'] for rows in fan_out_query(query, args)))
+        
+        connection = get_db_connection(read_only=True)
+        if not connection:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query, args)
+                return store(cursor.fetchone()['total'])
+        finally:
+            connection.close()
+    except Exception as e:
+        print(f"Error counting products: {e}")
+        return None
+
+def _all_shard_rows(query, args):
+    """Rows of query from every shard, concatenated"""
+    if get_storage().shard_count > 1:
+        return [row for rows in fan_out_query(query, args) for row in rows]
+    connection = get_db_connection(read_only=True)
+    if not connection:
+        raise RuntimeError("Error de conexión a la base de datos")
     try:
         with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT 
-                    p.id, p.name, p.description, p.purchase_price, p.sale_price, 
-                    p.stock, p.image_url, p.serial_number, p.specifications,
-                    s.name as subcategory_name, s.id as subcategory_id,
-                    c.name as category_name, c.id as category_id
-                FROM products p
-                LEFT JOIN subcategories s ON p.subcategory_id = s.id
-                LEFT JOIN categories c ON s.category_id = c.id
-                WHERE p.id = %s
-            """, (product_id,))
-            product = cursor.fetchone()
+            cursor.execute(query, args)
+            return list(cursor.fetchall())
+    finally:
+        connection.close()
+
+_search_build_lock = threading.Lock()
+
+def _ensure_search_index():
+    """The in-process search index, loaded from the database on first use"""
+    index = get_search_index()
+    if not index.built:
+        with _search_build_lock:
+            if not index.built:
+                started = time.perf_counter()
+                index.build(parse_specifications(row) for row in _all_shard_rows(SEARCH_DOCUMENTS_QUERY, None))
+                print(f"🔎 Índice de búsqueda construido: {index.stats()['documents']} productos "
+                      f"en {time.perf_counter() - started:.2f}s")
+    return index
+
+_suggest_build_lock = threading.Lock()
+
+def _ensure_suggest_index():
+    """The autocomplete index, loaded from the database if startup did not"""
+    index = get_suggest_index()
+    if not index.built:
+        with _suggest_build_lock:
+            if not index.built:
+                started = time.perf_counter()
+                limit = index.max_products
+                rows = _all_shard_rows(SUGGEST_NAMES_QUERY, [limit])
+                if get_storage().shard_count > 1:
+                    rows = sorted(rows, key=lambda row: row['id'], reverse=True)[:limit]
+                index.build(rows)
+                print(f"🔤 Índice de autocompletado construido: {index.stats()['products']} productos "
+                      f"en {time.perf_counter() - started:.2f}s")
+    return index
+
+CATALOG_SNAPSHOT_QUERY = product_select(PRODUCT_DETAIL_FIELDS) + "    ORDER BY p.id\n"
+
+def load_catalog_snapshot_products():
+    """Every product in detail shape, from the primaries: a snapshot must not lag its generation"""
+    storage = get_storage()
+    
+    def run(shard):
+        connection = get_db_connection(shard=shard)
+        if not connection:
+            raise RuntimeError("Error de conexión a la base de datos")
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(CATALOG_SNAPSHOT_QUERY)
+                return cursor.fetchall()
+        finally:
+            connection.close()
+    
+    return build_products([row for rows in storage.fan_out(run) for row in rows])
+
+def load_catalog_snapshot_stock(product_id=None):
+    """{id: stock} of product_id, or of every product, from the primaries"""
+    def run(shard):
+        if product_id is None:
+            connection = get_db_connection(shard=shard)
+        else:
+            connection = get_db_connection(product_id=product_id)
+        if not connection:
+            raise RuntimeError("Error de conexión a la base de datos")
+        try:
+            with connection.cursor() as cursor:
+                if product_id is None:
+                    cursor.execute("SELECT id, stock FROM products")
+                else:
+                    cursor.execute("SELECT id, stock FROM products WHERE id = %s", (product_id,))
+                return cursor.fetchall()
+        finally:
+            connection.close()
+    
+    rows = run(None) if product_id is not None else [row for rows in get_storage().fan_out(run) for row in rows]
+    return {row['id']: row['stock'] for row in rows}
+
+def shared_catalog():
+    """This process's handle on the shared catalog snapshot, None when CATALOG_SNAPSHOT_PATH is unset"""
+    return get_shared_catalog(load_catalog_snapshot_products, PRODUCT_LIST_FIELDS, load_catalog_snapshot_stock)
+
+def fresh_shared_catalog():
+    """The shared snapshot if it is on and may be served: its generation only covers this host's writes"""
+    catalog = shared_catalog()
+    bus = invalidation_bus()
+    if catalog is None or (bus is not None and not bus.healthy):
+        return None
+    return catalog
+
+def snapshot_products_page(limit, cursor=None, sort=DEFAULT_PRODUCT_SORT):
+    """
+    (raw JSON items, has_more, next_cursor) of an id-ordered page from the
+    shared snapshot, or None when it is off, stale, or sort is not by id.
+    Raises ValueError for a malformed cursor.
+    """
+    sort = sort or DEFAULT_PRODUCT_SORT
+    field, descending = parse_product_sort(sort)
+    catalog = fresh_shared_catalog()
+    if field != 'id' or catalog is None:
+        return None
+    after = decode_cursor(cursor, sort)[1] if cursor else None
+    snapshot = catalog.current()
+    if snapshot is None:
+        return None
+    items, has_more, last_id = snapshot.page(limit, after, descending)
+    next_cursor = encode_cursor(sort, {'id': last_id}) if has_more else None
+    return items, has_more, next_cursor
+
+def snapshot_product(product_id):
+    """Raw detail JSON of a product from the shared snapshot, or None"""
+    catalog = fresh_shared_catalog()
+    snapshot = catalog.current() if catalog is not None else None
+    return snapshot.product(product_id) if snapshot is not None else None
+
+def warm_product_cache():
+    """Load the default first page and its products, the likeliest first reads"""
+    if get_product_cache() is None:
+        return
+    page = get_products_page_service(current_app.config.get('PRODUCT_PAGE_SIZE', 50))
+    get_products_by_ids_service([item['id'] for item in page['items']])
+
+def warm_product_indexes(app):
+    """
+    Build the in-memory product indexes, warm the product cache and publish
+    the catalog snapshot in the background at startup, once per process.
+    """
+    warmup = app.extensions.get('product_warmup')
+    if warmup is not None and warmup[0] == os.getpid():
+        return warmup[1]
+    
+    def build():
+        with app.app_context():
+            try:
+                _ensure_suggest_index()
+                if search_engine_name() == 'memory':
+                    _ensure_search_index()
+                warm_product_cache()
+                # Peers' writes are applied from startup on
+                invalidation_bus()
+                catalog = shared_catalog()
+                if catalog is not None:
+                    # Also picks up writes made while no worker was running
+                    catalog.changed()
+            except Exception as e:
+                # Retried on the first lookup
+                print(f"⚠️ No se pudieron precargar los índices de productos: {e}")
+    thread = threading.Thread(target=build, name='product-index-warmup', daemon=True)
+    app.extensions['product_warmup'] = (os.getpid(), thread)
+    thread.start()
+    return thread
+
+def invalidate_product_caches(product_id, stock_only=False):
+    """
+    Drop the cached copies a committed write made stale. A stock change
+    only drops the pages listing the product or sorted/filtered by stock;
+    any other write can move products between pages, so it drops them all.
+    """
+    caches = get_product_cache()
+    if caches is None:
+        return
+    caches.written(product_id)
+    caches.rows.invalidate(product_id)
+    if stock_only:
+        caches.pages.invalidate_where(lambda key, tags: tags['stock'] or product_id in tags['ids'])
+    else:
+        caches.pages.clear()
+
+def update_product_indexes(product_id, product=None):
+    """Keep the in-process indexes current after a committed write; product=None removes it"""
+    invalidate_product_caches(product_id)
+    clear_facets_cache()
+    serial_cache = get_serial_cache()
+    if serial_cache is not None:
+        if product:
+            # Also replaces the entry of a changed serial
+            serial_cache.put(product.get('serial_number'), product_id)
+        else:
+            serial_cache.discard_id(product_id)
+    # Indexes not built yet load this write from the database when they are
+    suggest_index = get_suggest_index()
+    if suggest_index.built:
+        if product:
+            suggest_index.add(product_id, product['name'])
+        else:
+            suggest_index.remove(product_id)
+    if search_engine_name() != 'memory':
+        return
+    search_index = get_search_index()
+    if search_index.built:
+        if product:
+            search_index.add(product)
+        else:
+            search_index.remove(product_id)
+
+def product_written(product_id, product=None, stock_only=False):
+    """
+    After a committed product write: this process's caches and indexes,
+    the host's catalog snapshot, then every peer through the bus.
+    product is the written row, None for a delete; stock_only for stock changes.
+    """
+    if stock_only:
+        invalidate_product_caches(product_id, stock_only=True)
+    else:
+        update_product_indexes(product_id, product)
+    catalog = shared_catalog()
+    if catalog is not None and stock_only:
+        catalog.stock_changed(product_id)
+    elif catalog is not None:
+        # Skipped until rebuilt
+        catalog.changed()
+    publish_invalidation('product', product_id, stock_only)
+
+def invalidation_bus():
+    """This process's invalidation bus, started on first use; None when INVALIDATION_TRANSPORT is 'none'"""
+    bus = get_invalidation_bus(get_db_connection, apply_invalidations, drop_local_caches)
+    if bus is not None:
+        bus.start()
+    return bus
+
+@on_product_cache
+def consume_invalidations(app):
+    """Every process that caches products applies its peers' writes, even if it never writes itself"""
+    with app.app_context():
+        invalidation_bus()
+
+def publish_invalidation(kind, entity_id=None, stock_only=False):
+    bus = invalidation_bus()
+    if bus is not None:
+        bus.publish(kind, entity_id, stock_only)
+
+def apply_invalidations(events, other_host):
+    """Bring this process in line with writes committed by peers"""
+    for event in events:
+        if event['kind'] == 'taxonomy':
+            reload_taxonomy()
+        elif event['stock_only']:
+            invalidate_product_caches(event['id'], stock_only=True)
+        else:
+            # The indexes need the row as committed; it is gone after a delete
+            connection = get_db_connection(product_id=event['id'])
+            if not connection:
+                raise RuntimeError("Error de conexión a la base de datos")
+            try:
+                with connection.cursor() as cursor:
+                    product = fetch_product(cursor, event['id'])
+            finally:
+                connection.close()
+            update_product_indexes(event['id'], product)
+    catalog = shared_catalog()
+    if other_host and catalog is not None:
+        # Same-host writers already patched or bumped the shared snapshot
+        if all(event['kind'] == 'product' and event['stock_only'] for event in events):
+            for event in events:
+                catalog.stock_changed(event['id'])
+        else:
+            catalog.changed()
+
+def drop_local_caches():
+    """Writes may have been missed: forget everything that could be stale"""
+    caches = get_product_cache()
+    if caches is not None:
+        caches.written()
+        caches.rows.clear()
+        caches.pages.clear()
+    clear_facets_cache()
+    current_app.extensions.pop('taxonomy', None)
+
+def suggest_products_service(text, limit):
+    """Autocomplete matches for a partially typed product name, from memory"""
+    try:
+        return _ensure_suggest_index().suggest(text, limit)
+    except Exception as e:
+        print(f"Error suggesting products: {e}")
+        return []
+
+def _search_database(terms, offset, count, fields, filters):
+    """Ranked rows from the storage engine's full-text index"""
+    storage = get_storage()
+    match_sql, args = match_clause(storage.name, terms)
+    conditions, filter_args = build_product_filter_clause(filters)
+    where = f"    WHERE {' AND '.join(conditions)}\n" if conditions else ""
+    query = (
+        product_select(fields or PRODUCT_LIST_FIELDS, extra_columns=('m.score AS search_score',))
+        + match_sql + where + "    ORDER BY m.score DESC, p.id DESC\n    LIMIT %s"
+    )
+    args += filter_args
+    if storage.shard_count > 1:
+        # Each shard's top offset + count; the merged ranking is cut afterwards
+        rows = merge_sorted(
+            fan_out_query(query, args + [offset + count]),
+            key=lambda row: (row['search_score'], row['id']), reverse=True
+        )[offset:offset + count]
+    else:
+        rows = _all_shard_rows(query + " OFFSET %s", args + [count, offset])
+    for row in rows:
+        row.pop('search_score', None)
+    return rows
+
+def _search_memory(terms, offset, count, fields, filters, max_results):
+    """Ranked ids from the in-process index, rows and filters from the database"""
+    ranked = [product_id for _, product_id in _ensure_search_index().search(terms, max_results)]
+    if ranked and filters:
+        conditions, args = build_product_filter_clause(filters)
+        placeholders = ', '.join(['%s'] * len(ranked))
+        allowed = {
+            row['id'] for row in _all_shard_rows(
+                f"SELECT p.id FROM products p WHERE p.id IN ({placeholders}) AND {' AND '.join(conditions)}",
+                ranked + args
+            )
+        }
+        ranked = [product_id for product_id in ranked if product_id in allowed]
+    page_ids = ranked[offset:offset + count]
+    if not page_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(page_ids))
+    rows = _all_shard_rows(
+        product_select(fields or PRODUCT_LIST_FIELDS) + f"    WHERE p.id IN ({placeholders})\n", page_ids
+    )
+    by_id = {row['id']: row for row in rows}
+    # Rows deleted since indexing are skipped
+    return [by_id[product_id] for product_id in page_ids if product_id in by_id]
+
+def search_products_service(text, limit, cursor=None, fields=None, filters=None):
+    """
+    Products matching text, most relevant first, over name, description
+    and specification values, combined with the list filters.
+    Raises ValueError for an empty query or a cursor from another search.
+    """
+    terms = tokenize(text)
+    if not terms:
+        raise ValueError("El parámetro q debe contener al menos una palabra")
+    offset = decode_search_cursor(cursor, text) if cursor else 0
+    max_results = current_app.config.get('SEARCH_MAX_RESULTS', 1000)
+    empty_page = {'items': [], 'has_more': False, 'next_cursor': None}
+    # One extra row tells whether another page follows, within max_results
+    count = min(limit + 1, max_results - offset)
+    if count <= 0:
+        return empty_page
+    
+    try:
+        if search_engine_name() == 'memory':
+            rows = _search_memory(terms, offset, count, fields, filters, max_results)
+        else:
+            try:
+                rows = _search_database(terms, offset, count, fields, filters)
+            except pymysql.err.MySQLError as e:
+                if not fulltext_schema_missing(e):
+                    raise
+                fall_back_to_memory_search(e)
+                rows = _search_memory(terms, offset, count, fields, filters, max_results)
+    except PoolTimeout as e:
+        mark_pool_exhausted()
+        print(f"❌ Pool de base de datos agotado: {e}")
+        return empty_page
+    except Exception as e:
+        print(f"Error searching products: {e}")
+        return empty_page
+    
+    has_more = len(rows) > limit
+    return {
+        'items': build_products(rows[:limit]),
+        'has_more': has_more,
+        'next_cursor': encode_search_cursor(text, offset + limit) if has_more else None,
+    }
+
+# Filters each facet ignores, so the sidebar still offers the alternatives to a selection
+FACET_OWN_FILTERS = {
+    'categories': ('category_id', 'subcategory_id'),
+    'subcategories': ('subcategory_id',),
+    'brands': ('brand',),
+    'price': ('min_price', 'max_price'),
+    'stock': ('in_stock', 'low_stock'),
+}
+FACET_QUERIES = {
+    'categories': """
+        SELECT c.id, c.name, COUNT(*) as count
+        FROM products p
+        JOIN subcategories s ON p.subcategory_id = s.id
+        JOIN categories c ON s.category_id = c.id
+        {where}
+        GROUP BY c.id, c.name
+    """,
+    'subcategories': """
+        SELECT s.id, s.name, s.category_id, COUNT(*) as count
+        FROM products p
+        JOIN subcategories s ON p.subcategory_id = s.id
+        {where}
+        GROUP BY s.id, s.name, s.category_id
+    """,
+    'brands': f"""
+        SELECT {BRAND_EXPRESSION} as name, COUNT(*) as count
+        FROM products p
+        {{where}}
+        GROUP BY {BRAND_EXPRESSION}
+    """,
+    'price': """
+        SELECT {bucket} as bucket, COUNT(*) as count
+        FROM products p
+        {where}
+        GROUP BY {bucket}
+    """,
+    'stock': """
+        SELECT CASE WHEN p.stock > 0 THEN 'in_stock' ELSE 'out_of_stock' END as bucket, COUNT(*) as count
+        FROM products p
+        {where}
+        GROUP BY CASE WHEN p.stock > 0 THEN 'in_stock' ELSE 'out_of_stock' END
+    """,
+}
+
+_facets_cache = {}
+_facets_lock = threading.Lock()
+# Distinct filter sets kept in the facets cache
+FACETS_CACHE_SIZE = 256
+
+def price_buckets():
+    """Sorted PRODUCT_PRICE_BUCKETS edges, e.g. '100,500' -> [100.0, 500.0]"""
+    edges = current_app.config.get('PRODUCT_PRICE_BUCKETS') or ''
+    return sorted({float(edge) for edge in edges.split(',') if edge.strip()})
+
+def price_bucket_expression(edges):
+    """CASE expression numbering the price band of p.sale_price, 0 below the first edge"""
+    whens = ' '.join(
+        f"WHEN p.sale_price < {edge!r} THEN {index}" for index, edge in enumerate(edges)
+    )
+    return f"CASE {whens} ELSE {len(edges)} END" if edges else "0"
+
+def _facet_query(facet, filters, edges):
+    own = FACET_OWN_FILTERS[facet]
+    conditions, args = build_product_filter_clause(
+        {name: value for name, value in filters.items() if name not in own}
+    )
+    if facet == 'brands':
+        conditions.append(f"{BRAND_EXPRESSION} IS NOT NULL")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return FACET_QUERIES[facet].format(where=where, bucket=price_bucket_expression(edges)), args
+
+def _count_by(rows, key):
+    """Sum per-shard counts of rows sharing key(row)"""
+    counts = {}
+    for row in rows:
+        row_key = key(row)
+        if row_key in counts:
+            counts[row_key]['count'] += row['count']
+        else:
+            counts[row_key] = dict(row)
+    return sorted(counts.values(), key=lambda row: (-row['count'], str(row.get('name'))))
+
+def _price_facet(rows, edges):
+    counts = [0] * (len(edges) + 1)
+    for row in rows:
+        counts[int(row['bucket'])] += row['count']
+    bounds = [None] + edges + [None]
+    return [
+        {
+            'min': bounds[index],
+            'max': bounds[index + 1],
+            'label': f"{bounds[index]:g}+" if bounds[index + 1] is None
+            else f"{bounds[index] or 0:g}-{bounds[index + 1]:g}",
+            'count': count,
+        }
+        for index, count in enumerate(counts)
+    ]
+
+def get_product_facets_service(filters=None):
+    """
+    Counts per category, subcategory, brand, price band and stock state
+    for the products matching filters, from grouped aggregate queries.
+    Each facet ignores its own filters. Cached for FACETS_CACHE_TTL seconds.
+    """
+    filters = filters or {}
+    cache_key = tuple(sorted(filters.items()))
+    ttl = current_app.config.get('FACETS_CACHE_TTL', 30)
+    with _facets_lock:
+        cached = _facets_cache.get(cache_key)
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+    
+    edges = price_buckets()
+    try:
+        rows = {facet: _all_shard_rows(*_facet_query(facet, filters, edges)) for facet in FACET_QUERIES}
+    except PoolTimeout as e:
+        mark_pool_exhausted()
+        print(f"❌ Pool de base de datos agotado: {e}")
+        return None
+    except Exception as e:
+        print(f"Error computing product facets: {e}")
+        return None
+    
+    stock = {'in_stock': 0, 'out_of_stock': 0}
+    for row in rows['stock']:
+        stock[row['bucket']] += row['count']
+    facets = {
+        'categories': _count_by(rows['categories'], lambda row: row['id']),
+        'subcategories': _count_by(rows['subcategories'], lambda row: row['id']),
+        'brands': _count_by(rows['brands'], lambda row: row['name']),
+        'price': _price_facet(rows['price'], edges),
+        'stock': stock,
+    }
+    with _facets_lock:
+        if len(_facets_cache) >= FACETS_CACHE_SIZE:
+            _facets_cache.clear()
+        _facets_cache[cache_key] = (time.monotonic() + ttl, facets)
+    return facets
+
+def clear_facets_cache():
+    with _facets_lock:
+        _facets_cache.clear()
+
+def parse_product_ids(value, max_ids):
+    """
+    '3,1,3' or [3, 1, 3] -> [3, 1]: positive ids, deduplicated in request order.
+    Raises ValueError for anything else or more than max_ids ids.
+    """
+    items = value.split(',') if isinstance(value, str) else value
+    if not isinstance(items, (list, tuple)):
+        raise ValueError("ids debe ser una lista de enteros")
+    ids = []
+    for item in items:
+        if isinstance(item, str):
+            item = item.strip()
+            if not item:
+                continue
+        try:
+            product_id = int(item)
+        except (TypeError, ValueError):
+            raise ValueError(f"id de producto inválido: {item}") from None
+        if product_id < 1 or isinstance(item, (bool, float)):
+            raise ValueError(f"id de producto inválido: {item}")
+        ids.append(product_id)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError("Se requiere al menos un id")
+    if len(ids) > max_ids:
+        raise ValueError(f"Se permiten como máximo {max_ids} ids por solicitud")
+    return ids
+
+def products_by_ids_query(count, fields=None):
+    """Detail select (or fields) for count ids in one IN (...)"""
+    placeholders = ', '.join(['%s'] * count)
+    return product_select(fields or PRODUCT_DETAIL_FIELDS) + f"    WHERE p.id IN ({placeholders})\n"
+
+def get_products_by_ids_service(product_ids, fields=None):
+    """
+    Many products by id with one IN (...) query per shard involved.
+    Returns (products in the order of product_ids, ids that do not exist),
+    or (None, None) when the database could not be read.
+    """
+    unit_of_work = current_unit_of_work()
+    found = {}
+    if unit_of_work is not None:
+        for product_id in product_ids:
+            cached = unit_of_work.get('product', product_id)
+            if cached is not None:
+                found[product_id] = project(cached, fields)
+    caches = get_product_cache()
+    if caches is not None:
+        pending = [product_id for product_id in product_ids if product_id not in found]
+        for product_id, cached in caches.rows.get_many(pending).items():
+            if not fields:
+                remember_product(product_id, cached)
+            found[product_id] = project(cached, fields)
+        generation = caches.rows.generation
+    pending = [product_id for product_id in product_ids if product_id not in found]
+    
+    try:
+        if pending:
+            storage = get_storage()
+            by_shard = {}
+            for product_id in pending:
+                by_shard.setdefault(storage.shard_for_product(product_id), []).append(product_id)
             
-            if product and product.get('specifications'):
+            def run(shard):
+                ids = by_shard.get(shard)
+                if not ids:
+                    return []
+                if storage.shard_count == 1:
+                    connection = get_db_connection(read_only=True)
+                    if not connection:
+                        raise RuntimeError("Error de conexión a la base de datos")
+                else:
+                    connection = _acquire_read_connection(shard)
                 try:
-                    product['specifications'] = json.loads(product['specifications'])
-                except (json.JSONDecodeError, TypeError):
-                    product['specifications'] = {}
+                    with connection.cursor() as cursor:
+                        cursor.execute(products_by_ids_query(len(ids), fields), ids)
+                        return cursor.fetchall()
+                finally:
+                    connection.close()
             
-            return convert_decimals(product) if product else None
+            rows = [row for shard_rows in storage.fan_out(run) for row in shard_rows]
+            for product in build_products(rows):
+                if not fields:
+                    remember_product(product['id'], product)
+                    # Possibly a replica copy older than a recent write: do not cache it
+                    if caches is not None and not caches.row_from_primary(product['id']):
+                        caches.rows.put(product['id'], product, generation)
+                found[product['id']] = product
+    except PoolTimeout as e:
+        mark_pool_exhausted()
+        print(f"❌ Pool de base de datos agotado: {e}")
+        return None, None
     except Exception as e:
-        print(f"Error getting product by ID: {e}")
+        print(f"Error getting products by ids: {e}")
+        return None, None
+    
+    products = [found[product_id] for product_id in product_ids if product_id in found]
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    return products, missing
+
+def parse_serials(value, max_serials):
+    """List of non-empty serials, deduplicated in request order"""
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("serials debe ser una lista de números de serie")
+    serials = {}
+    for item in value:
+        if not isinstance(item, str) or not item.strip():
+            raise ValueError(f"Número de serie inválido: {item}")
+        serials.setdefault(serial_key(item), item.strip())
+    if not serials:
+        raise ValueError("Se requiere al menos un número de serie")
+    if len(serials) > max_serials:
+        raise ValueError(f"Se permiten como máximo {max_serials} números de serie por solicitud")
+    return list(serials.values())
+
+def products_by_serials_query(count, fields=None):
+    """Select (or fields, plus serial_number) for count serials, on the UNIQUE serial_number index"""
+    placeholders = ', '.join(['%s'] * count)
+    return product_select(fields or PRODUCT_DETAIL_FIELDS) + f"    WHERE p.serial_number IN ({placeholders})\n"
+
+def get_products_by_serials_service(serials, fields=None):
+    """
+    Products by serial number: cached serial -> id hints are read by id,
+    the rest with one indexed IN (...) query (on every shard when sharded).
+    Returns (products in the order of serials, serials not found), or
+    (None, None) when the database could not be read.
+    """
+    lookup_fields = tuple(dict.fromkeys(fields + ('serial_number',))) if fields else None
+    cache = get_serial_cache()
+    found = {}
+    
+    if cache is not None:
+        hinted = {serial_key(serial): cache.get(serial) for serial in serials}
+        hinted = {key: product_id for key, product_id in hinted.items() if product_id is not None}
+        if hinted:
+            products, _ = get_products_by_ids_service(list(hinted.values()), lookup_fields)
+            if products is None:
+                return None, None
+            by_id = {product['id']: product for product in products}
+            for key, product_id in hinted.items():
+                product = by_id.get(product_id)
+                if product and serial_key(product['serial_number'] or '') == key:
+                    found[key] = product
+                else:
+                    cache.discard(key)
+    
+    pending = [serial for serial in serials if serial_key(serial) not in found]
+    if pending:
+        try:
+            rows = _all_shard_rows(products_by_serials_query(len(pending), lookup_fields), pending)
+        except PoolTimeout as e:
+            mark_pool_exhausted()
+            print(f"❌ Pool de base de datos agotado: {e}")
+            return None, None
+        except Exception as e:
+            print(f"Error getting products by serial: {e}")
+            return None, None
+        for product in build_products(rows):
+            found[serial_key(product['serial_number'])] = product
+            if cache is not None:
+                cache.put(product['serial_number'], product['id'])
+            if not fields:
+                remember_product(product['id'], product)
+    
+    products = [project(found[serial_key(serial)], fields) for serial in serials if serial_key(serial) in found]
+    missing = [serial for serial in serials if serial_key(serial) not in found]
+    return products, missing
+
+def _read_product(product_id, use_primary=False, fields=None):
+    connection = get_db_connection(read_only=not use_primary, product_id=product_id)
+    if not connection:
         return None
+    
+    try:
+        with connection.cursor() as cursor:
+            return fetch_product(cursor, product_id, fields)
     finally:
         connection.close()
 
+def _load_product(product_id, use_primary=False, fields=None):
+    """
+    Read one product. Replica reads are coalesced: concurrent requests for
+    the same product and fields share one query and its result or error.
+    """
+    try:
+        if use_primary:
+            return _read_product(product_id, True, fields)
+        product, shared = get_single_flight().do(('product', product_id, fields), _read_product, product_id, False, fields)
+        return copy.deepcopy(product) if shared else product
+    except SingleFlightTimeout as e:
+        # Not a missing product: the view's 404 becomes a 504
+        mark_deadline_exceeded()
+        print(f"Error getting product by ID: {e}")
+        return None
+    except Exception as e:
+        print(f"Error getting product by ID: {e}")
+        return None
+
+def get_product_by_id_service(product_id, use_primary=False, fields=None):
+    """
+    Get product by ID with category information, or only fields.
+    use_primary=True skips replicas and every cache, for callers that
+    need the current stock rather than a possibly lagging copy.
+    """
+    unit_of_work = current_unit_of_work()
+    if unit_of_work is not None and not use_primary:
+        cached = unit_of_work.get('product', product_id)
+        if cached is not None:
+            return project(cached, fields)
+    
+    caches = None if use_primary else get_product_cache()
+    if caches is None:
+        product = _load_product(product_id, use_primary, fields)
+    elif fields:
+        # The row cache holds full rows; a miss still reads only the fields
+        cached = caches.rows.get_many([product_id]).get(product_id)
+        product = project(cached, fields) if cached else _load_product(product_id, fields=fields)
+    else:
+        product = caches.rows.get_or_load(
+            product_id, lambda: _load_product(product_id, caches.row_from_primary(product_id))
+        )
+    # Partial rows stay out of the identity map
+    return product if fields else remember_product(product_id, product)
+
+@retry_transient(idempotent=False)
 def create_product_service(data):
     """Create new product with atomic category/subcategory handling"""
-    connection = get_db_connection()
+    storage = get_storage()
+    sharded = storage.shard_count > 1
+    if sharded and 'category_name' in data and 'subcategory_name' in data:
+        # The taxonomy lives on every shard: create it on the home shard first
+        subcategory_id, error = get_or_create_subcategory(
+            data['category_name'],
+            data.get('subcategory_name', 'General')
+        )
+        if error:
+            print(f"Error creating product: {error}")
+            return None
+        data['subcategory_id'] = subcategory_id
+    
+    connection = get_db_connection(shard=storage.shard_for_new_product(data))
     if not connection:
         return None
     
@@ -201,7 +1596,7 @@ def create_product_service(data):
         
         with connection.cursor() as cursor:
             # Handle category/subcategory creation within same transaction
-            if 'category_name' in data and 'subcategory_name' in data:
+            if 'category_name' in data and 'subcategory_name' in data and not sharded:
                 subcategory_id, error = get_or_create_subcategory_atomic(
                     cursor,
                     data['category_name'], 
@@ -234,21 +1629,38 @@ def create_product_service(data):
             ))
             product_id = cursor.lastrowid
             
-            connection.commit()
+            # Read the created product back inside the same transaction
+            product = fetch_product(cursor, product_id)
+            commit(connection)
+            if 'category_name' in data:
+                refresh_taxonomy(data['subcategory_id'])
+            product_written(product_id, product)
             
-            # Return the created product
-            return get_product_by_id_service(product_id)
+            return remember_product(product_id, product)
             
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error creating product: {e}")
         return None
     finally:
         connection.close()
 
+@retry_transient(idempotent=True)
 def update_product_service(product_id, data):
     """Update existing product with enhanced validation and category handling"""
-    connection = get_db_connection()
+    sharded = get_storage().shard_count > 1
+    if sharded and 'category_name' in data:
+        # The product stays on its shard; only the taxonomy is shared
+        subcategory_id, error = get_or_create_subcategory(
+            data['category_name'],
+            data.get('subcategory_name', 'General')
+        )
+        if error:
+            return None, error
+        data['subcategory_id'] = subcategory_id
+    
+    connection = get_db_connection(product_id=product_id)
     if not connection:
         return None, "Error de conexión a la base de datos"
     
@@ -256,11 +1668,6 @@ def update_product_service(product_id, data):
         connection.begin()
         
         with connection.cursor() as cursor:
-            # Check if product exists
-            cursor.execute("SELECT id FROM products WHERE id = %s", (product_id,))
-            if not cursor.fetchone():
-                return None, "Producto no encontrado"
-            
             validation_errors = []
             
             # Validate name
@@ -297,7 +1704,7 @@ def update_product_service(product_id, data):
                     validation_errors.append("El stock debe ser un número entero válido")
             
             # Handle category/subcategory update atomically
-            if 'category_name' in data:
+            if 'category_name' in data and not sharded:
                 subcategory_id, error = get_or_create_subcategory_atomic(
                     cursor,
                     data['category_name'], 
@@ -308,13 +1715,8 @@ def update_product_service(product_id, data):
                 else:
                     data['subcategory_id'] = subcategory_id
             
-            # Validate subcategory exists
-            if 'subcategory_id' in data:
-                cursor.execute("SELECT id FROM subcategories WHERE id = %s", (data['subcategory_id'],))
-                if not cursor.fetchone():
-                    validation_errors.append("La subcategoría especificada no existe")
-            
             if validation_errors:
+                rollback(connection)
                 return None, "; ".join(validation_errors)
             
             set_clauses = []
@@ -335,26 +1737,41 @@ def update_product_service(product_id, data):
                 set_clauses.append("specifications = %s")
                 values.append(json.dumps(data['specifications']))
             
-            if not set_clauses:
-                return get_product_by_id_service(product_id), None
-            
-            query = f"UPDATE products SET {', '.join(set_clauses)} WHERE id = %s"
-            values.append(product_id)
+            if set_clauses:
+                query = f"UPDATE products SET {', '.join(set_clauses)} WHERE id = %s"
+                values.append(product_id)
+                cursor.execute(query, tuple(values))
             
-            cursor.execute(query, tuple(values))
-            connection.commit()
+            # The post-write read doubles as the existence check
+            product = fetch_product(cursor, product_id)
+            if not product:
+                rollback(connection)
+                return None, "Producto no encontrado"
             
-            return get_product_by_id_service(product_id), None
+            commit(connection)
+            if 'category_name' in data:
+                refresh_taxonomy(data['subcategory_id'])
+            product_written(product_id, product)
+            return remember_product(product_id, product), None
+    except pymysql.err.IntegrityError as e:
+        rollback(connection)
+        # The subcategory foreign key replaces a separate existence SELECT
+        if e.args and e.args[0] == ER_NO_REFERENCED_ROW_2:
+            return None, "La subcategoría especificada no existe"
+        print(f"Error updating product: {e}")
+        return None, f"Error interno del servidor: {str(e)}"
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error updating product: {e}")
         return None, f"Error interno del servidor: {str(e)}"
     finally:
         connection.close()
 
+@retry_transient(idempotent=True)
 def delete_product_service(product_id):
     """Delete product by ID"""
-    connection = get_db_connection()
+    connection = get_db_connection(product_id=product_id)
     if not connection:
         return False
     
@@ -362,118 +1779,65 @@ def delete_product_service(product_id):
         with connection.cursor() as cursor:
             cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
             deleted = cursor.rowcount > 0
-            connection.commit()
+            commit(connection)
+            forget_product(product_id)
+            product_written(product_id)
             return deleted
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error deleting product: {e}")
         return False
     finally:
         connection.close()
 
+@retry_transient(idempotent=False)
 def decrease_stock_service(product_id, quantity):
     """
     Decrease product stock
     Returns: (updated_product, error_message) 
     """
-    connection = get_db_connection()
+    connection = get_db_connection(product_id=product_id)
     if not connection:
         return None, "Error de conexión a la base de datos"
     
     try:
         with connection.cursor() as cursor:
-            # Get current product
-            cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
-            product = cursor.fetchone()
-            if not product:
-                return None, "Producto no encontrado"
-            
-            # Check sufficient stock
-            if product['stock'] < quantity:
-                return None, f"Stock insuficiente. Disponible: {product['stock']}"
-            
-            # Update stock
-            new_stock = product['stock'] - quantity
-            cursor.execute("UPDATE products SET stock = %s WHERE id = %s", (new_stock, product_id))
-            connection.commit()
+            # Check and decrement in one statement: the row lock makes it race-free
+            cursor.execute(DECREASE_STOCK_QUERY, (quantity, product_id, quantity))
+            if cursor.rowcount == 0:
+                # Only the failure path pays for telling the two cases apart
+                cursor.execute("SELECT stock FROM products WHERE id = %s", (product_id,))
+                current = cursor.fetchone()
+                rollback(connection)
+                if not current:
+                    return None, "Producto no encontrado"
+                return None, f"Stock insuficiente. Disponible: {current['stock']}"
             
-            # Return updated product
-            updated_product = get_product_by_id_service(product_id)
-            return updated_product, None
+            product = fetch_product(cursor, product_id)
+            commit(connection)
+            product_written(product_id, stock_only=True)
+            return remember_product(product_id, product), None
             
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error decreasing stock: {e}")
         return None, f"Error interno: {str(e)}"
     finally:
         connection.close()
 
 def get_categories_service():
-    """Get all categories with subcategories"""
-    connection = get_db_connection()
-    if not connection:
-        return []
-    
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT c.id, c.name, c.description,
-                       GROUP_CONCAT(
-                           CONCAT('{"id":', COALESCE(s.id, 'null'), ',"name":"', COALESCE(s.name, ''), '"}')
-                           SEPARATOR ','
-                       ) as subcategories_json
-                FROM categories c
-                LEFT JOIN subcategories s ON c.id = s.category_id
-                GROUP BY c.id, c.name, c.description
-                ORDER BY c.name
-            """)
-            categories = cursor.fetchall()
-            
-            # Parse subcategories from GROUP_CONCAT result
-            for category in categories:
-                if category['subcategories_json']:
-                    try:
-                        # Build proper JSON array from GROUP_CONCAT result
-                        subcats_str = f"[{category['subcategories_json']}]"
-                        subcats = json.loads(subcats_str)
-                        # Filter out null subcategories
-                        category['subcategories'] = [s for s in subcats if s['id'] is not None]
-                    except (json.JSONDecodeError, TypeError):
-                        category['subcategories'] = []
-                else:
-                    category['subcategories'] = []
-                
-                # Remove the temporary field
-                del category['subcategories_json']
-            
-            return categories
-    except Exception as e:
-        print(f"Error getting categories: {e}")
-        return []
-    finally:
-        connection.close()
+    """Get all categories with subcategories, from the taxonomy snapshot"""
+    taxonomy = get_taxonomy()
+    return taxonomy.tree() if taxonomy else []
 
 def get_subcategories_by_category_service(category_id):
-    """Get subcategories for a specific category"""
-    connection = get_db_connection()
-    if not connection:
-        return []
-    
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT id, name, category_id
-                FROM subcategories
-                WHERE category_id = %s
-                ORDER BY name
-            """, (category_id,))
-            return cursor.fetchall()
-    except Exception as e:
-        print(f"Error getting subcategories: {e}")
-        return []
-    finally:
-        connection.close()
+    """Get subcategories for a specific category, from the taxonomy snapshot"""
+    taxonomy = get_taxonomy()
+    return taxonomy.subcategories_of(category_id) if taxonomy else []
 
+@retry_transient(idempotent=False)
 def create_category_service(name, description=""):
     """Create new category"""
     connection = get_db_connection()
@@ -493,21 +1857,25 @@ def create_category_service(name, description=""):
                 (name, description)
             )
             category_id = cursor.lastrowid
-            connection.commit()
             
-            # Return created category
+            # Read the created category back inside the same transaction
             cursor.execute("SELECT * FROM categories WHERE id = %s", (category_id,))
             category = cursor.fetchone()
-            
-            return category, None
+            commit(connection)
+        
+        replicate_taxonomy(category_id=category_id)
+        refresh_taxonomy()
+        return category, None
             
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error creating category: {e}")
         return None, f"Error creando categoría: {str(e)}"
     finally:
         connection.close()
 
+@retry_transient(idempotent=False)
 def create_subcategory_service(category_id, name):
     """Create new subcategory for a specific category"""
     connection = get_db_connection()
@@ -535,20 +1903,53 @@ def create_subcategory_service(category_id, name):
                 (name, category_id)
             )
             subcategory_id = cursor.lastrowid
-            connection.commit()
             
-            # Return created subcategory
+            # Read the created subcategory back inside the same transaction
             cursor.execute(
                 "SELECT id, name, category_id FROM subcategories WHERE id = %s", 
                 (subcategory_id,)
             )
             subcategory = cursor.fetchone()
-            
-            return subcategory
+            commit(connection)
+        
+        replicate_taxonomy(subcategory_id=subcategory_id)
+        refresh_taxonomy()
+        return subcategory
             
     except Exception as e:
-        connection.rollback()
+        rollback(connection)
+        raise_if_retryable(e, connection)
         print(f"Error creating subcategory: {e}")
         raise
     finally:
-        connection.close()
\ No newline at end of file
+        connection.close()
+
+# Worker threads for independent reads of one request (catalog bootstrap)
+_concurrent_reads = ThreadPoolExecutor(max_workers=8, thread_name_prefix='catalog-read')
+
+def run_concurrently(calls):
+    """
+    Run {name: (fn, *args)} service calls in parallel and return
+    {name: result}. Each call runs in a copy of the request context (same
+    deadline) on a pooled connection of its own; exceptions propagate.
+    """
+    futures = {
+        name: _concurrent_reads.submit(contextvars.copy_context().run, run_detached, fn, *args)
+        for name, (fn, *args) in calls.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+def get_catalog_bootstrap_service(limit, sort=DEFAULT_PRODUCT_SORT, fields=None, filters=None):
+    """
+    Everything the catalog's first paint needs: categories, the first page
+    of products and the facet counts, queried concurrently, so the latency
+    is that of the slowest query rather than the sum.
+    Raises ValueError for an unknown sort key.
+    """
+    sort = sort or DEFAULT_PRODUCT_SORT
+    parse_product_sort(sort)
+    return run_concurrently({
+        'categories': (get_categories_service,),
+        'products': (get_products_page_service, limit, None, sort, fields, filters),
+        'facets': (get_product_facets_service, filters),
+    })
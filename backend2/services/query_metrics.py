@@ -0,0 +1,255 @@
+import logging
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+import pymysql
+from flask import current_app, g, has_app_context, has_request_context, request
+
+from services.deadline import DeadlineCursorMixin
+
+slow_query_logger = logging.getLogger('backend2.slow_queries')
+budget_logger = logging.getLogger('backend2.query_budget')
+
+# Frames from these modules are skipped when looking for the calling service
+_INFRASTRUCTURE_PREFIXES = (
+    'pymysql', 'services.query_metrics', 'services.deadline', 'services.db_pool', 'services.unit_of_work',
+    'services.storage', 'services.sqlite_engine'
+)
+
+_current_budget = ContextVar('query_budget', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """A request or block ran more statements than its query budget allows"""
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Normalize a statement so calls that differ only in literals group together"""
+    sql = re.sub(r'/\*.*?\*/', ' ', sql, flags=re.S)
+    sql = re.sub(r"'(?:[^'\\]|\\.)*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s', '?', sql)
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?+)', sql)
+    return sql
+
+
+def calling_function():
+    """Name of the service function that issued the statement"""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_INFRASTRUCTURE_PREFIXES):
+            name = f"{module}.{frame.f_code.co_name}"
+            if frame.f_code.co_name.endswith('_service'):
+                return name
+            fallback = fallback or name
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+class QueryStats:
+    """Aggregated timings per SQL fingerprint"""
+
+    def __init__(self, max_fingerprints=500):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.slow_queries = 0
+
+    def record(self, sql_fingerprint, caller, elapsed_ms, rows, slow):
+        with self._lock:
+            entry = self._stats.get(sql_fingerprint)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    return
+                entry = self._stats[sql_fingerprint] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'callers': {}
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += max(rows, 0)
+            entry['callers'][caller] = entry['callers'].get(caller, 0) + 1
+            if slow:
+                self.slow_queries += 1
+
+    def top(self, limit=20):
+        """Fingerprints ordered by total time spent"""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+            return {
+                'slow_queries': self.slow_queries,
+                'statements': [
+                    {
+                        'fingerprint': sql,
+                        'count': entry['count'],
+                        'total_ms': round(entry['total_ms'], 3),
+                        'avg_ms': round(entry['total_ms'] / entry['count'], 3),
+                        'max_ms': round(entry['max_ms'], 3),
+                        'rows': entry['rows'],
+                        'callers': dict(entry['callers']),
+                    }
+                    for sql, entry in items[:limit]
+                ],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries = 0
+
+
+query_stats = QueryStats()
+
+
+class QueryBudget:
+    """Statement counter for one request or block"""
+
+    def __init__(self, limit, mode='warn', label=''):
+        self.limit = limit
+        self.mode = mode
+        self.label = label
+        self.count = 0
+        self.statements = []
+        self.warned = False
+
+    @property
+    def exceeded(self):
+        return bool(self.limit) and self.count > self.limit
+
+    def add(self, sql_fingerprint, caller):
+        self.count += 1
+        self.statements.append((caller, sql_fingerprint))
+        if self.exceeded and self.mode == 'warn' and not self.warned:
+            self.warned = True
+            budget_logger.warning(
+                "Presupuesto de consultas excedido en %s: más de %s sentencias (%s)",
+                self.label, self.limit, self.summary()
+            )
+
+    def summary(self):
+        """Callers ordered by number of statements, to spot N+1 patterns"""
+        counts = {}
+        for caller, _ in self.statements:
+            counts[caller] = counts.get(caller, 0) + 1
+        return ', '.join(f"{caller} x{n}" for caller, n in sorted(counts.items(), key=lambda i: -i[1]))
+
+    def check(self):
+        if self.exceeded and self.mode == 'raise':
+            raise QueryBudgetExceeded(
+                f"{self.label}: {self.count} sentencias, presupuesto {self.limit} ({self.summary()})"
+            )
+
+
+@contextmanager
+def query_budget(limit, label='bloque'):
+    """Raise QueryBudgetExceeded if the block runs more than limit statements"""
+    budget = QueryBudget(limit, mode='raise', label=label)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+    budget.check()
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def record_query(sql, elapsed, rows):
+    """Account one statement in stats, the slow-query log and the active budget"""
+    elapsed_ms = elapsed * 1000
+    sql_fingerprint = fingerprint(sql) if isinstance(sql, str) else fingerprint(sql.decode('utf-8', 'replace'))
+    caller = calling_function()
+    threshold = _config('MYSQL_SLOW_QUERY_MS', 200)
+    slow = threshold is not None and elapsed_ms >= threshold
+    if slow:
+        slow_query_logger.warning(
+            "%.1f ms | %s filas | %s | %s", elapsed_ms, rows, caller, sql_fingerprint
+        )
+    query_stats.record(sql_fingerprint, caller, elapsed_ms, rows, slow)
+
+    budget = _current_budget.get()
+    if budget is None and has_request_context():
+        budget = g.get('_query_budget')
+    if budget is not None:
+        budget.add(sql_fingerprint, caller)
+
+
+class InstrumentedCursorMixin:
+    """Times every execute() and records it in the query metrics"""
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start, self.rowcount)
+
+
+class InstrumentedDictCursor(InstrumentedCursorMixin, DeadlineCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+class InstrumentedSSDictCursor(InstrumentedCursorMixin, DeadlineCursorMixin, pymysql.cursors.SSDictCursor):
+    pass
+
+
+def request_label():
+    return f"{request.method} {request.path}"
+
+
+def request_budget(app, label):
+    """Budget of one request from MYSQL_QUERY_BUDGET(_MODE), or None when disabled"""
+    limit = app.config.get('MYSQL_QUERY_BUDGET', 0)
+    if not limit:
+        return None
+    mode = app.config.get('MYSQL_QUERY_BUDGET_MODE') or ('raise' if app.testing else 'warn')
+    return QueryBudget(limit, mode=mode, label=label)
+
+
+@contextmanager
+def async_request_budget(app, label):
+    """Budget of an ASGI request: counted and checked like a Flask request's"""
+    budget = request_budget(app, label)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+    if budget is not None:
+        budget.check()
+
+
+def _start_request_budget():
+    g._query_budget = request_budget(current_app, request_label())
+
+
+def _check_request_budget(response):
+    budget = g.get('_query_budget')
+    if budget is not None:
+        budget.check()
+    return response
+
+
+def init_query_metrics(app):
+    """Per-request query budgets and the optional slow-query log file"""
+    app.before_request(_start_request_budget)
+    app.after_request(_check_request_budget)
+    log_path = app.config.get('MYSQL_SLOW_QUERY_LOG')
+    if log_path:
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.WARNING)
@@ -0,0 +1,204 @@
+import itertools
+import threading
+import time
+
+from flask import current_app
+
+from services.db_pool import PoolTimeout, create_pool_from_config, mysql_connect_kwargs
+
+# Guards lazy creation of the per-app replica sets
+_replica_sets_lock = threading.Lock()
+
+
+def parse_replica_hosts(value, default_port=3306):
+    """Parse 'host1:3307,host2' into [('host1', 3307), ('host2', 3306)]"""
+    hosts = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(':')
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+
+class Replica:
+    """One read replica with its own pool and health state"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.lag = None
+        self.last_error = None
+        self.ejections = 0
+
+    def mark_unhealthy(self, error):
+        if self.healthy:
+            self.ejections += 1
+        self.healthy = False
+        self.last_error = str(error)
+
+    def check(self, max_lag, timeout=None):
+        """Ping the replica and eject it when replication lags behind max_lag"""
+        connection = None
+        try:
+            connection = self.pool.acquire(timeout)
+            with connection.cursor() as cursor:
+                lag = self._replication_lag(cursor)
+        except Exception as e:
+            if connection:
+                connection.discard()
+                connection = None
+            self.mark_unhealthy(e)
+            return
+        finally:
+            if connection:
+                connection.close()
+
+        self.lag = lag
+        if lag is not None and lag > max_lag:
+            self.mark_unhealthy(f"Retraso de replicación {lag}s > {max_lag}s")
+        else:
+            self.healthy = True
+            self.last_error = None
+
+    @staticmethod
+    def _replication_lag(cursor):
+        """Seconds behind the primary; 0 when the server is not replicating"""
+        for statement, column in (
+            ("SHOW REPLICA STATUS", 'Seconds_Behind_Source'),
+            ("SHOW SLAVE STATUS", 'Seconds_Behind_Master'),
+        ):
+            try:
+                cursor.execute(statement)
+            except Exception:
+                continue
+            status = cursor.fetchone()
+            if not status:
+                return 0
+            lag = status.get(column)
+            if lag is None:
+                # Replication threads stopped: the data can be arbitrarily old
+                raise RuntimeError("Replicación detenida")
+            return int(lag)
+        # No privilege to read replication status; the ping above succeeded
+        return None
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag,
+            'ejections': self.ejections,
+            'last_error': self.last_error,
+            'pool': self.pool.stats(),
+        }
+
+
+class ReplicaSet:
+    """
+    Round-robin routing over healthy replicas. Health checks run on a
+    background thread at most once per check_interval, so a dead replica
+    never stalls the request that happens to trigger its check.
+    """
+
+    def __init__(self, replicas, max_lag=5, check_interval=10, check_timeout=2.0):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._cycle = itertools.cycle(range(len(replicas))) if replicas else None
+        self._cycle_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._checker = None
+        self._last_check = 0.0
+        self.fallbacks = 0
+
+    def check_health(self, force=False):
+        """
+        Start a background check when the last one is older than
+        check_interval; force=True checks inline and waits for the result.
+        """
+        if force:
+            self.run_checks()
+            return
+        if time.monotonic() - self._last_check < self.check_interval:
+            return
+        with self._check_lock:
+            # is_alive() is False in a forked child, so the child checks again
+            if self._checker is not None and self._checker.is_alive():
+                return
+            self._last_check = time.monotonic()
+            self._checker = threading.Thread(target=self.run_checks, name='replica-health', daemon=True)
+            self._checker.start()
+
+    def run_checks(self):
+        self._last_check = time.monotonic()
+        for replica in self.replicas:
+            replica.check(self.max_lag, self.check_timeout)
+
+    def acquire(self, timeout=None):
+        """Connection to a healthy replica, or None to fall back to the primary"""
+        if not self.replicas:
+            return None
+        self.check_health()
+        for _ in range(len(self.replicas)):
+            with self._cycle_lock:
+                replica = self.replicas[next(self._cycle)]
+            if not replica.healthy:
+                continue
+            try:
+                return replica.pool.acquire(timeout)
+            except PoolTimeout:
+                # Saturated, not unhealthy: try the next replica
+                continue
+            except Exception as e:
+                replica.mark_unhealthy(e)
+        self.fallbacks += 1
+        return None
+
+    def stats(self):
+        return {
+            'max_lag_seconds': self.max_lag,
+            'fallbacks_to_primary': self.fallbacks,
+            'replicas': [replica.stats() for replica in self.replicas],
+        }
+
+
+def create_replica_set_from_config(config):
+    """Build a ReplicaSet from MYSQL_REPLICA_HOSTS; empty when unset"""
+    replicas = []
+    for host, port in parse_replica_hosts(config.get('MYSQL_REPLICA_HOSTS'), config['MYSQL_PORT']):
+        # A replica that does not answer quickly is treated as down, not waited for
+        connect_kwargs = dict(
+            mysql_connect_kwargs(config), host=host, port=port,
+            connect_timeout=config.get('MYSQL_REPLICA_CHECK_TIMEOUT', 2.0)
+        )
+        replicas.append(Replica(f"{host}:{port}", create_pool_from_config(config, connect_kwargs)))
+    return ReplicaSet(
+        replicas,
+        max_lag=config.get('MYSQL_REPLICA_MAX_LAG', 5),
+        check_interval=config.get('MYSQL_REPLICA_CHECK_INTERVAL', 10),
+        check_timeout=config.get('MYSQL_REPLICA_CHECK_TIMEOUT', 2.0),
+    )
+
+
+def get_replica_set(app=None):
+    """Return the replica set for the app, creating it on first use"""
+    app = app or current_app._get_current_object()
+    replica_set = app.extensions.get('mysql_replicas')
+    if replica_set is None:
+        with _replica_sets_lock:
+            replica_set = app.extensions.get('mysql_replicas')
+            if replica_set is None:
+                replica_set = create_replica_set_from_config(app.config)
+                app.extensions['mysql_replicas'] = replica_set
+    return replica_set
+
+
+def get_replica_stats(app=None):
+    """Replica health and pool statistics, or None when never used"""
+    app = app or current_app._get_current_object()
+    replica_set = app.extensions.get('mysql_replicas')
+    return replica_set.stats() if replica_set else None
@@ -0,0 +1,201 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+import pymysql
+from pymysql.constants import CR, ER
+from flask import current_app, has_app_context
+
+from services.deadline import remaining
+
+# MySQL errors worth retrying the whole transaction for
+TRANSIENT_ERRORS = {
+    ER.LOCK_DEADLOCK: 'deadlock',
+    ER.LOCK_WAIT_TIMEOUT: 'lock_wait_timeout',
+    CR.CR_SERVER_GONE_ERROR: 'server_gone',
+    CR.CR_SERVER_LOST: 'connection_lost',
+}
+
+_attempt = ContextVar('retry_attempt', default=None)
+
+
+class RetryableError(Exception):
+    """Internal signal from a service to its @retry_transient wrapper"""
+
+    def __init__(self, code, cause):
+        super().__init__(f"{TRANSIENT_ERRORS.get(code, code)}: {cause}")
+        self.code = code
+
+
+class _Attempt:
+    __slots__ = ('idempotent', 'can_retry')
+
+    def __init__(self, idempotent, can_retry):
+        self.idempotent = idempotent
+        self.can_retry = can_retry
+
+
+class RetryBudget:
+    """Token bucket that caps retries to a fraction of calls, so retries cannot snowball"""
+
+    def __init__(self, capacity=20):
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._lock = threading.Lock()
+
+    def deposit(self, ratio):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        return round(self._tokens, 2)
+
+
+class RetryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.recovered = 0
+        self.budget_exhausted = 0
+        self.deadline_exhausted = 0
+        self.not_retried_unsafe = 0
+        self.by_error = {}
+
+    def add(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def add_error(self, code):
+        with self._lock:
+            name = TRANSIENT_ERRORS.get(code, str(code))
+            self.by_error[name] = self.by_error.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'recovered': self.recovered,
+                'budget_exhausted': self.budget_exhausted,
+                'deadline_exhausted': self.deadline_exhausted,
+                'not_retried_unsafe': self.not_retried_unsafe,
+                'by_error': dict(self.by_error),
+                'budget_tokens': retry_budget.tokens,
+            }
+
+
+retry_budget = RetryBudget()
+retry_metrics = RetryMetrics()
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def error_code(error):
+    if isinstance(error, pymysql.err.MySQLError) and error.args and isinstance(error.args[0], int):
+        return error.args[0]
+    return None
+
+
+def rollback(connection):
+    """Roll back, ignoring errors from a connection that is already dead"""
+    try:
+        connection.rollback()
+    except Exception:
+        pass
+
+
+def commit(connection):
+    """Commit, flagging a lost connection here as an unknown transaction outcome"""
+    try:
+        connection.commit()
+    except pymysql.err.MySQLError as e:
+        e.during_commit = True
+        raise
+
+
+def raise_if_retryable(error, connection):
+    """
+    Called from a service's except block after rolling back.
+    Re-raises transient errors as RetryableError when the enclosing
+    @retry_transient may run the transaction again; otherwise returns and
+    the service handles the error as before.
+    """
+    code = error_code(error)
+    if code not in TRANSIENT_ERRORS:
+        return
+    if connection is not None and not getattr(connection, 'open', True):
+        # Dropped connection: never hand it out again
+        connection.discard()
+
+    attempt = _attempt.get()
+    if attempt is None or not attempt.can_retry:
+        return
+    if getattr(error, 'during_commit', False) and not attempt.idempotent:
+        # The commit may have been applied; running the work again could apply it twice
+        retry_metrics.add('not_retried_unsafe')
+        return
+    if not retry_budget.withdraw():
+        retry_metrics.add('budget_exhausted')
+        return
+    raise RetryableError(code, error) from error
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff in seconds"""
+    base = _config('MYSQL_RETRY_BASE_DELAY_MS', 50) / 1000
+    cap = _config('MYSQL_RETRY_MAX_DELAY_MS', 1000) / 1000
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_transient(idempotent=False):
+    """
+    Retry a service's transaction on deadlocks, lock-wait timeouts and
+    dropped connections, with jittered exponential backoff.
+    Only idempotent services are retried after a failed COMMIT. When the
+    request deadline leaves no time for the backoff, the last error is
+    raised instead of running the transaction again.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            max_attempts = max(_config('MYSQL_RETRY_MAX_ATTEMPTS', 3), 1)
+            retry_budget.deposit(_config('MYSQL_RETRY_BUDGET_RATIO', 0.2))
+            retry_metrics.add('calls')
+            attempt = 0
+            while True:
+                token = _attempt.set(_Attempt(idempotent, attempt + 1 < max_attempts))
+                try:
+                    result = fn(*args, **kwargs)
+                    if attempt:
+                        retry_metrics.add('recovered')
+                    return result
+                except RetryableError as e:
+                    retry_metrics.add_error(e.code)
+                    delay = backoff_delay(attempt)
+                    left = remaining()
+                    if left is not None and left <= delay:
+                        retry_metrics.add('deadline_exhausted')
+                        raise e.__cause__
+                    retry_metrics.add('retries')
+                    attempt += 1
+                    print(f"⚠️ Reintentando {fn.__name__} ({e}), intento {attempt + 1}")
+                    time.sleep(delay)
+                finally:
+                    _attempt.reset(token)
+        return wrapper
+    return decorator
@@ -0,0 +1,198 @@
+"""
+Product search: relevance-ranked matching over name, description and
+specification values.
+
+SEARCH_ENGINE='database' uses the storage engine's own full-text index
+(MySQL FULLTEXT, SQLite FTS5), kept in sync by the database itself.
+SEARCH_ENGINE='memory' keeps an inverted index in the process, built on
+first use and updated by the product write services.
+
+A MySQL database created before the search schema (see utils/migrations.py)
+has no FULLTEXT index: the first search reports it and the process falls
+back to the in-memory index instead of answering every search with nothing.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict, Counter
+
+from flask import current_app
+from pymysql.constants import ER
+
+SEARCH_ENGINES = ('database', 'memory')
+
+# Relevance weight of a term found in each field
+FIELD_WEIGHTS = {'name': 3.0, 'specifications': 1.5, 'description': 1.0}
+
+_TOKEN = re.compile(r'\w+')
+_index_lock = threading.Lock()
+
+# Relevance subqueries joined to the product select as m(id, score), higher is better
+MYSQL_MATCH = """
+    JOIN (
+        SELECT id,
+            MATCH(name) AGAINST (%s IN NATURAL LANGUAGE MODE) * 3
+            + MATCH(name, description, specifications_text) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+        FROM products
+        WHERE MATCH(name, description, specifications_text) AGAINST (%s IN NATURAL LANGUAGE MODE)
+    ) m ON m.id = p.id
+"""
+SQLITE_MATCH = """
+    JOIN (
+        SELECT rowid AS id, -bm25(product_search, 3.0, 1.0, 1.5) AS score
+        FROM product_search
+        WHERE product_search MATCH %s
+    ) m ON m.id = p.id
+"""
+
+
+def fold(text):
+    """Casefold and strip accents, so 'Cámara' matches 'camara'"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return _TOKEN.findall(fold(text)) if text else []
+
+
+def specification_text(specifications):
+    """Values of a specifications dict (or JSON-decoded value) as plain text"""
+    if isinstance(specifications, dict):
+        return ' '.join(specification_text(value) for value in specifications.values())
+    if isinstance(specifications, (list, tuple)):
+        return ' '.join(specification_text(value) for value in specifications)
+    return '' if specifications is None else str(specifications)
+
+
+def match_clause(engine_name, terms):
+    """Relevance join and its arguments for the storage engine's full-text index"""
+    if engine_name == 'sqlite':
+        # Quoted terms: user input never reaches the FTS5 query syntax
+        return SQLITE_MATCH, [' OR '.join(f'"{term}"' for term in terms)]
+    text = ' '.join(terms)
+    return MYSQL_MATCH, [text, text, text]
+
+
+class InvertedIndex:
+    """
+    In-process term -> {product_id: weighted term frequency} index,
+    ranked with tf-idf. Thread safe; updated one product at a time.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._lock = threading.RLock()
+        self.built = False
+
+    def _terms(self, product):
+        weights = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = product.get(field)
+            if field == 'specifications':
+                value = specification_text(value)
+            for token in tokenize(value):
+                weights[token] += weight
+        return weights
+
+    def add(self, product):
+        terms = self._terms(product)
+        with self._lock:
+            self._remove(product['id'])
+            for term, weight in terms.items():
+                self._postings[term][product['id']] = weight
+            self._documents[product['id']] = tuple(terms)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        for term in self._documents.pop(product_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def build(self, products):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            for product in products:
+                self.add(product)
+            self.built = True
+
+    def search(self, terms, limit):
+        """Up to limit (score, product_id) pairs, best first"""
+        scores = defaultdict(float)
+        with self._lock:
+            total = len(self._documents) or 1
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for product_id, weight in postings.items():
+                    scores[product_id] += weight * idf
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [(score, product_id) for product_id, score in ranked]
+
+    def stats(self):
+        with self._lock:
+            return {'built': self.built, 'documents': len(self._documents), 'terms': len(self._postings)}
+
+
+def search_engine_name(app=None):
+    """Configured engine, or 'memory' once the database turned out to lack the search schema"""
+    app = app or current_app._get_current_object()
+    name = (app.config.get('SEARCH_ENGINE') or 'database').lower()
+    if name not in SEARCH_ENGINES:
+        raise ValueError(f"Motor de búsqueda desconocido: {name}")
+    if name == 'database' and app.extensions.get('search_fallback'):
+        return 'memory'
+    return name
+
+
+def fulltext_schema_missing(error):
+    """True for the MySQL errors of a database without the FULLTEXT indexes or specifications_text"""
+    code = error.args[0] if error.args else None
+    return code == ER.FT_MATCHING_KEY_NOT_FOUND or (
+        code == ER.BAD_FIELD_ERROR and 'specifications_text' in str(error)
+    )
+
+
+def fall_back_to_memory_search(error, app=None):
+    app = app or current_app._get_current_object()
+    if not app.extensions.get('search_fallback'):
+        print(f"❌ La base de datos no tiene el esquema de búsqueda ({error}). "
+              f"Ejecute 'python -m utils.migrations' y reinicie; mientras, se busca en memoria")
+    app.extensions['search_fallback'] = str(error)
+
+
+def get_search_index(app=None):
+    """The app's in-process index, created empty on first use"""
+    app = app or current_app._get_current_object()
+    index = app.extensions.get('search_index')
+    if index is None:
+        with _index_lock:
+            index = app.extensions.get('search_index')
+            if index is None:
+                index = InvertedIndex()
+                app.extensions['search_index'] = index
+    return index
+
+
+def get_search_stats(app=None):
+    """Engine name and, in memory mode, index size"""
+    app = app or current_app._get_current_object()
+    stats = {'engine': (app.config.get('SEARCH_ENGINE') or 'database').lower()}
+    if app.extensions.get('search_fallback'):
+        stats['fallback'] = app.extensions['search_fallback']
+    index = app.extensions.get('search_index')
+    if index is not None:
+        stats['index'] = index.stats()
+    return stats
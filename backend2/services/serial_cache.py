@@ -0,0 +1,103 @@
+"""
+Bounded serial_number -> product id cache for barcode lookups.
+Entries are only hints: readers check the serial on the row they load,
+and the product write services update or drop the entry of the product
+they change, so a stale entry costs one extra query, never a wrong answer.
+"""
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+_cache_lock = threading.Lock()
+
+
+def serial_key(serial):
+    """MySQL compares serials case-insensitively; so does the cache"""
+    return serial.strip().casefold()
+
+
+class SerialCache:
+    """LRU map of serial -> id, with the reverse map to drop a product's entry"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._serials = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, serial):
+        key = serial_key(serial)
+        with self._lock:
+            product_id = self._ids.get(key)
+            if product_id is None:
+                self.misses += 1
+                return None
+            self._ids.move_to_end(key)
+            self.hits += 1
+            return product_id
+
+    def put(self, serial, product_id):
+        if not serial or self.max_size <= 0:
+            return
+        key = serial_key(serial)
+        with self._lock:
+            self._discard_id(product_id)
+            self._discard_key(key)
+            self._ids[key] = product_id
+            self._serials[product_id] = key
+            while len(self._ids) > self.max_size:
+                _, evicted = self._ids.popitem(last=False)
+                self._serials.pop(evicted, None)
+
+    def discard(self, serial):
+        with self._lock:
+            self._discard_key(serial_key(serial))
+
+    def discard_id(self, product_id):
+        with self._lock:
+            self._discard_id(product_id)
+
+    def _discard_key(self, key):
+        product_id = self._ids.pop(key, None)
+        if product_id is not None:
+            self._serials.pop(product_id, None)
+
+    def _discard_id(self, product_id):
+        key = self._serials.pop(product_id, None)
+        if key is not None:
+            self._ids.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._ids),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+def get_serial_cache(app=None):
+    """The app's serial cache, or None when SERIAL_CACHE_SIZE is 0"""
+    app = app or current_app._get_current_object()
+    if app.config.get('SERIAL_CACHE_SIZE', 10000) <= 0:
+        return None
+    cache = app.extensions.get('serial_cache')
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get('serial_cache')
+            if cache is None:
+                cache = SerialCache(app.config.get('SERIAL_CACHE_SIZE', 10000))
+                app.extensions['serial_cache'] = cache
+    return cache
+
+
+def get_serial_cache_stats(app=None):
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('serial_cache')
+    return cache.stats() if cache else None
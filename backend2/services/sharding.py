@@ -0,0 +1,169 @@
+"""
+Horizontal sharding of the catalog across MySQL databases (MYSQL_SHARDS).
+Products live on one shard each; the taxonomy (categories, subcategories)
+is replicated to every shard from the home shard (shard 0).
+
+Every shard generates interleaved AUTO_INCREMENT ids (increment = number of
+shards, offset = shard number + 1), so a product id alone identifies its
+shard and lookups by id need no routing query.
+"""
+import contextvars
+import heapq
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from services.db_pool import create_pool_from_config, mysql_connect_kwargs
+
+HOME_SHARD = 0
+
+
+def parse_shards(value, default_port=3306, default_db=None):
+    """Parse 'host1:3307/catalog_0,host2/catalog_1' into [(host, port, db), ...]"""
+    shards = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        address, _, database = item.partition('/')
+        host, _, port = address.partition(':')
+        shards.append((host, int(port) if port else default_port, database or default_db))
+    return shards
+
+
+def parse_routes(value):
+    """Parse the routing table '12=0,13=1' (subcategory_id=shard) into a dict"""
+    routes = {}
+    for item in (value or '').split(','):
+        subcategory_id, _, shard = item.strip().partition('=')
+        if subcategory_id and shard:
+            routes[int(subcategory_id)] = int(shard)
+    return routes
+
+
+class ShardRouter:
+    """
+    Placement of new products and lookup of existing ones.
+    key='subcategory': the routing table, else subcategory_id modulo shards.
+    key='hash': spread evenly by a hash of the serial number (or name).
+    """
+
+    def __init__(self, shard_count, key='subcategory', routes=None):
+        if key not in ('subcategory', 'hash'):
+            raise ValueError(f"Clave de sharding desconocida: {key}")
+        self.shard_count = shard_count
+        self.key = key
+        self.routes = dict(routes or {})
+        for shard in self.routes.values():
+            if not 0 <= shard < shard_count:
+                raise ValueError(f"Shard fuera de rango en la tabla de rutas: {shard}")
+
+    def shard_for_product(self, product_id):
+        """Shard holding product_id, from its interleaved AUTO_INCREMENT id"""
+        return (int(product_id) - 1) % self.shard_count
+
+    def shard_for_new_product(self, data):
+        if self.key == 'subcategory' and data.get('subcategory_id') is not None:
+            subcategory_id = int(data['subcategory_id'])
+            return self.routes.get(subcategory_id, subcategory_id % self.shard_count)
+        key = str(data.get('serial_number') or data.get('name') or '')
+        return zlib.crc32(key.encode('utf-8')) % self.shard_count
+
+
+class Shard:
+    """One MySQL database with its own pool"""
+
+    def __init__(self, index, name, pool):
+        self.index = index
+        self.name = name
+        self.pool = pool
+        self.queries = 0
+        self.errors = 0
+
+    def stats(self):
+        return {
+            'shard': self.index,
+            'name': self.name,
+            'queries': self.queries,
+            'errors': self.errors,
+            'pool': self.pool.stats(),
+        }
+
+
+class ShardSet:
+    """Shards plus a thread pool for parallel fan-out queries"""
+
+    def __init__(self, shards, router, max_workers=None):
+        self.shards = shards
+        self.router = router
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(shards), thread_name_prefix='shard-fanout'
+        )
+        self._stats_lock = threading.Lock()
+        self.fan_outs = 0
+
+    def __len__(self):
+        return len(self.shards)
+
+    def _run(self, shard, fn):
+        try:
+            return fn(shard)
+        except Exception:
+            with self._stats_lock:
+                shard.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                shard.queries += 1
+
+    def fan_out(self, fn):
+        """
+        Call fn(shard) on every shard in parallel and return the results in
+        shard order. Workers run in a copy of the caller's context, so the
+        request deadline and query budget still apply to their statements.
+        """
+        with self._stats_lock:
+            self.fan_outs += 1
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, self._run, shard, fn)
+            for shard in self.shards
+        ]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        return {
+            'shard_key': self.router.key,
+            'routes': len(self.router.routes),
+            'fan_outs': self.fan_outs,
+            'shards': [shard.stats() for shard in self.shards],
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def merge_sorted(results, key, reverse=False):
+    """Merge per-shard lists that are each already sorted by key"""
+    return list(heapq.merge(*results, key=key, reverse=reverse))
+
+
+def create_shard_set_from_config(config):
+    """Build a ShardSet from MYSQL_SHARDS, MYSQL_SHARD_KEY and MYSQL_SHARD_ROUTES"""
+    addresses = parse_shards(config.get('MYSQL_SHARDS'), config['MYSQL_PORT'], config['MYSQL_DB'])
+    count = len(addresses)
+    shards = []
+    for index, (host, port, database) in enumerate(addresses):
+        connect_kwargs = dict(
+            mysql_connect_kwargs(config), host=host, port=port, database=database,
+            init_command=(
+                f"SET SESSION auto_increment_increment = {count}, "
+                f"auto_increment_offset = {index + 1}"
+            ),
+        )
+        shards.append(Shard(index, f"{host}:{port}/{database}", create_pool_from_config(config, connect_kwargs)))
+    router = ShardRouter(
+        count,
+        key=config.get('MYSQL_SHARD_KEY') or 'subcategory',
+        routes=parse_routes(config.get('MYSQL_SHARD_ROUTES')),
+    )
+    return ShardSet(shards, router)
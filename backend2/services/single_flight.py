@@ -0,0 +1,204 @@
+"""
+Single-flight coalescing of identical concurrent reads: the first caller
+for a key runs the query, callers arriving while it is in flight wait for
+its result (or its exception) instead of sending the same query again.
+A leader that ran out of time says nothing about the read: its waiters
+then run it themselves, under their own deadlines. Waiters never wait past
+their own deadline either.
+"""
+import asyncio
+import threading
+
+from flask import current_app
+
+from services.deadline import is_timeout, mark_deadline_exceeded, remaining
+
+_flight_lock = threading.Lock()
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A waiter gave up on the in-flight call it joined"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _FlightStats:
+    def __init__(self, name, timeout):
+        self.name = name
+        self.timeout = timeout
+        self.leaders = 0
+        self.collapsed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.rereads = 0
+
+    def _wait_timeout(self):
+        """(seconds a waiter may wait, whether that is its own deadline)"""
+        left = remaining()
+        if left is None or left > self.timeout:
+            return self.timeout, False
+        if left <= 0:
+            raise mark_deadline_exceeded()
+        return left, True
+
+    def _timed_out(self, key, by_deadline):
+        self.timeouts += 1
+        if by_deadline:
+            return mark_deadline_exceeded()
+        return SingleFlightTimeout(f"{self.name}: sin respuesta tras {self.timeout}s para {key!r}")
+
+    def _stats(self, in_flight):
+        calls = self.leaders + self.collapsed
+        return {
+            'timeout_s': self.timeout,
+            'in_flight': in_flight,
+            'queries': self.leaders,
+            'collapsed': self.collapsed,
+            'collapsed_ratio': round(self.collapsed / calls, 3) if calls else None,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'rereads': self.rereads,
+        }
+
+
+class SingleFlight(_FlightStats):
+    """
+    Thread version. Waiters block for at most timeout seconds, then raise
+    SingleFlightTimeout (DeadlineExceeded when their own deadline comes
+    first); the leader's call is not cut short.
+    """
+
+    def __init__(self, name, timeout):
+        super().__init__(name, timeout)
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        """
+        (fn(*args), shared) for key, run once for all concurrent callers.
+        shared is True when other callers got the same object: copy it
+        before modifying it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+
+        if leader:
+            try:
+                call.result = fn(*args)
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self.errors += 1
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            wait, by_deadline = self._wait_timeout()
+            if not call.done.wait(wait):
+                with self._lock:
+                    raise self._timed_out(key, by_deadline)
+            if call.error is not None and is_timeout(call.error):
+                with self._lock:
+                    self.rereads += 1
+                return fn(*args), False
+
+        if call.error is not None:
+            raise call.error
+        return call.result, call.waiters > 0
+
+    def stats(self):
+        with self._lock:
+            return self._stats(len(self._calls))
+
+
+class AsyncSingleFlight(_FlightStats):
+    """
+    asyncio version for one event loop. The call runs as a task, so a
+    leader cancelled by its client does not cancel it for the waiters.
+    """
+
+    def __init__(self, name, timeout):
+        super().__init__(name, timeout)
+        self._calls = {}
+
+    async def do(self, key, fn, *args):
+        """(await fn(*args), shared) for key, awaited once for all concurrent callers"""
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = self._calls[key] = asyncio.ensure_future(fn(*args))
+            task.waiters = 0
+            task.add_done_callback(lambda done: self._finished(key, done))
+            result = await asyncio.shield(task)
+        else:
+            wait, by_deadline = self._wait_timeout()
+            self.collapsed += 1
+            task.waiters += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), wait)
+            except asyncio.TimeoutError:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    # The leader's own timeout, not this wait's
+                    self.rereads += 1
+                    return await fn(*args), False
+                raise self._timed_out(key, by_deadline)
+            except Exception as e:
+                if not is_timeout(e):
+                    raise
+                self.rereads += 1
+                return await fn(*args), False
+        return result, task.waiters > 0
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self):
+        return self._stats(len(self._calls))
+
+
+def _get(app, name, factory):
+    app = app or current_app._get_current_object()
+    flight = app.extensions.get(name)
+    if flight is None:
+        with _flight_lock:
+            flight = app.extensions.get(name)
+            if flight is None:
+                flight = factory(name, app.config.get('SINGLE_FLIGHT_TIMEOUT', 5.0))
+                app.extensions[name] = flight
+    return flight
+
+
+def get_single_flight(app=None):
+    """The app's coalescer for the thread-per-request services"""
+    return _get(app, 'single_flight', SingleFlight)
+
+
+def get_async_single_flight(app=None):
+    """The app's coalescer for the asyncio services"""
+    return _get(app, 'single_flight_async', AsyncSingleFlight)
+
+
+def get_single_flight_stats(app=None):
+    app = app or current_app._get_current_object()
+    flights = {
+        'threads': app.extensions.get('single_flight'),
+        'asyncio': app.extensions.get('single_flight_async'),
+    }
+    return {mode: flight.stats() for mode, flight in flights.items() if flight is not None} or None
@@ -0,0 +1,391 @@
+"""
+Embedded SQLite storage engine.
+Implements the part of the pymysql connection and cursor API the services
+use (%s parameters, dict rows, begin/commit/rollback, lastrowid, rowcount)
+and raises pymysql exception types, so service code runs unchanged.
+"""
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from itertools import count
+
+import pymysql
+from pymysql.constants import ER, SERVER_STATUS
+
+from services.deadline import mark_deadline_exceeded, remaining
+from services.query_metrics import InstrumentedCursorMixin
+
+# Values of a row's specifications JSON object as space separated text
+SPECIFICATION_VALUES = (
+    "(SELECT group_concat(value, ' ') FROM json_each("
+    "CASE WHEN json_valid({row}.specifications) THEN {row}.specifications END))"
+)
+
+# Same tables as utils/database_seeder.create_tables, in SQLite dialect
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100) NOT NULL UNIQUE,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS subcategories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(100) NOT NULL,
+        category_id INT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE,
+        UNIQUE (name, category_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        subcategory_id INT NOT NULL,
+        purchase_price DECIMAL(10, 2) NOT NULL,
+        sale_price DECIMAL(10, 2) NOT NULL,
+        stock INT NOT NULL DEFAULT 0,
+        image_url VARCHAR(500),
+        serial_number VARCHAR(100) UNIQUE,
+        specifications TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (subcategory_id) REFERENCES subcategories(id) ON DELETE CASCADE
+    )
+    """,
+    # Change-version log of the invalidation bus (INVALIDATION_TRANSPORT=database)
+    """
+    CREATE TABLE IF NOT EXISTS cache_invalidations (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        origin VARCHAR(100) NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        entity_id INT,
+        stock_only BOOLEAN NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Indexes for the filtered and sorted product listings
+    "CREATE INDEX IF NOT EXISTS idx_products_subcategory_id ON products (subcategory_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_sale_price_id ON products (sale_price, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_stock_id ON products (stock, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_name_id ON products (name, id)",
+    # Full-text search index (SEARCH_ENGINE=database), kept in sync by triggers
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+        name, description, specifications, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products
+    BEGIN
+        INSERT INTO product_search (rowid, name, description, specifications)
+        VALUES (NEW.id, NEW.name, NEW.description, {SPECIFICATION_VALUES.format(row='NEW')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_update
+    AFTER UPDATE OF name, description, specifications ON products
+    BEGIN
+        DELETE FROM product_search WHERE rowid = OLD.id;
+        INSERT INTO product_search (rowid, name, description, specifications)
+        VALUES (NEW.id, NEW.name, NEW.description, {SPECIFICATION_VALUES.format(row='NEW')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products
+    BEGIN
+        DELETE FROM product_search WHERE rowid = OLD.id;
+    END
+    """,
+    # Indexes products written before the search table existed
+    f"""
+    INSERT INTO product_search (rowid, name, description, specifications)
+    SELECT id, name, description, {SPECIFICATION_VALUES.format(row='products')}
+    FROM products WHERE id NOT IN (SELECT rowid FROM product_search)
+    """,
+    # Stands in for MySQL's ON UPDATE CURRENT_TIMESTAMP
+    """
+    CREATE TRIGGER IF NOT EXISTS products_updated_at
+    AFTER UPDATE ON products FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+    BEGIN
+        UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+    END
+    """,
+)
+
+_PARAMS = re.compile(r"%\((\w+)\)s|%s|%%")
+_MYSQL_ONLY = re.compile(r'^\s*SET\s+FOREIGN_KEY_CHECKS\b', re.I)
+_REWRITES = (
+    (re.compile(r'\bNOW\(\)', re.I), 'CURRENT_TIMESTAMP'),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.I), ''),
+    # json_extract already returns unquoted scalars
+    (re.compile(r'\bJSON_UNQUOTE\(', re.I), '('),
+)
+
+# Distinct names for in-memory databases opened in this process
+_memory_ids = count(1)
+
+
+def _placeholder(match):
+    if match.group(0) == '%%':
+        return '%'
+    return f":{match.group(1)}" if match.group(1) else '?'
+
+
+@lru_cache(maxsize=512)
+def translate(sql, with_args=True):
+    """Rewrite a pymysql-style statement for SQLite"""
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    # pymysql only interpolates (and unescapes %%) when arguments are given
+    return _PARAMS.sub(_placeholder, sql) if with_args else sql
+
+
+def translate_error(error):
+    """Map a sqlite3 error to the pymysql exception the services already handle"""
+    message = str(error)
+    if isinstance(error, sqlite3.IntegrityError):
+        if 'FOREIGN KEY' in message:
+            return pymysql.err.IntegrityError(ER.NO_REFERENCED_ROW_2, message)
+        if 'UNIQUE' in message:
+            return pymysql.err.IntegrityError(ER.DUP_ENTRY, message)
+        if 'NOT NULL' in message:
+            return pymysql.err.IntegrityError(ER.BAD_NULL_ERROR, message)
+        return pymysql.err.IntegrityError(ER.UNKNOWN_ERROR, message)
+    if isinstance(error, sqlite3.OperationalError):
+        if 'locked' in message or 'busy' in message:
+            # Retried by @retry_transient like an InnoDB lock wait timeout
+            return pymysql.err.OperationalError(ER.LOCK_WAIT_TIMEOUT, message)
+        if 'no such table' in message:
+            return pymysql.err.ProgrammingError(ER.NO_SUCH_TABLE, message)
+        if 'syntax error' in message:
+            return pymysql.err.ProgrammingError(ER.PARSE_ERROR, message)
+        return pymysql.err.OperationalError(ER.UNKNOWN_ERROR, message)
+    return pymysql.err.DatabaseError(ER.UNKNOWN_ERROR, message)
+
+
+def _concat(*values):
+    """MySQL CONCAT(): NULL if any argument is NULL"""
+    if any(value is None for value in values):
+        return None
+    return ''.join(str(value) for value in values)
+
+
+class SQLiteCursor:
+    """Buffered cursor returning rows as dicts, like pymysql's DictCursor"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+        self._rows = []
+        self._position = 0
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._rows = []
+        self._cursor.close()
+
+    def _run(self, method, query, args):
+        if isinstance(query, bytes):
+            query = query.decode('utf-8')
+        if _MYSQL_ONLY.match(query):
+            # Session settings without an SQLite equivalent
+            return 0
+        sql = translate(query, args is not None)
+        self.connection._ensure_transaction()
+
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise mark_deadline_exceeded()
+            deadline = time.monotonic() + left
+            self.connection._db.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            if args is None:
+                method(sql)
+            else:
+                method(sql, args)
+        except sqlite3.OperationalError as e:
+            if str(e) == 'interrupted':
+                raise mark_deadline_exceeded() from e
+            raise translate_error(e) from e
+        except sqlite3.Error as e:
+            raise translate_error(e) from e
+        finally:
+            if left is not None:
+                self.connection._db.set_progress_handler(None, 0)
+
+        self.lastrowid = self._cursor.lastrowid
+        self.description = self._cursor.description
+        self._load_rows()
+        return self.rowcount
+
+    def _load_rows(self):
+        self._position = 0
+        if self.description is None:
+            self._rows = []
+            self.rowcount = self._cursor.rowcount
+            return
+        columns = [column[0] for column in self.description]
+        self._rows = [dict(zip(columns, row)) for row in self._cursor.fetchall()]
+        self.rowcount = len(self._rows)
+
+    def execute(self, query, args=None):
+        if isinstance(args, list):
+            args = tuple(args)
+        elif args is not None and not isinstance(args, (tuple, dict)):
+            args = (args,)
+        return self._run(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        args = [tuple(row) if isinstance(row, list) else row for row in args]
+        if not args:
+            return 0
+        return self._run(self._cursor.executemany, query, args)
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or 1
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+
+class SQLiteSSCursor(SQLiteCursor):
+    """Unbuffered cursor: rows are read from SQLite as they are fetched, like SSDictCursor"""
+
+    def _load_rows(self):
+        self._columns = [column[0] for column in self.description] if self.description else None
+        self.rowcount = -1 if self._columns else self._cursor.rowcount
+
+    def fetchone(self):
+        if not self._columns:
+            return None
+        row = self._cursor.fetchone()
+        return dict(zip(self._columns, row)) if row is not None else None
+
+    def fetchmany(self, size=None):
+        if not self._columns:
+            return []
+        return [dict(zip(self._columns, row)) for row in self._cursor.fetchmany(size or 1)]
+
+    def fetchall(self):
+        if not self._columns:
+            return []
+        return [dict(zip(self._columns, row)) for row in self._cursor.fetchall()]
+
+
+class InstrumentedSQLiteCursor(InstrumentedCursorMixin, SQLiteCursor):
+    pass
+
+
+class InstrumentedSQLiteSSCursor(InstrumentedCursorMixin, SQLiteSSCursor):
+    pass
+
+
+class SQLiteConnection:
+    """
+    pymysql-compatible connection over sqlite3.
+    Statements run inside an implicit transaction, as with autocommit=False.
+    """
+
+    def __init__(self, database, busy_timeout=5.0, cursorclass=InstrumentedSQLiteCursor):
+        self.cursorclass = cursorclass
+        self._db = sqlite3.connect(
+            database, timeout=busy_timeout, isolation_level=None,
+            check_same_thread=False, uri=database.startswith('file:')
+        )
+        self._db.create_function('CONCAT', -1, _concat, deterministic=True)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        if 'mode=memory' not in database:
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+        self.open = True
+
+    @property
+    def server_status(self):
+        return SERVER_STATUS.SERVER_STATUS_IN_TRANS if self._db.in_transaction else 0
+
+    def _ensure_transaction(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN")
+
+    def _finish(self, statement):
+        if not self.open:
+            raise pymysql.err.InterfaceError(0, "Conexión cerrada")
+        if self._db.in_transaction:
+            try:
+                self._db.execute(statement)
+            except sqlite3.Error as e:
+                raise translate_error(e) from e
+
+    def cursor(self, cursor=None):
+        return (cursor or self.cursorclass)(self)
+
+    def begin(self):
+        # Like MySQL, starting a transaction commits the previous one
+        self._finish("COMMIT")
+        self._db.execute("BEGIN")
+
+    def commit(self):
+        self._finish("COMMIT")
+
+    def rollback(self):
+        self._finish("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise pymysql.err.InterfaceError(0, "Conexión cerrada")
+        self._db.execute("SELECT 1")
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self._db.close()
+
+
+def database_uri(path):
+    """File path as given; ':memory:' becomes a named shared in-memory database"""
+    if path == ':memory:':
+        return f"file:backend2-catalog-{next(_memory_ids)}?mode=memory&cache=shared"
+    return path
+
+
+def connect(database, busy_timeout=5.0):
+    """pymysql.connect() counterpart used by the connection pool"""
+    return SQLiteConnection(database, busy_timeout=busy_timeout)
+
+
+def create_tables(cursor):
+    """Create the catalog tables if they do not exist"""
+    for statement in SCHEMA:
+        cursor.execute(statement)
@@ -0,0 +1,187 @@
+"""
+Storage engines behind the catalog services.
+An engine hands out pooled DB-API connections that behave like pymysql
+connections with dict cursors; product_service only talks to this interface.
+"""
+import threading
+
+from flask import current_app
+
+from services import sqlite_engine
+from services.db_pool import ConnectionPool, get_pool
+from services.query_metrics import InstrumentedSSDictCursor
+from services.replicas import get_replica_set
+from services.sharding import HOME_SHARD, create_shard_set_from_config
+
+# Guards lazy creation of the per-app storage engine
+_storage_lock = threading.Lock()
+
+
+class StorageEngine:
+    """
+    Source of primary and read connections for one backend.
+    Unsharded engines have a single shard, HOME_SHARD.
+    """
+    name = None
+    shard_count = 1
+    # Unbuffered cursor class for streamed reads
+    streaming_cursor = None
+
+    def __init__(self, app):
+        self.app = app
+
+    def pool(self, shard=HOME_SHARD):
+        """Pool of connections to the primary of shard"""
+        raise NotImplementedError
+
+    def acquire_read(self, timeout, shard=HOME_SHARD):
+        """Connection for reads that tolerate lag, or None to use the primary"""
+        return None
+
+    def shard_for_product(self, product_id):
+        return HOME_SHARD
+
+    def shard_for_new_product(self, data):
+        return HOME_SHARD
+
+    def fan_out(self, fn):
+        """Results of fn(shard) for every shard, in shard order"""
+        return [fn(HOME_SHARD)]
+
+    def pool_stats(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'engine': self.name}
+
+
+class MySQLStorage(StorageEngine):
+    """MySQL primary plus optional read replicas (MYSQL_* settings)"""
+    name = 'mysql'
+    streaming_cursor = InstrumentedSSDictCursor
+
+    def pool(self, shard=HOME_SHARD):
+        return get_pool(self.app)
+
+    def acquire_read(self, timeout, shard=HOME_SHARD):
+        return get_replica_set(self.app).acquire(timeout)
+
+    def pool_stats(self):
+        pool = self.app.extensions.get('mysql_pool')
+        return pool.stats() if pool else None
+
+
+class SQLiteStorage(StorageEngine):
+    """Embedded SQLite database file (SQLITE_PATH); no server required"""
+    name = 'sqlite'
+    streaming_cursor = sqlite_engine.InstrumentedSQLiteSSCursor
+
+    def __init__(self, app):
+        super().__init__(app)
+        config = app.config
+        self.path = config.get('SQLITE_PATH') or 'catalog.db'
+        self.database = sqlite_engine.database_uri(self.path)
+        self._pool = ConnectionPool(
+            {'database': self.database, 'busy_timeout': config.get('SQLITE_BUSY_TIMEOUT', 5.0)},
+            min_size=config.get('MYSQL_POOL_MIN_SIZE', 1),
+            max_size=config.get('MYSQL_POOL_MAX_SIZE', 10),
+            timeout=config.get('MYSQL_POOL_TIMEOUT', 5.0),
+            # A shared in-memory database lives as long as one connection to it
+            recycle=0 if self.path == ':memory:' else config.get('MYSQL_POOL_RECYCLE', 3600),
+            pre_ping=False,
+            connect=sqlite_engine.connect,
+        )
+        self._keeper = sqlite_engine.connect(self.database) if self.path == ':memory:' else None
+        self.create_tables()
+        self._pool.prefill()
+
+    def create_tables(self):
+        connection = self._pool.acquire()
+        try:
+            with connection.cursor() as cursor:
+                sqlite_engine.create_tables(cursor)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def pool(self, shard=HOME_SHARD):
+        return self._pool
+
+    def pool_stats(self):
+        return self._pool.stats()
+
+    def stats(self):
+        return {'engine': self.name, 'path': self.path}
+
+
+class ShardedMySQLStorage(StorageEngine):
+    """Products spread over the MYSQL_SHARDS databases, taxonomy on all of them"""
+    name = 'mysql-sharded'
+    streaming_cursor = InstrumentedSSDictCursor
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.shard_set = create_shard_set_from_config(app.config)
+        self.shard_count = len(self.shard_set)
+        for shard in self.shard_set.shards:
+            try:
+                shard.pool.prefill()
+            except Exception as e:
+                print(f"⚠️ No se pudo precargar el pool del shard {shard.name}: {e}")
+
+    def pool(self, shard=HOME_SHARD):
+        return self.shard_set.shards[shard].pool
+
+    def shard_for_product(self, product_id):
+        return self.shard_set.router.shard_for_product(product_id)
+
+    def shard_for_new_product(self, data):
+        return self.shard_set.router.shard_for_new_product(data)
+
+    def fan_out(self, fn):
+        return self.shard_set.fan_out(lambda shard: fn(shard.index))
+
+    def pool_stats(self):
+        return self.pool().stats()
+
+    def stats(self):
+        return dict(self.shard_set.stats(), engine=self.name)
+
+
+ENGINES = {
+    MySQLStorage.name: MySQLStorage,
+    SQLiteStorage.name: SQLiteStorage,
+    ShardedMySQLStorage.name: ShardedMySQLStorage,
+}
+
+
+def create_storage(app):
+    """Engine selected by STORAGE_ENGINE ('mysql' or 'sqlite'); MYSQL_SHARDS shards MySQL"""
+    name = (app.config.get('STORAGE_ENGINE') or 'mysql').lower()
+    if name == MySQLStorage.name and app.config.get('MYSQL_SHARDS'):
+        name = ShardedMySQLStorage.name
+    if name not in ENGINES:
+        raise ValueError(f"Motor de almacenamiento desconocido: {name}")
+    return ENGINES[name](app)
+
+
+def get_storage(app=None):
+    """Return the storage engine for the app, creating it on first use"""
+    app = app or current_app._get_current_object()
+    storage = app.extensions.get('storage')
+    if storage is None:
+        with _storage_lock:
+            storage = app.extensions.get('storage')
+            if storage is None:
+                storage = create_storage(app)
+                app.extensions['storage'] = storage
+    return storage
+
+
+def get_storage_stats(app=None):
+    """Engine name and primary pool statistics, or None when never used"""
+    app = app or current_app._get_current_object()
+    storage = app.extensions.get('storage')
+    if storage is None:
+        return None
+    return dict(storage.stats(), pool=storage.pool_stats())
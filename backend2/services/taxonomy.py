@@ -0,0 +1,94 @@
+"""
+Immutable in-memory snapshot of categories and subcategories.
+Readers take the current snapshot and never see it change; writers load
+or derive a new one and swap it in with a single assignment.
+"""
+import time
+from collections import defaultdict
+from types import MappingProxyType
+
+from flask import current_app
+
+TAXONOMY_CATEGORIES_QUERY = "SELECT id, name, description FROM categories"
+TAXONOMY_SUBCATEGORIES_QUERY = "SELECT id, name, category_id FROM subcategories"
+
+
+def taxonomy_key(name):
+    """MySQL compares taxonomy names case-insensitively; so does the snapshot"""
+    return name.casefold()
+
+
+class Taxonomy:
+    """Category tree plus name -> id and id -> subcategory maps"""
+
+    def __init__(self, categories, subcategories):
+        self.loaded_at = time.monotonic()
+        by_category = defaultdict(list)
+        for subcategory in sorted(subcategories, key=lambda row: taxonomy_key(row['name'])):
+            by_category[subcategory['category_id']].append(MappingProxyType(dict(subcategory)))
+        self.categories = tuple(
+            MappingProxyType(dict(category))
+            for category in sorted(categories, key=lambda row: taxonomy_key(row['name']))
+        )
+        self.by_category = MappingProxyType({
+            category_id: tuple(rows) for category_id, rows in by_category.items()
+        })
+        self.category_ids = MappingProxyType({
+            taxonomy_key(category['name']): category['id'] for category in self.categories
+        })
+        self.subcategories = MappingProxyType({
+            subcategory['id']: subcategory for rows in self.by_category.values() for subcategory in rows
+        })
+        self.subcategory_ids = MappingProxyType({
+            (subcategory['category_id'], taxonomy_key(subcategory['name'])): subcategory['id']
+            for subcategory in self.subcategories.values()
+        })
+
+    def category_id(self, name):
+        return self.category_ids.get(taxonomy_key(name))
+
+    def subcategory_id(self, category_id, name):
+        return self.subcategory_ids.get((category_id, taxonomy_key(name)))
+
+    def tree(self):
+        """Categories by name, each with its {id, name} subcategories, as new dicts"""
+        return [
+            dict(category, subcategories=[
+                {'id': subcategory['id'], 'name': subcategory['name']}
+                for subcategory in self.by_category.get(category['id'], ())
+            ])
+            for category in self.categories
+        ]
+
+    def subcategories_of(self, category_id):
+        return [dict(subcategory) for subcategory in self.by_category.get(category_id, ())]
+
+    def stats(self):
+        return {
+            'categories': len(self.categories),
+            'subcategories': len(self.subcategories),
+            'age_s': round(time.monotonic() - self.loaded_at, 1),
+        }
+
+
+def current_taxonomy(app=None):
+    """The app's snapshot, or None before the first load or once older than TAXONOMY_SNAPSHOT_TTL"""
+    app = app or current_app._get_current_object()
+    snapshot = app.extensions.get('taxonomy')
+    if snapshot is None:
+        return None
+    if time.monotonic() - snapshot.loaded_at > app.config.get('TAXONOMY_SNAPSHOT_TTL', 300):
+        return None
+    return snapshot
+
+
+def swap_taxonomy(snapshot, app=None):
+    app = app or current_app._get_current_object()
+    app.extensions['taxonomy'] = snapshot
+    return snapshot
+
+
+def get_taxonomy_stats(app=None):
+    app = app or current_app._get_current_object()
+    snapshot = app.extensions.get('taxonomy')
+    return snapshot.stats() if snapshot else None
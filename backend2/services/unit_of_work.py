@@ -0,0 +1,112 @@
+import contextvars
+import copy
+
+from flask import current_app, g, has_request_context
+
+# Set while a service call runs concurrently with others from the same request
+_detached = contextvars.ContextVar('unit_of_work_detached', default=False)
+
+
+class RequestConnection:
+    """Proxy that keeps the request's connection checked out across service calls"""
+
+    def __init__(self, unit_of_work, route, pooled):
+        self._unit_of_work = unit_of_work
+        self.route = route
+        self._pooled = pooled
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+    def close(self):
+        """No-op: the connection goes back to the pool on request teardown"""
+
+    def discard(self):
+        """Drop a broken connection so the next service call gets a fresh one"""
+        self._unit_of_work.discard_connection(self)
+
+
+class UnitOfWork:
+    """Connections per route (primary, replica) plus an identity map for the current request"""
+
+    def __init__(self):
+        self._connections = {}
+        self.identity_map = {}
+
+    def connection(self, route, acquire):
+        """The request connection for route, checked out with acquire() on first use"""
+        connection = self._connections.get(route)
+        if connection is None:
+            connection = RequestConnection(self, route, acquire())
+            self._connections[route] = connection
+        return connection
+
+    def has_connection(self, route):
+        return route in self._connections
+
+    def get(self, kind, key):
+        """Row already loaded or written during this request, or None"""
+        row = self.identity_map.get((kind, key))
+        return copy.deepcopy(row) if row is not None else None
+
+    def remember(self, kind, key, row):
+        if row is not None:
+            self.identity_map[(kind, key)] = copy.deepcopy(row)
+        return row
+
+    def forget(self, kind, key):
+        self.identity_map.pop((kind, key), None)
+
+    def discard_connection(self, connection):
+        if self._connections.get(connection.route) is connection:
+            del self._connections[connection.route]
+            connection._pooled.discard()
+
+    def release(self):
+        """Return the connections to their pools; open transactions are rolled back there"""
+        self.identity_map.clear()
+        connections, self._connections = self._connections, {}
+        for connection in connections.values():
+            connection._pooled.close()
+
+
+def current_unit_of_work():
+    """Unit of work bound to the current Flask request, or None outside a request"""
+    if not has_request_context() or _detached.get():
+        return None
+    return g.get('_unit_of_work')
+
+
+def begin_unit_of_work():
+    """Bind a unit of work to the current request if there is none yet"""
+    if not has_request_context() or 'unit_of_work' not in current_app.extensions or _detached.get():
+        return None
+    unit_of_work = g.get('_unit_of_work')
+    if unit_of_work is None:
+        unit_of_work = g._unit_of_work = UnitOfWork()
+    return unit_of_work
+
+
+def run_detached(fn, *args, **kwargs):
+    """
+    Call fn outside the request's unit of work, for calls running on other
+    threads: the connections it opens are its own and go back to the pool
+    when it closes them, instead of being shared between threads.
+    """
+    token = _detached.set(True)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _detached.reset(token)
+
+
+def _release_unit_of_work(error=None):
+    unit_of_work = g.pop('_unit_of_work', None)
+    if unit_of_work is not None:
+        unit_of_work.release()
+
+
+def init_unit_of_work(app):
+    """Release the request connection when the request is torn down"""
+    app.extensions['unit_of_work'] = True
+    app.teardown_request(_release_unit_of_work)
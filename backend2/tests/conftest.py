@@ -0,0 +1,79 @@
+"""
+Tests run against the embedded SQLite engine in a temporary file, so no
+MySQL server is needed. The environment is set before app is imported.
+"""
+import os
+import tempfile
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix='backend2-tests-')
+os.environ['STORAGE_ENGINE'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(_db_dir, 'catalog.db')
+os.environ['INVALIDATION_TRANSPORT'] = 'none'
+os.environ['CATALOG_SNAPSHOT_PATH'] = ''
+os.environ['MYSQL_SHARDS'] = ''
+os.environ['MYSQL_REPLICA_HOSTS'] = ''
+os.environ['PRODUCT_WARMUP'] = 'false'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def product(app):
+    """A product in a fresh subcategory, deleted afterwards"""
+    from services.product_service import create_product_service, delete_product_service
+    with app.app_context():
+        created = create_product_service({
+            'name': 'Bicicleta de prueba',
+            'category_name': 'Pruebas',
+            'subcategory_name': 'General',
+            'purchase_price': 100,
+            'sale_price': 150,
+            'stock': 10,
+            'serial_number': f"TEST-{os.getpid()}-{next(_serials)}",
+        })
+    assert created is not None
+    yield created
+    with app.app_context():
+        delete_product_service(created['id'])
+
+
+@pytest.fixture
+def catalog(app):
+    """Four products alone in a fresh subcategory, deleted afterwards"""
+    from services.product_service import create_product_service, delete_product_service
+    subcategory = f"Catálogo {os.getpid()}-{next(_serials)}"
+    products = []
+    with app.app_context():
+        for name, sale_price, stock in (
+            ('Casco', 80, 3), ('Bicicleta', 900, 0), ('Aceite', 12, 40), ('Zapatillas', 120, 5),
+        ):
+            created = create_product_service({
+                'name': name,
+                'category_name': 'Pruebas',
+                'subcategory_name': subcategory,
+                'purchase_price': sale_price // 2,
+                'sale_price': sale_price,
+                'stock': stock,
+                'serial_number': f"TEST-{os.getpid()}-{next(_serials)}",
+            })
+            assert created is not None
+            products.append(created)
+    yield products
+    with app.app_context():
+        for created in products:
+            delete_product_service(created['id'])
+
+
+_serials = iter(range(1, 1_000_000))
@@ -0,0 +1,188 @@
+"""
+ASGI catalog routes, run against a fake aiomysql pool so the async
+services, caches, deadlines and query accounting all execute for real.
+"""
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+import asgi
+from services import async_product_service as catalog
+from services.product_cache import get_product_cache
+from services.query_metrics import query_stats
+
+
+class _Context:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeAsyncPool:
+    def __init__(self, rows, delay=0.0):
+        self.rows = rows
+        self.delay = delay
+        self.statements = []
+        self.closed = 0
+
+    def acquire(self):
+        return _Context(FakeAsyncConnection(self))
+
+
+class FakeAsyncConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return _Context(FakeAsyncCursor(self.pool))
+
+    def close(self):
+        self.pool.closed += 1
+
+
+class FakeAsyncCursor:
+    rowcount = 1
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def execute(self, query, args=None):
+        self.pool.statements.append((query, args))
+        await asyncio.sleep(self.pool.delay)
+
+    async def fetchone(self):
+        return dict(self.pool.rows[0]) if self.pool.rows else None
+
+    async def fetchall(self):
+        return [dict(row) for row in self.pool.rows]
+
+
+def product_row(product_id, stock=3):
+    return {
+        'id': product_id, 'name': f"Producto {product_id}", 'stock': stock,
+        'sale_price': Decimal('10.50'), 'specifications': '{"talla": "M"}',
+    }
+
+
+@pytest.fixture
+def fake_pool(app, monkeypatch):
+    pool = FakeAsyncPool([])
+    monkeypatch.setattr(asgi, 'ASYNC_CATALOG', True)
+    monkeypatch.setattr(catalog, '_pool', pool)
+    caches = get_product_cache(app)
+    caches.rows.clear()
+    caches.pages.clear()
+    return pool
+
+
+def call(path, query_string=b'', headers=()):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': query_string, 'headers': list(headers),
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    return messages[0]['status'], json.loads(messages[1]['body'])
+
+
+def test_product_is_served_from_the_shared_row_cache(fake_pool):
+    fake_pool.rows = [product_row(9001)]
+    status, body = call('/api/products/9001')
+    assert status == 200
+    assert body['data']['sale_price'] == 10.5
+    assert body['data']['specifications'] == {'talla': 'M'}
+
+    status, body = call('/api/products/9001', b'fields=id,stock')
+    assert status == 200 and body['data'] == {'id': 9001, 'stock': 3}
+    assert len(fake_pool.statements) == 1
+
+
+def test_write_invalidation_reaches_async_reads(app, fake_pool):
+    from services.product_service import invalidate_product_caches
+    fake_pool.rows = [product_row(9002, stock=5)]
+    call('/api/products/9002')
+    fake_pool.rows = [product_row(9002, stock=4)]
+    with app.app_context():
+        invalidate_product_caches(9002, stock_only=True)
+    status, body = call('/api/products/9002')
+    assert body['data']['stock'] == 4
+    assert len(fake_pool.statements) == 2
+
+
+def test_pages_are_served_from_the_shared_page_cache(fake_pool):
+    fake_pool.rows = [product_row(9003), product_row(9004)]
+    first = call('/api/products', b'limit=5&fields=id,name')
+    second = call('/api/products', b'limit=5&fields=id,name')
+    assert first == second
+    assert first[0] == 200 and [item['id'] for item in first[1]['data']] == [9003, 9004]
+    assert len(fake_pool.statements) == 1
+
+
+def test_request_deadline_returns_504_and_drops_the_connection(fake_pool):
+    fake_pool.rows = [product_row(9005)]
+    fake_pool.delay = 0.5
+    status, body = call('/api/products/9005', headers=[(b'x-request-timeout', b'50')])
+    assert status == 504 and body['code'] == 'DEADLINE_EXCEEDED'
+    assert fake_pool.closed == 1
+    # The statement carried the remaining time as a MAX_EXECUTION_TIME hint
+    assert 'MAX_EXECUTION_TIME' in fake_pool.statements[0][0]
+
+
+def test_statements_are_recorded_in_the_query_metrics(fake_pool):
+    fake_pool.rows = [product_row(9006)]
+    before = sum(entry['count'] for entry in query_stats.top(500)['statements'])
+    call('/api/products/9006')
+    after = sum(entry['count'] for entry in query_stats.top(500)['statements'])
+    assert after == before + 1
+
+
+def test_query_budget_applies_to_async_requests(app, fake_pool, monkeypatch):
+    monkeypatch.setitem(app.config, 'MYSQL_QUERY_BUDGET', 1)
+    monkeypatch.setitem(app.config, 'MYSQL_QUERY_BUDGET_MODE', 'raise')
+    fake_pool.rows = [{'id': 1, 'name': 'Bicicletas', 'description': '', 'category_id': 1}]
+    app.extensions.pop('taxonomy', None)
+    # The taxonomy load runs two statements
+    status, _ = call('/api/categories')
+    app.extensions.pop('taxonomy', None)
+    assert status == 500
+
+
+def test_multi_get_by_ids(fake_pool):
+    fake_pool.rows = [product_row(9008), product_row(9007)]
+    status, body = call('/api/products', b'ids=9007,9008,9009')
+    assert status == 200
+    assert [item['id'] for item in body['data']] == [9007, 9008]
+    assert body['count'] == 2 and body['missing'] == [9009]
+
+
+def test_multi_get_rejects_bad_ids(fake_pool):
+    status, body = call('/api/products', b'ids=7,abc')
+    assert status == 400 and not body['success']
+
+
+def test_concurrent_callers_get_their_own_copy(app, fake_pool):
+    fake_pool.rows = [product_row(9005)]
+    fake_pool.delay = 0.01
+
+    async def main():
+        with app.app_context():
+            return await asyncio.gather(*(catalog.get_product_by_id_service(9005, ('id', 'stock')) for _ in range(2)))
+
+    first, second = asyncio.run(main())
+    assert len(fake_pool.statements) == 1
+    first['stock'] = 0
+    assert second['stock'] == 3
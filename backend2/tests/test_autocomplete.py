@@ -0,0 +1,50 @@
+from services.autocomplete import SuggestIndex, edit_distance
+
+
+def ids(results):
+    return [result['id'] for result in results]
+
+
+def test_prefix_and_typo_matches():
+    index = SuggestIndex()
+    index.build([{'id': 2, 'name': 'Casco Giro Aether'}, {'id': 1, 'name': 'Bicicleta de Montaña Trek'}])
+    assert ids(index.suggest('bici')) == [1]
+    assert ids(index.suggest('montana tr')) == [1]
+    assert ids(index.suggest('bicicelta')) == [1]
+    assert index.suggest('zzz') == []
+
+
+def test_full_index_evicts_the_oldest_product_for_a_new_one():
+    index = SuggestIndex(max_products=2)
+    index.build([{'id': 2, 'name': 'Casco urbano'}, {'id': 1, 'name': 'Casco ruta'}])
+    index.add(3, 'Casco nuevo')
+    assert sorted(ids(index.suggest('casco'))) == [2, 3]
+    assert index.stats()['evicted'] == 1
+
+
+def test_suggested_products_are_evicted_last():
+    index = SuggestIndex(max_products=2)
+    index.add(1, 'Casco ruta')
+    index.add(2, 'Guantes')
+    index.suggest('casco')
+    index.add(3, 'Sillín')
+    assert ids(index.suggest('casco')) == [1]
+    assert index.suggest('guantes') == []
+
+
+def test_memory_estimate_tracks_adds_and_removes():
+    index = SuggestIndex()
+    index.add(1, 'Bicicleta de montaña')
+    index.add(2, 'Bicicleta urbana')
+    with_both = index.memory_bytes()
+    assert with_both > 0
+    index.remove(2)
+    assert 0 < index.memory_bytes() < with_both
+    index.add(1, 'Otro nombre')
+    index.remove(1)
+    assert index.memory_bytes() == 0
+
+
+def test_edit_distance_stops_past_the_limit():
+    assert edit_distance('bicicleta', 'bicicelta', 2) == 2
+    assert edit_distance('casco', 'sillin', 1) == 2
@@ -0,0 +1,28 @@
+from services.product_service import clear_facets_cache
+
+
+def test_bootstrap_matches_the_separate_endpoints(client, catalog):
+    clear_facets_cache()
+    query = f"limit=3&sort=name&subcategory_id={catalog[0]['subcategory_id']}"
+    response = client.get(f"/api/catalog/bootstrap?{query}")
+    assert response.status_code == 200
+    body = response.get_json()['data']
+    assert set(body) == {'categories', 'products', 'facets'}
+
+    page = client.get(f"/api/products?{query}").get_json()
+    assert body['products'] == {key: page[key] for key in ('data', 'count', 'next_cursor', 'has_more')}
+    assert [product['name'] for product in body['products']['data']] == ['Aceite', 'Bicicleta', 'Casco']
+    assert body['facets'] == client.get(f"/api/products/facets?{query}").get_json()['data']
+    assert body['categories'] == client.get('/api/categories').get_json()['data']
+
+
+def test_bootstrap_is_cacheable_and_conditional(client, catalog):
+    response = client.get('/api/catalog/bootstrap?limit=2')
+    assert response.cache_control.public and response.cache_control.max_age is not None
+    assert response.headers['ETag']
+    again = client.get('/api/catalog/bootstrap?limit=2', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_bootstrap_rejects_an_unknown_sort(client):
+    assert client.get('/api/catalog/bootstrap?sort=popularidad').status_code == 400
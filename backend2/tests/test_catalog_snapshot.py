@@ -0,0 +1,120 @@
+import json
+
+import pytest
+from flask import Flask
+
+from services.catalog_snapshot import CatalogSnapshot, SharedCatalog, encode_product, write_snapshot
+
+LIST_FIELDS = ('id', 'name', 'stock')
+
+
+def products():
+    return [{'id': product_id, 'name': f"Producto {product_id}", 'stock': product_id, 'category_id': 1}
+            for product_id in (3, 1, 2)]
+
+
+def test_list_item_is_a_prefix_of_the_detail():
+    data, prefix = encode_product({'id': 1, 'name': 'a', 'stock': 5, 'category_id': 3}, LIST_FIELDS)
+    assert json.loads(data) == {'id': 1, 'name': 'a', 'stock': 5, 'category_id': 3}
+    assert json.loads(data[:prefix] + b'}') == {'id': 1, 'name': 'a', 'stock': 5}
+
+
+def test_stock_that_does_not_fit_the_slot_is_kept():
+    data, _ = encode_product({'id': 1, 'stock': 10 ** 12}, LIST_FIELDS)
+    assert json.loads(data) == {'id': 1, 'stock': 10 ** 12}
+
+
+def test_pages_in_id_order(tmp_path):
+    path = str(tmp_path / 'catalog.snap')
+    assert write_snapshot(path, 7, products(), LIST_FIELDS) == 3
+    snapshot = CatalogSnapshot(path)
+    assert snapshot.generation == 7
+    items, has_more, last_id = snapshot.page(2)
+    assert [json.loads(bytes(item) + b'}')['id'] for item in items] == [3, 2]
+    assert has_more and last_id == 2
+    items, has_more, _ = snapshot.page(2, after_id=2)
+    assert [json.loads(bytes(item) + b'}')['id'] for item in items] == [1]
+    assert not has_more
+    items, _, _ = snapshot.page(5, after_id=1, descending=False)
+    assert [json.loads(bytes(item) + b'}')['id'] for item in items] == [2, 3]
+    assert snapshot.product(4) is None
+
+
+def test_patched_stock_is_seen_through_existing_mappings(tmp_path):
+    path = str(tmp_path / 'catalog.snap')
+    write_snapshot(path, 1, products(), LIST_FIELDS)
+    reader, writer = CatalogSnapshot(path), CatalogSnapshot(path)
+    assert writer.patch_stock(path, 2, 12345)
+    assert json.loads(bytes(reader.product(2)))['stock'] == 12345
+    assert not writer.patch_stock(path, 4, 1)
+    assert not writer.patch_stock(path, 2, 10 ** 12)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    app = Flask(__name__)
+    app.config['CATALOG_SNAPSHOT_PATH'] = str(tmp_path / 'catalog.snap')
+    app.config['CATALOG_SNAPSHOT_DELAY'] = 0
+    stock = {product['id']: product['stock'] for product in products()}
+
+    def stock_loader(product_id=None):
+        return {product_id: stock[product_id]} if product_id is not None else dict(stock)
+
+    catalog = SharedCatalog(app, products, LIST_FIELDS, stock_loader)
+    catalog.request_build = lambda: None
+    return catalog, stock
+
+
+def test_stock_writes_patch_instead_of_rebuilding(catalog):
+    catalog, stock = catalog
+    catalog._build()
+    generation = catalog.current().generation
+    stock[2] = 99
+    catalog.stock_changed(2)
+    snapshot = catalog.current()
+    assert snapshot is not None and snapshot.generation == generation
+    assert json.loads(bytes(snapshot.product(2)))['stock'] == 99
+    assert catalog.stats()['stock_patches'] == 1
+    assert catalog.builds == 1
+
+
+def test_other_writes_make_the_snapshot_stale_until_rebuilt(catalog):
+    catalog, _ = catalog
+    catalog._build()
+    catalog.changed()
+    assert catalog.current() is None
+    catalog._build()
+    assert catalog.current() is not None and catalog.builds == 2
+
+
+def test_stock_of_a_product_missing_from_the_snapshot_rebuilds(catalog):
+    catalog, stock = catalog
+    catalog._build()
+    stock[4] = 1
+    catalog.stock_changed(4)
+    assert catalog.current() is None
+
+
+def test_rebuild_takes_the_latest_stock(catalog):
+    catalog, stock = catalog
+    stock[3] = 42
+    catalog._build()
+    assert json.loads(bytes(catalog.current().product(3)))['stock'] == 42
+
+
+def test_fork_forgets_the_parent_builder(catalog):
+    catalog, _ = catalog
+    catalog._builder = object()
+    counter = catalog._counter
+    catalog._after_fork()
+    assert catalog._builder is None
+    assert catalog._counter is not counter and catalog._counter.value == counter.value
+
+
+def test_unsupported_platform_disables_the_snapshot(tmp_path, monkeypatch):
+    from services import catalog_snapshot
+    app = Flask(__name__)
+    app.config['CATALOG_SNAPSHOT_PATH'] = str(tmp_path / 'catalog.snap')
+    monkeypatch.setattr(catalog_snapshot, 'fcntl', None)
+    assert catalog_snapshot.get_shared_catalog(products, LIST_FIELDS, dict, app=app) is None
+    assert 'catalog_snapshot' not in app.extensions
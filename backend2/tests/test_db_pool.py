@@ -0,0 +1,125 @@
+import gc
+import threading
+
+import pytest
+
+from services.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = True
+        self.server_status = 0
+        self.closed = 0
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.open:
+            raise OSError("closed")
+
+    def rollback(self):
+        self.server_status = 0
+
+    def close(self):
+        self.open = False
+        self.closed += 1
+
+
+def make_pool(**kwargs):
+    made = []
+
+    def connect():
+        made.append(FakeConnection())
+        return made[-1]
+
+    kwargs.setdefault('min_size', 0)
+    kwargs.setdefault('max_size', 2)
+    kwargs.setdefault('timeout', 0.2)
+    return ConnectionPool({}, connect=connect, **kwargs), made
+
+
+def test_close_returns_connection_for_reuse():
+    pool, made = make_pool()
+    connection = pool.acquire()
+    connection.close()
+    again = pool.acquire()
+    assert again.raw is made[0]
+    assert len(made) == 1
+    again.close()
+    assert pool.stats()['idle'] == 1
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['timeouts'] == 1
+    held.close()
+
+
+def test_waiter_gets_connection_released_by_other_thread():
+    pool, _ = make_pool(max_size=1, timeout=2)
+    held = pool.acquire()
+    threading.Timer(0.05, held.close).start()
+    pool.acquire().close()
+    assert pool.stats()['size'] == 1
+
+
+def test_open_transaction_is_rolled_back_on_release():
+    pool, made = make_pool()
+    connection = pool.acquire()
+    made[0].server_status = 1  # SERVER_STATUS_IN_TRANS
+    connection.close()
+    assert made[0].server_status == 0
+
+
+def test_unusable_connection_is_discarded_on_release():
+    pool, made = make_pool()
+    connection = pool.acquire()
+    made[0].open = False
+    connection.close()
+    stats = pool.stats()
+    assert stats['size'] == 0 and stats['discarded'] == 1
+
+
+def test_returned_proxy_refuses_further_use():
+    pool, _ = make_pool()
+    connection = pool.acquire()
+    connection.close()
+    with pytest.raises(Exception):
+        connection.ping()
+
+
+def test_recycled_connection_is_replaced():
+    pool, made = make_pool(recycle=0.01)
+    pool.acquire().close()
+    threading.Event().wait(0.02)
+    pool.acquire().close()
+    assert len(made) == 2 and made[0].closed == 1
+    assert pool.stats()['recycled'] == 1
+
+
+def test_leaked_checkout_frees_its_slot():
+    pool, made = make_pool(max_size=1)
+    connection = pool.acquire()
+    del connection
+    gc.collect()
+    # The slot is free again and the leaked socket was closed, not reused
+    replacement = pool.acquire(timeout=0.05)
+    assert replacement.raw is not made[0]
+    assert made[0].closed == 1
+    stats = pool.stats()
+    assert stats['leaked'] == 1 and stats['size'] == 1
+    replacement.close()
+
+
+def test_closed_checkout_is_not_counted_as_leaked():
+    pool, _ = make_pool()
+    connection = pool.acquire()
+    connection.close()
+    del connection
+    gc.collect()
+    assert pool.stats()['leaked'] == 0
+    assert pool.stats()['size'] == 1
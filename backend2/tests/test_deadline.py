@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from services import product_service
+from services.deadline import (
+    AsyncDeadline, DeadlineCursorMixin, DeadlineExceeded, request_timeout_ms, with_max_execution_time,
+)
+
+CONFIG = {'REQUEST_DEADLINE_MS': 15000, 'REQUEST_DEADLINE_MAX_MS': 60000, 'REQUEST_DEADLINES': 'productresource=3000'}
+
+
+def test_header_then_endpoint_then_default():
+    assert request_timeout_ms(CONFIG, '250', 'productresource') == 250
+    assert request_timeout_ms(CONFIG, '999999', None) == 60000
+    assert request_timeout_ms(CONFIG, 'pronto', 'productresource') == 3000
+    assert request_timeout_ms(CONFIG, None, 'categorylistresource') == 15000
+
+
+def test_max_execution_time_hint_only_on_selects():
+    assert with_max_execution_time("SELECT id FROM products", 120) == \
+        "SELECT /*+ MAX_EXECUTION_TIME(120) */ id FROM products"
+    assert with_max_execution_time("UPDATE products SET stock = 1", 120) == "UPDATE products SET stock = 1"
+
+
+class RecordingCursor:
+    connection = None
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, args=None):
+        self.queries.append(query)
+
+
+class DeadlineCursor(DeadlineCursorMixin, RecordingCursor):
+    pass
+
+
+def test_cursor_bounds_statements_by_the_time_left():
+    cursor = DeadlineCursor()
+    cursor.execute("SELECT 1")
+    assert cursor.queries == ["SELECT 1"]
+    with AsyncDeadline(60000):
+        cursor.execute("SELECT 2")
+    assert 'MAX_EXECUTION_TIME(' in cursor.queries[-1]
+    with AsyncDeadline(1) as deadline:
+        time.sleep(0.005)
+        with pytest.raises(DeadlineExceeded):
+            cursor.execute("SELECT 3")
+    assert deadline.exceeded and len(cursor.queries) == 2
+
+
+@pytest.fixture
+def slow_read(monkeypatch):
+    read_product = product_service._read_product
+
+    def slow(*args):
+        time.sleep(0.02)
+        return read_product(*args)
+
+    monkeypatch.setattr(product_service, '_read_product', slow)
+
+
+def test_request_timeout_header_turns_into_a_504(app, client, product, slow_read):
+    with app.app_context():
+        product_service.get_product_cache().rows.invalidate(product['id'])
+    response = client.get(f"/api/products/{product['id']}", headers={'X-Request-Timeout': '10'})
+    assert response.status_code == 504
+    assert response.get_json()['code'] == 'DEADLINE_EXCEEDED'
+
+
+def test_generous_request_timeout_is_served(app, client, product, slow_read):
+    with app.app_context():
+        product_service.get_product_cache().rows.invalidate(product['id'])
+    response = client.get(f"/api/products/{product['id']}", headers={'X-Request-Timeout': '5000'})
+    assert response.status_code == 200
@@ -0,0 +1,48 @@
+import pytest
+
+from services.product_service import clear_facets_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_facets(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PRODUCT_PRICE_BUCKETS', '100,500')
+    clear_facets_cache()
+    yield
+    clear_facets_cache()
+
+
+def listed(client, query):
+    return client.get(f"/api/products?all=true&{query}").get_json()['data']
+
+
+def test_stock_counts_match_the_filtered_list(client, catalog):
+    query = f"subcategory_id={catalog[0]['subcategory_id']}&min_price=50"
+    facets = client.get(f"/api/products/facets?{query}").get_json()['data']
+    products = listed(client, query)
+    assert facets['stock'] == {
+        'in_stock': sum(1 for product in products if product['stock'] > 0),
+        'out_of_stock': sum(1 for product in products if product['stock'] <= 0),
+    }
+    assert facets['stock'] == {'in_stock': 2, 'out_of_stock': 1}
+
+
+def test_each_facet_ignores_its_own_filter(client, catalog):
+    subcategory_id = catalog[0]['subcategory_id']
+    query = f"subcategory_id={subcategory_id}&min_price=50&in_stock=true"
+    facets = client.get(f"/api/products/facets?{query}").get_json()['data']
+    # The price bands count every in-stock product of the subcategory, whatever its price
+    in_stock = listed(client, f"subcategory_id={subcategory_id}&in_stock=true")
+    assert [band['count'] for band in facets['price']] == [
+        sum(1 for product in in_stock if product['sale_price'] < 100),
+        sum(1 for product in in_stock if 100 <= product['sale_price'] < 500),
+        sum(1 for product in in_stock if product['sale_price'] >= 500),
+    ]
+    assert [band['label'] for band in facets['price']] == ['0-100', '100-500', '500+']
+    # Only the Casco and the Zapatillas match every filter
+    subcategory = next(row for row in facets['subcategories'] if row['id'] == subcategory_id)
+    assert subcategory['count'] == len(listed(client, query)) == 2
+
+
+def test_invalid_filter_is_a_400(client):
+    response = client.get('/api/products/facets?min_price=barato')
+    assert response.status_code == 400
@@ -0,0 +1,169 @@
+import time
+
+import pytest
+from flask import Flask
+
+from services.invalidation_bus import (
+    CREATE_INVALIDATIONS, DatabaseTransport, InvalidationBus, MemoryTransport, coalesce,
+)
+
+
+def test_coalesce_keeps_one_event_per_entity():
+    events = coalesce([
+        {'kind': 'product', 'id': 1, 'stock_only': True},
+        {'kind': 'product', 'id': 2, 'stock_only': True},
+        {'kind': 'product', 'id': 1, 'stock_only': False},
+        {'kind': 'product', 'id': 2, 'stock_only': True},
+    ])
+    assert events == [
+        {'kind': 'product', 'id': 1, 'stock_only': False},
+        {'kind': 'product', 'id': 2, 'stock_only': True},
+    ]
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        self.statements.append(query)
+
+    def fetchone(self):
+        return {'version': 41}
+
+
+class FakeConnection:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_mysql_transport_creates_its_table_once():
+    app = Flask(__name__)
+    app.config['STORAGE_ENGINE'] = 'mysql'
+    statements = []
+    transport = DatabaseTransport(app, lambda: FakeConnection(statements))
+    transport.start()
+    transport.start()
+    assert statements.count(CREATE_INVALIDATIONS) == 1
+    assert statements[0] == CREATE_INVALIDATIONS
+    assert transport._last_version == 41
+
+
+def test_database_transport_delivers_other_origins_events(app):
+    from services.product_service import get_db_connection
+    with app.app_context():
+        sender = DatabaseTransport(app, get_db_connection)
+        receiver = DatabaseTransport(app, get_db_connection)
+        sender.start()
+        receiver.start()
+        sender.publish('a', [{'kind': 'product', 'id': 5, 'stock_only': True}])
+        receiver.publish('b', [{'kind': 'taxonomy', 'id': None, 'stock_only': False}])
+        events, complete = receiver.poll('b')
+    assert complete
+    assert events == [{'kind': 'product', 'id': 5, 'stock_only': True, 'origin': 'a'}]
+
+
+def make_bus(transport, applied, dropped):
+    app = Flask(__name__)
+    app.config.update(INVALIDATION_FLUSH_INTERVAL=0, INVALIDATION_POLL_INTERVAL=0.01, INVALIDATION_MAX_STALENESS=0)
+    return InvalidationBus(app, transport, lambda events, other_host: applied.extend(events), lambda: dropped.append(1))
+
+
+def test_peer_applies_published_events():
+    applied = []
+    publisher = make_bus(MemoryTransport(), [], [])
+    subscriber = make_bus(MemoryTransport(), applied, [])
+    subscriber._transport.start()
+    publisher.publish('product', 3, stock_only=True)
+    publisher.publish('product', 3, stock_only=True)
+    deadline = time.monotonic() + 2
+    while publisher.batches == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    subscriber._poll()
+    assert applied == [{'kind': 'product', 'id': 3, 'stock_only': True, 'origin': publisher.origin}]
+
+
+class FailingTransport(MemoryTransport):
+    def poll(self, origin):
+        raise ConnectionError("sin red")
+
+
+def test_failing_transport_drops_caches_once_stale():
+    dropped = []
+    bus = make_bus(FailingTransport(), [], dropped)
+    bus._last_poll = 0
+    bus._poll()
+    assert dropped and not bus.healthy
+    assert bus.stats()['stale_drops'] == 1
+
+
+@pytest.fixture
+def memory_bus(app, monkeypatch):
+    """The app on the memory transport, with caches and bus created afresh"""
+    monkeypatch.setitem(app.config, 'INVALIDATION_TRANSPORT', 'memory')
+    monkeypatch.setitem(app.config, 'INVALIDATION_FLUSH_INTERVAL', 0)
+    monkeypatch.setitem(app.config, 'INVALIDATION_POLL_INTERVAL', 0.01)
+    monkeypatch.delitem(app.extensions, 'product_cache', raising=False)
+    monkeypatch.delitem(app.extensions, 'invalidation_bus', raising=False)
+    yield
+    bus = app.extensions.get('invalidation_bus')
+    if bus is not None:
+        # The thread cannot be stopped; keep it quiet for the rest of the session
+        bus.poll_interval = 3600
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 2
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_read_only_process_applies_peer_writes(app, product, memory_bus):
+    from services.product_service import get_db_connection, get_product_by_id_service
+    with app.app_context():
+        assert get_product_by_id_service(product['id'])['stock'] == 10
+        consumer = app.extensions['invalidation_bus']
+        started = consumer._last_poll
+        assert wait_for(lambda: consumer._last_poll != started)
+
+        # Another process commits a write and publishes it
+        connection = get_db_connection(product_id=product['id'])
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE products SET stock = 4 WHERE id = %s", (product['id'],))
+        connection.commit()
+        connection.close()
+        assert get_product_by_id_service(product['id'])['stock'] == 10
+    publisher = make_bus(MemoryTransport(), [], [])
+    publisher.publish('product', product['id'], stock_only=True)
+
+    assert wait_for(lambda: consumer.applied >= 1)
+    publisher.poll_interval = 3600
+    with app.app_context():
+        assert get_product_by_id_service(product['id'])['stock'] == 4
+
+
+def test_forked_bus_gets_a_new_origin_and_thread():
+    bus = make_bus(MemoryTransport(), [], [])
+    bus._thread = object()
+    origin = bus.origin
+    bus._after_fork()
+    assert bus._thread is None and bus.origin != origin
@@ -0,0 +1,20 @@
+import jwt
+
+
+def auth(app, role):
+    token = jwt.encode({'id': 1, 'role': role}, app.config['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f"Bearer {token}"}
+
+
+def test_metrics_need_a_token(client):
+    assert client.get('/metrics').status_code == 401
+
+
+def test_metrics_need_an_administrator(app, client):
+    assert client.get('/metrics', headers=auth(app, 'Vendedor')).status_code == 403
+
+
+def test_metrics_for_an_administrator(app, client):
+    response = client.get('/metrics', headers=auth(app, 'Administrador'))
+    assert response.status_code == 200
+    assert 'db_pool' in response.get_json()['data']
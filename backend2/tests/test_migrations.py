@@ -0,0 +1,73 @@
+import inspect
+import re
+
+from utils import database_seeder
+from utils.migrations import MIGRATIONS, migrate, migration_targets
+
+
+class FakeCursor:
+    """Answers the information_schema checks from a set of applied names"""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.applied = []
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement, args=None):
+        if args is not None:
+            self._row = {'1': 1} if args[-1] in self.existing else None
+        else:
+            self.applied.append(statement)
+            self.existing.add(re.search(r'ADD (?:FULLTEXT )?(?:INDEX|COLUMN) (\w+)', statement).group(1))
+
+    def fetchone(self):
+        return self._row
+
+
+class FakeConnection:
+    def __init__(self, existing=()):
+        self.cursor_ = FakeCursor(set(existing))
+        self.commits = 0
+
+    def cursor(self):
+        return self.cursor_
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_migrations_apply_once():
+    connection = FakeConnection()
+    assert migrate(connection) == len(MIGRATIONS)
+    assert migrate(connection) == 0
+    assert len(connection.cursor_.applied) == len(MIGRATIONS)
+
+
+def test_applied_migrations_are_skipped():
+    connection = FakeConnection({'idx_products_stock_id'})
+    migrate(connection)
+    assert not any('idx_products_stock_id' in statement for statement in connection.cursor_.applied)
+
+
+def test_every_seeded_index_has_a_migration():
+    seeded = set(re.findall(r'INDEX (\w+) \(', inspect.getsource(database_seeder.create_tables)))
+    migrated = {args[-1] for _, _, args, _ in MIGRATIONS}
+    assert seeded <= migrated
+
+
+def test_search_column_is_added_before_its_fulltext_index():
+    names = [args[-1] for _, _, args, _ in MIGRATIONS]
+    assert names.index('specifications_text') < names.index('ft_products_search')
+
+
+def test_targets_are_the_shards_when_sharded():
+    config = {'MYSQL_HOST': 'db', 'MYSQL_PORT': 3306, 'MYSQL_DB': 'catalog', 'MYSQL_SHARDS': ''}
+    assert migration_targets(config) == [('db', 3306, 'catalog')]
+    config['MYSQL_SHARDS'] = 'a:3307/catalog_0,b'
+    assert migration_targets(config) == [('a', 3307, 'catalog_0'), ('b', 3306, 'catalog')]
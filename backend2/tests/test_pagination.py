@@ -0,0 +1,59 @@
+import pytest
+
+from services.product_service import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('-sale_price', {'id': 7, 'sale_price': 120})
+    assert decode_cursor(cursor, '-sale_price') == (120, 7)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'name')
+
+
+def pages(client, url):
+    """Every page of url, following next_cursor"""
+    seen, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ''))
+        assert response.status_code == 200
+        body = response.get_json()
+        seen.append([item['name'] for item in body['data']])
+        if not body['has_more']:
+            assert body['next_cursor'] is None
+            return seen
+        cursor = body['next_cursor']
+
+
+@pytest.mark.parametrize('sort, names', [
+    ('-id', ['Zapatillas', 'Aceite', 'Bicicleta', 'Casco']),
+    ('name', ['Aceite', 'Bicicleta', 'Casco', 'Zapatillas']),
+    ('-sale_price', ['Bicicleta', 'Zapatillas', 'Casco', 'Aceite']),
+])
+def test_pages_follow_the_cursor_without_gaps_or_repeats(client, catalog, sort, names):
+    subcategory_id = catalog[0]['subcategory_id']
+    seen = pages(client, f"/api/products?limit=3&sort={sort}&subcategory_id={subcategory_id}")
+    assert seen == [names[:3], names[3:]]
+
+
+def test_a_write_between_pages_does_not_shift_the_next_page(app, client, catalog):
+    from services.product_service import delete_product_service
+    subcategory_id = catalog[0]['subcategory_id']
+    url = f"/api/products?limit=2&sort=name&subcategory_id={subcategory_id}"
+    first = client.get(url).get_json()
+    with app.app_context():
+        delete_product_service(catalog[2]['id'])
+    second = client.get(f"{url}&cursor={first['next_cursor']}").get_json()
+    assert [item['name'] for item in second['data']] == ['Casco', 'Zapatillas']
+
+
+@pytest.mark.parametrize('cursor', ['no-es-un-cursor', '%%%', 'eyJzIjoiLWlkIn0'])
+def test_malformed_cursor_is_a_400(client, catalog, cursor):
+    response = client.get(f"/api/products?limit=2&cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_cursor_from_another_sort_is_a_400(client, catalog):
+    first = client.get('/api/products?limit=1&sort=name').get_json()
+    response = client.get(f"/api/products?limit=1&sort=-id&cursor={first['next_cursor']}")
+    assert response.status_code == 400
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from services import product_service
+from services.product_cache import ProductCaches, Tagged, TTLCache
+
+REPLICATED = {'MYSQL_REPLICA_HOSTS': 'replica:3306', 'MYSQL_REPLICA_MAX_LAG': 5, 'MYSQL_REPLICA_CHECK_INTERVAL': 10}
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = TTLCache('test', max_size=2, ttl=60)
+    cache.put('a', 1, cache.generation)
+    cache.put('b', 2, cache.generation)
+    assert cache.get_many(['a']) == {'a': 1}
+    cache.put('c', 3, cache.generation)
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_expired_entries_are_reloaded():
+    cache = TTLCache('test', max_size=10, ttl=0.01)
+    assert cache.get_or_load('a', lambda: 1) == 1
+    time.sleep(0.02)
+    assert cache.get_or_load('a', lambda: 2) == 2
+    assert cache.stats()['expirations'] == 1
+
+
+def test_values_are_copied_in_and_out():
+    cache = TTLCache('test', max_size=10, ttl=60)
+    value = {'stock': 1}
+    cache.put('a', value, cache.generation)
+    value['stock'] = 2
+    cache.get_many(['a'])['a']['stock'] = 3
+    assert cache.get_many(['a']) == {'a': {'stock': 1}}
+
+
+def test_a_load_that_raced_an_invalidation_is_not_stored():
+    cache = TTLCache('test', max_size=10, ttl=60)
+
+    def load():
+        cache.invalidate('a')
+        return 'stale'
+
+    assert cache.get_or_load('a', load) == 'stale'
+    assert cache.get_many(['a']) == {}
+
+
+def test_invalidate_where_matches_tags():
+    cache = TTLCache('test', max_size=10, ttl=60)
+    cache.get_or_load('page1', lambda: Tagged('p1', {'ids': {1, 2}}))
+    cache.get_or_load('page2', lambda: Tagged('p2', {'ids': {3}}))
+    cache.invalidate_where(lambda key, tags: 2 in tags['ids'])
+    assert cache.get_many(['page1', 'page2']) == {'page2': 'p2'}
+
+
+def test_no_primary_reads_without_replicas():
+    caches = ProductCaches({})
+    caches.written(1)
+    assert not caches.row_from_primary(1)
+    assert not caches.pages_from_primary()
+
+
+def test_written_rows_read_the_primary_for_the_lag_window():
+    caches = ProductCaches(REPLICATED)
+    assert caches.lag_window == 15
+    caches.written(1)
+    assert caches.row_from_primary(1)
+    assert not caches.row_from_primary(2)
+    assert caches.pages_from_primary()
+
+    caches.lag_window = 0.01
+    time.sleep(0.02)
+    assert not caches.row_from_primary(1)
+    assert not caches.pages_from_primary()
+    assert caches.stats()['primary_reads']['recent_writes'] == 0
+
+
+def test_dropping_everything_reads_every_row_from_the_primary():
+    caches = ProductCaches(REPLICATED)
+    caches.written()
+    assert caches.row_from_primary(1) and caches.row_from_primary(2)
+
+
+@pytest.fixture
+def replicated_caches(app, monkeypatch):
+    caches = ProductCaches(dict(app.config, **REPLICATED))
+    monkeypatch.setitem(app.extensions, 'product_cache', caches)
+    reads = []
+
+    def read_product(product_id, use_primary, fields=None):
+        reads.append(use_primary)
+        return {'id': product_id, 'stock': 'primary' if use_primary else 'replica'}
+
+    monkeypatch.setattr(product_service, '_read_product', read_product)
+    return caches, reads
+
+
+def test_reload_after_an_invalidation_reads_the_primary(app, replicated_caches):
+    caches, reads = replicated_caches
+    with app.app_context():
+        assert product_service.get_product_by_id_service(7)['stock'] == 'replica'
+        product_service.invalidate_product_caches(7, stock_only=True)
+        assert product_service.get_product_by_id_service(7)['stock'] == 'primary'
+        assert product_service.get_product_by_id_service(7)['stock'] == 'primary'
+    assert reads == [False, True]
+
+
+def test_warmup_runs_once_per_process(app, monkeypatch):
+    monkeypatch.delitem(app.extensions, 'product_warmup', raising=False)
+    thread = product_service.warm_product_indexes(app)
+    assert product_service.warm_product_indexes(app) is thread
+    thread.join(5)
+    assert not thread.is_alive()
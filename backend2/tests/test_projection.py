@@ -0,0 +1,50 @@
+import pytest
+
+from services.product_service import PRODUCT_VIEWS, parse_product_fields, product_select, project
+
+
+def test_fields_always_include_the_id_once():
+    assert parse_product_fields('name, sale_price,name') == ('id', 'name', 'sale_price')
+    assert parse_product_fields(None, 'summary') == PRODUCT_VIEWS['summary']
+    assert parse_product_fields(None, 'full') is None
+    assert parse_product_fields() is None
+
+
+def test_unknown_fields_and_views_are_rejected():
+    with pytest.raises(ValueError, match='password'):
+        parse_product_fields('name,password')
+    with pytest.raises(ValueError, match='compacta'):
+        parse_product_fields(None, 'compacta')
+
+
+def test_projection_reads_only_the_needed_columns_and_joins():
+    sql = product_select(('id', 'name', 'sale_price'))
+    assert 'specifications' not in sql and 'JOIN' not in sql
+    sql = product_select(('id', 'subcategory_name'))
+    assert 'JOIN subcategories' in sql and 'JOIN categories' not in sql
+    assert project({'id': 1, 'name': 'Casco', 'stock': 3}, ('id', 'stock')) == {'id': 1, 'stock': 3}
+
+
+def test_list_and_detail_honour_fields_and_view(client, catalog):
+    subcategory_id = catalog[0]['subcategory_id']
+    body = client.get(f"/api/products?fields=name,category_name&subcategory_id={subcategory_id}").get_json()
+    assert {tuple(item) for item in body['data']} == {('id', 'name', 'category_name')}
+    assert body['data'][0]['category_name'] == 'Pruebas'
+
+    casco = catalog[0]
+    body = client.get(f"/api/products/{casco['id']}?view=summary").get_json()
+    assert body['data'] == {'id': casco['id'], 'name': 'Casco', 'sale_price': 80, 'stock': 3}
+    body = client.get(f"/api/products/{casco['id']}").get_json()
+    assert body['data']['subcategory_id'] == subcategory_id
+
+
+@pytest.mark.parametrize('url', [
+    '/api/products?fields=name,password',
+    '/api/products?view=compacta',
+    '/api/products?stream=true&fields=costo',
+    '/api/products/1?fields=password',
+])
+def test_unknown_fields_are_a_400(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
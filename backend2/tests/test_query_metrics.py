@@ -0,0 +1,56 @@
+import logging
+
+import pytest
+
+from services.product_service import get_db_connection, get_product_by_id_service
+from services.query_metrics import (
+    QueryBudget, QueryBudgetExceeded, fingerprint, query_budget, query_stats,
+)
+
+
+def test_fingerprint_groups_statements_that_differ_in_literals():
+    assert fingerprint("SELECT * FROM products WHERE id = 12 AND name = 'a'") == \
+        fingerprint("SELECT  *  FROM products WHERE id = 7 AND name = 'b'")
+    assert fingerprint("SELECT id FROM products WHERE id IN (%s, %s, %s)") == \
+        "SELECT id FROM products WHERE id IN (?+)"
+
+
+def test_slow_queries_are_logged_with_their_service(app, product, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, 'MYSQL_SLOW_QUERY_MS', 0)
+    before = query_stats.top()['slow_queries']
+    with caplog.at_level(logging.WARNING, logger='backend2.slow_queries'):
+        with app.app_context():
+            get_product_by_id_service(product['id'], use_primary=True)
+    assert query_stats.top()['slow_queries'] > before
+    assert any('get_product_by_id_service' in record.getMessage() for record in caplog.records)
+
+
+def test_block_budget_raises_on_overrun(app):
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='prueba'):
+            with query_budget(1, label='prueba'):
+                connection = get_db_connection()
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                        cursor.execute("SELECT 2")
+                finally:
+                    connection.close()
+
+
+def test_request_budget_overrun_fails_the_request_in_tests(app, client, product, monkeypatch):
+    monkeypatch.setitem(app.config, 'MYSQL_QUERY_BUDGET', 1)
+    monkeypatch.setitem(app.config, 'PRODUCT_CACHE_SIZE', 0)
+    # The page and the total are two statements
+    with pytest.raises(QueryBudgetExceeded, match='GET /api/products'):
+        client.get('/api/products?include_total=true')
+
+
+def test_warn_mode_logs_the_overrun_once(caplog):
+    budget = QueryBudget(1, mode='warn', label='GET /x')
+    with caplog.at_level(logging.WARNING, logger='backend2.query_budget'):
+        for _ in range(3):
+            budget.add('SELECT ?', 'services.product_service.list_service')
+    budget.check()
+    assert len(caplog.records) == 1
+    assert 'list_service x2' in caplog.records[0].getMessage()
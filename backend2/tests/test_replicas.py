@@ -0,0 +1,93 @@
+import threading
+import time
+
+from services.db_pool import PoolTimeout
+from services.replicas import Replica, ReplicaSet
+
+
+class FakePool:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.checkouts = []
+
+    def acquire(self, timeout=None):
+        self.checkouts.append(threading.current_thread().name)
+        time.sleep(min(self.delay, timeout) if timeout is not None else self.delay)
+        if self.error:
+            raise self.error
+        return FakeConnection()
+
+    def stats(self):
+        return {}
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def close(self):
+        pass
+
+    def discard(self):
+        pass
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement):
+        pass
+
+    def fetchone(self):
+        return None
+
+
+def test_due_check_runs_off_the_request_thread():
+    dead = Replica('dead:3306', FakePool(delay=0.5, error=OSError('connect timed out')))
+    replica_set = ReplicaSet([dead], check_interval=10, check_timeout=None)
+    started = time.monotonic()
+    replica_set.acquire(timeout=0.01)
+    # The request did not wait for the check of the dead replica
+    assert time.monotonic() - started < 0.5
+    replica_set._checker.join()
+    assert 'replica-health' in dead.pool.checkouts
+    assert not dead.healthy
+
+
+def test_only_one_background_check_at_a_time():
+    replica = Replica('slow:3306', FakePool(delay=0.2))
+    replica_set = ReplicaSet([replica], check_interval=0)
+    replica_set.check_health()
+    checker = replica_set._checker
+    replica_set.check_health()
+    assert replica_set._checker is checker
+    checker.join()
+
+
+def test_check_uses_the_check_timeout():
+    seen = []
+
+    class RecordingPool(FakePool):
+        def acquire(self, timeout=None):
+            seen.append(timeout)
+            return super().acquire(timeout)
+
+    replica_set = ReplicaSet([Replica('r:3306', RecordingPool())], check_timeout=0.3)
+    replica_set.check_health(force=True)
+    assert seen == [0.3]
+
+
+def test_unhealthy_and_saturated_replicas_fall_back_to_primary():
+    down = Replica('down:3306', FakePool())
+    down.mark_unhealthy('stopped')
+    busy = Replica('busy:3306', FakePool(error=PoolTimeout('busy')))
+    replica_set = ReplicaSet([down, busy], check_interval=3600)
+    replica_set._last_check = time.monotonic()
+    assert replica_set.acquire(timeout=0.01) is None
+    assert replica_set.fallbacks == 1
+    assert busy.healthy
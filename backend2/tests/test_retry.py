@@ -0,0 +1,83 @@
+import pymysql
+import pytest
+from pymysql.constants import ER
+
+from services import retry
+from services.retry import RetryBudget, raise_if_retryable, retry_metrics, retry_transient
+
+
+def deadlock():
+    return pymysql.err.OperationalError(ER.LOCK_DEADLOCK, 'Deadlock found when trying to get lock')
+
+
+class FakeConnection:
+    open = True
+
+
+@pytest.fixture(autouse=True)
+def full_budget(monkeypatch):
+    monkeypatch.setattr(retry, 'retry_budget', RetryBudget())
+    monkeypatch.setattr(retry, 'backoff_delay', lambda attempt: 0)
+
+
+def flaky_service(failures, calls, during_commit=False):
+    """A service written like the repo's: errors are handled, transient ones offered for retry"""
+    @retry_transient(idempotent=False)
+    def service():
+        calls.append(1)
+        try:
+            if len(calls) <= failures:
+                error = deadlock()
+                if during_commit:
+                    error.during_commit = True
+                raise error
+            return 'ok'
+        except Exception as e:
+            raise_if_retryable(e, FakeConnection())
+            return 'handled'
+    return service
+
+
+def test_transient_error_is_retried_until_it_succeeds():
+    calls = []
+    assert flaky_service(2, calls)() == 'ok'
+    assert len(calls) == 3
+
+
+def test_last_attempt_falls_back_to_the_service_error_handling():
+    calls = []
+    assert flaky_service(5, calls)() == 'handled'
+    assert len(calls) == 3
+
+
+def test_failed_commit_is_not_retried_for_non_idempotent_services():
+    calls = []
+    assert flaky_service(1, calls, during_commit=True)() == 'handled'
+    assert len(calls) == 1
+
+
+def test_no_retry_once_the_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(retry, 'retry_budget', RetryBudget(capacity=0))
+    calls = []
+    assert flaky_service(1, calls)() == 'handled'
+    assert len(calls) == 1
+
+
+def test_deadline_without_time_for_backoff_raises_instead_of_running_again(monkeypatch):
+    monkeypatch.setattr(retry, 'backoff_delay', lambda attempt: 0.05)
+    monkeypatch.setattr(retry, 'remaining', lambda: 0.01)
+    before = retry_metrics.deadline_exhausted
+    calls = []
+    with pytest.raises(pymysql.err.OperationalError) as raised:
+        flaky_service(5, calls)()
+    assert raised.value.args[0] == ER.LOCK_DEADLOCK
+    assert len(calls) == 1
+    assert retry_metrics.deadline_exhausted == before + 1
+
+
+def test_budget_refills_by_ratio_up_to_capacity():
+    budget = RetryBudget(capacity=2)
+    assert budget.withdraw() and budget.withdraw() and not budget.withdraw()
+    for _ in range(5):
+        budget.deposit(0.5)
+    assert budget.tokens == 2
@@ -0,0 +1,43 @@
+import pymysql
+from pymysql.constants import ER
+
+import services.product_service as product_service
+from services.search import fulltext_schema_missing, get_search_stats, search_engine_name
+
+
+def test_search_finds_products_by_name_and_specification(app, product):
+    with app.app_context():
+        page = product_service.search_products_service('bicicleta prueba', 10)
+    assert product['id'] in [item['id'] for item in page['items']]
+
+
+def test_missing_fulltext_schema_falls_back_to_memory(app, product, monkeypatch):
+    def missing_index(*args):
+        raise pymysql.err.InternalError(ER.FT_MATCHING_KEY_NOT_FOUND, "Can't find FULLTEXT index matching the column list")
+
+    monkeypatch.setattr(product_service, '_search_database', missing_index)
+    try:
+        with app.app_context():
+            page = product_service.search_products_service('bicicleta', 10)
+            assert product['id'] in [item['id'] for item in page['items']]
+            assert search_engine_name() == 'memory'
+            assert 'FULLTEXT' in get_search_stats()['fallback']
+    finally:
+        app.extensions.pop('search_fallback', None)
+        app.extensions.pop('search_index', None)
+
+
+def test_other_database_errors_do_not_switch_engines(app, monkeypatch):
+    def broken(*args):
+        raise pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    monkeypatch.setattr(product_service, '_search_database', broken)
+    with app.app_context():
+        page = product_service.search_products_service('bicicleta', 10)
+        assert page['items'] == []
+        assert search_engine_name() == 'database'
+
+
+def test_fulltext_schema_errors_are_recognised():
+    assert fulltext_schema_missing(pymysql.err.OperationalError(ER.BAD_FIELD_ERROR, "Unknown column 'specifications_text'"))
+    assert not fulltext_schema_missing(pymysql.err.OperationalError(ER.BAD_FIELD_ERROR, "Unknown column 'brand'"))
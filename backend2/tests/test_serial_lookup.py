@@ -0,0 +1,52 @@
+import pytest
+
+from services.product_service import delete_product_service, parse_serials
+from services.serial_cache import get_serial_cache
+
+
+def test_serials_are_deduplicated_in_request_order():
+    assert parse_serials([' SN-2', 'SN-1', 'SN-2 '], 10) == ['SN-2', 'SN-1']
+    for value in ('SN-1', [], ['SN-1', ''], ['SN-1', 'SN-2', 'SN-3']):
+        with pytest.raises(ValueError):
+            parse_serials(value, 2)
+
+
+def test_get_by_serial(client, product):
+    response = client.get(f"/api/products/by-serial/{product['serial_number']}")
+    assert response.status_code == 200
+    assert response.get_json()['data'] == product
+    body = client.get(f"/api/products/by-serial/{product['serial_number']}?view=summary").get_json()
+    assert body['data'] == {'id': product['id'], 'name': product['name'], 'sale_price': 150, 'stock': 10}
+
+
+def test_get_unknown_serial_is_a_404(client):
+    assert client.get('/api/products/by-serial/NO-EXISTE').status_code == 404
+
+
+def test_bulk_lookup_keeps_request_order_and_lists_missing_serials(client, catalog):
+    serials = [catalog[2]['serial_number'], 'NO-EXISTE', catalog[0]['serial_number']]
+    body = client.post('/api/products/by-serial', json={'serials': serials}).get_json()
+    assert [product['id'] for product in body['data']] == [catalog[2]['id'], catalog[0]['id']]
+    assert body['missing'] == ['NO-EXISTE']
+    assert body['count'] == 2
+
+
+def test_bulk_lookup_projection_keeps_only_the_requested_fields(client, catalog):
+    body = client.post('/api/products/by-serial', json={'serials': [catalog[1]['serial_number']], 'fields': 'stock'})
+    assert body.get_json()['data'] == [{'id': catalog[1]['id'], 'stock': 0}]
+
+
+def test_a_stale_cached_serial_is_reported_missing(app, client, catalog):
+    serial = catalog[3]['serial_number']
+    client.post('/api/products/by-serial', json={'serials': [serial]})
+    with app.app_context():
+        assert get_serial_cache().get(serial) == catalog[3]['id']
+        delete_product_service(catalog[3]['id'])
+    body = client.post('/api/products/by-serial', json={'serials': [serial]}).get_json()
+    assert body['data'] == [] and body['missing'] == [serial]
+
+
+@pytest.mark.parametrize('payload', [{}, {'serials': 'SN-1'}, {'serials': [1, 2]}])
+def test_bulk_lookup_rejects_bad_payloads(client, payload):
+    response = client.post('/api/products/by-serial', json=payload)
+    assert response.status_code == 400
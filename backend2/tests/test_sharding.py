@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from services.deadline import AsyncDeadline, remaining
+from services.product_service import sort_key
+from services.sharding import Shard, ShardRouter, ShardSet, merge_sorted, parse_routes, parse_shards
+
+
+def test_shard_addresses_and_routes_are_parsed():
+    assert parse_shards('db0:3307/catalog_0, db1', 3306, 'catalog') == [
+        ('db0', 3307, 'catalog_0'), ('db1', 3306, 'catalog'),
+    ]
+    assert parse_shards('') == []
+    assert parse_routes('12=0, 13=1,') == {12: 0, 13: 1}
+
+
+def test_product_ids_are_routed_by_their_interleaved_offset():
+    router = ShardRouter(3)
+    # auto_increment_offset = shard + 1, auto_increment_increment = 3
+    assert [router.shard_for_product(product_id) for product_id in (1, 2, 3, 4, 5, 6)] == [0, 1, 2, 0, 1, 2]
+
+
+def test_new_products_follow_the_routes_then_the_subcategory():
+    router = ShardRouter(3, routes={12: 0})
+    assert router.shard_for_new_product({'subcategory_id': 12}) == 0
+    assert router.shard_for_new_product({'subcategory_id': 13}) == 1
+    hashed = ShardRouter(3, key='hash')
+    shard = hashed.shard_for_new_product({'serial_number': 'SN-1', 'subcategory_id': 12})
+    assert shard == hashed.shard_for_new_product({'serial_number': 'SN-1'})
+    assert 0 <= shard < 3
+
+
+def test_bad_router_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        ShardRouter(2, key='region')
+    with pytest.raises(ValueError):
+        ShardRouter(2, routes={12: 2})
+
+
+def test_fan_out_returns_results_in_shard_order_within_the_deadline():
+    shards = ShardSet([Shard(index, f"shard{index}", pool=None) for index in range(3)], ShardRouter(3))
+    try:
+        def query(shard):
+            # The last shard answers first
+            time.sleep(0.01 * (3 - shard.index))
+            return shard.index, remaining() is not None
+
+        with AsyncDeadline(5000):
+            assert shards.fan_out(query) == [(0, True), (1, True), (2, True)]
+        assert [shard.queries for shard in shards.shards] == [1, 1, 1]
+    finally:
+        shards.close()
+
+
+def test_shard_pages_merge_in_the_single_database_order():
+    rows = [
+        {'id': 7, 'name': 'casco'}, {'id': 1, 'name': 'Bicicleta'}, {'id': 4, 'name': 'bicicleta'},
+        {'id': 2, 'name': 'Zapatillas'}, {'id': 5, 'name': 'Casco'}, {'id': 3, 'name': 'Aceite'},
+    ]
+    shard_rows = [
+        sorted((row for row in rows if (row['id'] - 1) % 3 == shard), key=sort_key('name'))
+        for shard in range(3)
+    ]
+    assert [row['id'] for row in merge_sorted(shard_rows, key=sort_key('name'))] == [3, 1, 4, 5, 7, 2]
+    by_id = [sorted((row for row in rows if (row['id'] - 1) % 3 == shard), key=lambda row: row['id'], reverse=True)
+             for shard in range(3)]
+    assert [row['id'] for row in merge_sorted(by_id, key=lambda row: row['id'], reverse=True)] == [7, 5, 4, 3, 2, 1]
@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.deadline import AsyncDeadline, DeadlineExceeded
+from services.single_flight import AsyncSingleFlight, SingleFlight, SingleFlightTimeout
+
+
+def run_concurrently(count, fn):
+    results = [None] * count
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, fn())) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight('test', timeout=2)
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(2)
+        return {'id': 1}
+
+    threads, results = run_concurrently(4, lambda: flight.do('key', load))
+    while flight.stats()['collapsed'] < 3:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result == ({'id': 1}, True) for result in results)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_a_lone_call_is_not_shared():
+    flight = SingleFlight('test', timeout=1)
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.do('key', lambda: 2) == (2, False)
+
+
+def test_waiters_get_the_leader_error():
+    flight = SingleFlight('test', timeout=2)
+    release = threading.Event()
+
+    def load():
+        release.wait(2)
+        raise ValueError("fallo")
+
+    def call():
+        try:
+            flight.do('key', load)
+        except ValueError as e:
+            return e
+
+    threads, results = run_concurrently(3, call)
+    while flight.stats()['collapsed'] < 2:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()['errors'] == 1
+
+
+def test_waiter_gives_up_after_timeout():
+    flight = SingleFlight('test', timeout=0.01)
+    release = threading.Event()
+    threads, _ = run_concurrently(1, lambda: flight.do('key', release.wait, 2))
+    while flight.stats()['in_flight'] == 0:
+        pass
+    with pytest.raises(SingleFlightTimeout):
+        flight.do('key', lambda: None)
+    release.set()
+    threads[0].join()
+    assert flight.stats()['timeouts'] == 1
+
+
+def test_async_callers_share_one_call():
+    flight = AsyncSingleFlight('test', timeout=1)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'row'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', load) for _ in range(3)))
+
+    assert asyncio.run(main()) == [('row', True)] * 3
+    assert len(calls) == 1 and flight.stats()['in_flight'] == 0
+
+
+def test_cancelled_async_leader_does_not_cancel_waiters():
+    flight = AsyncSingleFlight('test', timeout=1)
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return 'row'
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do('key', load))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do('key', load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == ('row', True)
+
+
+def test_waiters_reread_after_the_leader_ran_out_of_time():
+    flight = SingleFlight('test', timeout=2)
+    release = threading.Event()
+
+    def leader_load():
+        release.wait(2)
+        raise DeadlineExceeded("tiempo del líder agotado")
+
+    def leader():
+        try:
+            return flight.do('key', leader_load)
+        except DeadlineExceeded as e:
+            return e
+
+    threads, results = run_concurrently(1, leader)
+    while flight.stats()['in_flight'] == 0:
+        pass
+    waiter = threading.Thread(target=lambda: results.append(flight.do('key', lambda: 'row')))
+    waiter.start()
+    while flight.stats()['collapsed'] == 0:
+        pass
+    release.set()
+    waiter.join()
+    threads[0].join()
+    assert isinstance(results[0], DeadlineExceeded)
+    assert results[1] == ('row', False)
+    assert flight.stats()['rereads'] == 1
+
+
+def test_waiter_wait_is_bounded_by_its_own_deadline():
+    flight = SingleFlight('test', timeout=5)
+    release = threading.Event()
+    threads, _ = run_concurrently(1, lambda: flight.do('key', release.wait, 2))
+    while flight.stats()['in_flight'] == 0:
+        pass
+    started = time.monotonic()
+    with AsyncDeadline(20) as deadline:
+        with pytest.raises(DeadlineExceeded):
+            flight.do('key', lambda: None)
+    assert deadline.exceeded and time.monotonic() - started < 1
+    release.set()
+    threads[0].join()
+
+
+@pytest.fixture
+def slow_leader(app, product, monkeypatch):
+    """
+    The first read of product blocks until a second request joins it (and
+    until release is set, with hold), then fails with leader_error
+    """
+    from services import product_service
+    from services.product_cache import get_product_cache
+    from services.single_flight import get_single_flight
+    with app.app_context():
+        get_product_cache().rows.invalidate(product['id'])
+        flight = get_single_flight()
+    read_product = product_service._read_product
+    state = {'calls': 0, 'leader_error': None, 'hold': False, 'release': threading.Event()}
+
+    def slow_read(product_id, use_primary=False, fields=None):
+        state['calls'] += 1
+        if state['calls'] == 1:
+            while flight.stats()['collapsed'] == collapsed:
+                time.sleep(0.001)
+            if state['hold']:
+                state['release'].wait(2)
+            raise state['leader_error']
+        return read_product(product_id, use_primary, fields)
+
+    collapsed = flight.stats()['collapsed']
+    monkeypatch.setattr(product_service, '_read_product', slow_read)
+    return flight, state
+
+
+def request_during_leader(client, slow_leader, path):
+    flight, state = slow_leader
+    responses = {}
+    leader = threading.Thread(target=lambda: responses.update(leader=client.get(path)))
+    leader.start()
+    while flight.stats()['in_flight'] == 0:
+        time.sleep(0.001)
+    responses['waiter'] = client.get(path)
+    state['release'].set()
+    leader.join()
+    return responses
+
+
+def test_waiter_gets_the_product_when_the_leader_hits_its_deadline(app, product, slow_leader):
+    _, state = slow_leader
+    state['leader_error'] = DeadlineExceeded("tiempo del líder agotado")
+    responses = request_during_leader(app.test_client(), slow_leader, f"/api/products/{product['id']}")
+    assert responses['waiter'].status_code == 200
+    assert responses['waiter'].get_json()['data']['id'] == product['id']
+
+
+def test_single_flight_timeout_is_a_504_not_a_404(app, product, slow_leader, monkeypatch):
+    flight, state = slow_leader
+    monkeypatch.setattr(flight, 'timeout', 0.01)
+    state['leader_error'] = ValueError("sin importancia")
+    state['hold'] = True
+    responses = request_during_leader(app.test_client(), slow_leader, f"/api/products/{product['id']}")
+    assert responses['waiter'].status_code == 504
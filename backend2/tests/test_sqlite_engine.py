@@ -0,0 +1,95 @@
+import pymysql
+import pytest
+from pymysql.constants import ER
+
+from services.deadline import AsyncDeadline, DeadlineExceeded
+from services.sqlite_engine import SQLiteSSCursor, connect, create_tables, database_uri, translate
+
+
+@pytest.fixture
+def connection():
+    connection = connect(database_uri(':memory:'))
+    with connection.cursor() as cursor:
+        create_tables(cursor)
+        cursor.execute("INSERT INTO categories (name) VALUES (%s)", ('Bicicletas',))
+        cursor.execute("INSERT INTO subcategories (name, category_id) VALUES (%s, %s)", ('Ruta', cursor.lastrowid))
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def insert_product(cursor, serial, subcategory_id=1):
+    cursor.execute(
+        "INSERT INTO products (name, subcategory_id, purchase_price, sale_price, stock, serial_number) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        ('Bicicleta', subcategory_id, 100, 150, 5, serial)
+    )
+    return cursor.lastrowid
+
+
+def test_pymysql_statements_are_translated():
+    assert translate("SELECT * FROM t WHERE a = %s AND b LIKE 'x%%'") == "SELECT * FROM t WHERE a = ? AND b LIKE 'x%'"
+    assert translate("SELECT %(name)s") == "SELECT :name"
+    assert translate("INSERT IGNORE INTO t VALUES (NOW())", False) == "INSERT OR IGNORE INTO t VALUES (CURRENT_TIMESTAMP)"
+    assert translate("SELECT id FROM t WHERE id = %s FOR UPDATE") == "SELECT id FROM t WHERE id = ?"
+
+
+def test_rows_are_dicts_with_rowcount_and_lastrowid(connection):
+    with connection.cursor() as cursor:
+        product_id = insert_product(cursor, 'SN-1')
+        assert cursor.execute("UPDATE products SET stock = stock - %s WHERE id = %s", (2, product_id)) == 1
+        cursor.execute("SELECT id, stock FROM products WHERE id = %s", [product_id])
+        assert cursor.fetchone() == {'id': product_id, 'stock': 3}
+        assert cursor.fetchone() is None
+
+
+def test_errors_are_the_pymysql_ones_services_handle(connection):
+    with connection.cursor() as cursor:
+        insert_product(cursor, 'SN-1')
+        with pytest.raises(pymysql.err.IntegrityError) as duplicate:
+            insert_product(cursor, 'SN-1')
+        assert duplicate.value.args[0] == ER.DUP_ENTRY
+        with pytest.raises(pymysql.err.IntegrityError) as missing:
+            insert_product(cursor, 'SN-2', subcategory_id=99)
+        assert missing.value.args[0] == ER.NO_REFERENCED_ROW_2
+        with pytest.raises(pymysql.err.ProgrammingError):
+            cursor.execute("SELECT * FROM no_existe")
+
+
+def test_transactions_like_autocommit_off(connection):
+    with connection.cursor() as cursor:
+        insert_product(cursor, 'SN-1')
+        connection.rollback()
+        cursor.execute("SELECT COUNT(*) AS total FROM products")
+        assert cursor.fetchone()['total'] == 0
+        insert_product(cursor, 'SN-1')
+        # begin() commits the open transaction, as in MySQL
+        connection.begin()
+        connection.rollback()
+        cursor.execute("SELECT COUNT(*) AS total FROM products")
+        assert cursor.fetchone()['total'] == 1
+
+
+def test_concat_is_null_with_a_null_argument(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT CONCAT('a', 'b') AS joined, CONCAT('a', NULL) AS empty")
+        assert cursor.fetchone() == {'joined': 'ab', 'empty': None}
+
+
+def test_unbuffered_cursor_streams_rows(connection):
+    with connection.cursor() as cursor:
+        for serial in ('SN-1', 'SN-2', 'SN-3'):
+            insert_product(cursor, serial)
+    with connection.cursor(SQLiteSSCursor) as cursor:
+        cursor.execute("SELECT serial_number FROM products ORDER BY id")
+        assert cursor.rowcount == -1
+        assert cursor.fetchmany(2) == [{'serial_number': 'SN-1'}, {'serial_number': 'SN-2'}]
+        assert cursor.fetchall() == [{'serial_number': 'SN-3'}]
+
+
+def test_statements_respect_the_request_deadline(connection):
+    with AsyncDeadline(1) as deadline:
+        deadline.at = 0
+        with connection.cursor() as cursor:
+            with pytest.raises(DeadlineExceeded):
+                cursor.execute("SELECT 1")
@@ -0,0 +1,19 @@
+from services.product_service import decrease_stock_service, get_product_by_id_service
+from services.unit_of_work import current_unit_of_work
+
+
+def test_failed_decrease_leaves_the_request_connection_usable(app, product):
+    with app.test_request_context():
+        _, error = decrease_stock_service(product['id'], 50)
+        assert error == "Stock insuficiente. Disponible: 10"
+        updated, error = decrease_stock_service(product['id'], 3)
+        assert error is None and updated['stock'] == 7
+        assert current_unit_of_work() is not None
+    with app.app_context():
+        assert get_product_by_id_service(product['id'], use_primary=True)['stock'] == 7
+
+
+def test_decrease_of_missing_product(app):
+    with app.test_request_context():
+        assert decrease_stock_service(987654, 1) == (None, "Producto no encontrado")
+
@@ -0,0 +1,47 @@
+import json
+
+import app as app_module
+
+
+def test_streamed_catalog_is_valid_json_matching_the_full_list(client, catalog, monkeypatch):
+    # Several chunks for four rows
+    monkeypatch.setattr(app_module, 'STREAM_CHUNK_ROWS', 1)
+    subcategory_id = catalog[0]['subcategory_id']
+    response = client.get(f"/api/products?stream=true&subcategory_id={subcategory_id}")
+    assert response.status_code == 200
+    assert response.is_streamed
+    body = json.loads(response.get_data(as_text=True))
+    full = client.get(f"/api/products?all=true&subcategory_id={subcategory_id}").get_json()
+    assert body == full
+    assert body['count'] == 4 and body['success'] is True
+
+
+def test_streamed_projection_and_empty_result(client, catalog):
+    subcategory_id = catalog[0]['subcategory_id']
+    body = json.loads(client.get(
+        f"/api/products?stream=true&view=summary&subcategory_id={subcategory_id}&in_stock=false"
+    ).get_data(as_text=True))
+    assert body['data'] == [{'id': catalog[1]['id'], 'name': 'Bicicleta', 'sale_price': 900, 'stock': 0}]
+    empty = json.loads(client.get(
+        f"/api/products?stream=true&subcategory_id={subcategory_id}&min_price=100000"
+    ).get_data(as_text=True))
+    assert empty == {'data': [], 'count': 0, 'success': True}
+
+
+class FailingStream:
+    closed = False
+
+    def __iter__(self):
+        yield {'id': 1, 'name': 'Casco'}
+        raise RuntimeError('conexión perdida')
+
+    def close(self):
+        self.closed = True
+
+
+def test_error_mid_stream_still_closes_the_json(client, monkeypatch):
+    stream = FailingStream()
+    monkeypatch.setattr(app_module, 'stream_all_products_service', lambda fields, filters: stream)
+    body = json.loads(client.get('/api/products?stream=true').get_data(as_text=True))
+    assert body == {'data': [{'id': 1, 'name': 'Casco'}], 'count': 1, 'success': False, 'message': 'conexión perdida'}
+    assert stream.closed
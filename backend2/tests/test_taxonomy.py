@@ -0,0 +1,72 @@
+import itertools
+import os
+import threading
+
+from services import product_service
+from services.product_service import get_categories_service, get_db_connection, get_or_create_subcategory
+
+_names = itertools.count(1)
+
+
+def unique_name(prefix):
+    return f"{prefix} {os.getpid()}-{next(_names)}"
+
+
+def count_rows(table, name):
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS total FROM {table} WHERE name = %s", (name,))
+            return cursor.fetchone()['total']
+    finally:
+        connection.close()
+
+
+def test_get_or_create_returns_the_same_subcategory(app):
+    category, subcategory = unique_name('Categoría'), unique_name('Subcategoría')
+    with app.app_context():
+        first, error = get_or_create_subcategory(category, subcategory)
+        assert error is None
+        assert get_or_create_subcategory(category, subcategory) == (first, None)
+        # The snapshot matches names the way MySQL does
+        assert get_or_create_subcategory(category.upper(), subcategory.lower()) == (first, None)
+        assert count_rows('categories', category) == 1
+        assert count_rows('subcategories', subcategory) == 1
+        tree = {row['name']: row for row in get_categories_service()}
+        assert tree[category]['subcategories'] == [{'id': first, 'name': subcategory}]
+
+
+def test_upsert_is_idempotent_without_the_snapshot(app, monkeypatch):
+    # Writers whose snapshot predates the row fall through to the upsert
+    monkeypatch.setattr(product_service, '_known_subcategory', lambda category, subcategory: (None, None))
+    category, subcategory = unique_name('Categoría'), unique_name('Subcategoría')
+    with app.app_context():
+        first, _ = get_or_create_subcategory(category, subcategory)
+        assert get_or_create_subcategory(category, subcategory) == (first, None)
+        assert count_rows('categories', category) == 1
+
+
+def test_concurrent_creators_agree_on_one_id(app):
+    category, subcategory = unique_name('Categoría'), unique_name('Subcategoría')
+    ids = []
+    start = threading.Barrier(4)
+
+    def create():
+        with app.app_context():
+            start.wait()
+            ids.append(get_or_create_subcategory(category, subcategory))
+
+    threads = [threading.Thread(target=create) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(ids) == 4 and len(set(ids)) == 1 and ids[0][1] is None
+    with app.app_context():
+        assert count_rows('subcategories', subcategory) == 1
+
+
+def test_products_with_the_same_names_share_the_taxonomy(product, catalog):
+    assert product['category_id'] == catalog[0]['category_id']
+    assert product['subcategory_id'] != catalog[0]['subcategory_id']
+    assert len({created['subcategory_id'] for created in catalog}) == 1
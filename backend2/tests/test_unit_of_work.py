@@ -0,0 +1,73 @@
+from services.product_service import get_db_connection, get_product_by_id_service
+from services.retry import commit, rollback
+from services.storage import get_storage
+from services.unit_of_work import UnitOfWork, current_unit_of_work
+
+
+def stock_of(product_id):
+    connection = get_db_connection(product_id=product_id)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT stock FROM products WHERE id = %s", (product_id,))
+            return cursor.fetchone()['stock']
+    finally:
+        connection.close()
+
+
+def set_stock(connection, product_id, stock):
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE products SET stock = %s WHERE id = %s", (stock, product_id))
+
+
+def test_service_calls_share_one_connection(app):
+    with app.test_request_context():
+        first = get_db_connection()
+        first.close()
+        second = get_db_connection()
+        assert second is first
+        assert current_unit_of_work().has_connection(first.route)
+
+
+def test_rollback_undoes_every_write_of_the_request(app, product):
+    with app.test_request_context():
+        set_stock(get_db_connection(product_id=product['id']), product['id'], 1)
+        # A second service call sees the uncommitted write: same transaction
+        assert stock_of(product['id']) == 1
+        rollback(get_db_connection(product_id=product['id']))
+        assert stock_of(product['id']) == 10
+
+
+def test_commit_is_visible_after_the_request(app, product):
+    with app.test_request_context():
+        connection = get_db_connection(product_id=product['id'])
+        set_stock(connection, product['id'], 4)
+        commit(connection)
+    with app.app_context():
+        assert stock_of(product['id']) == 4
+
+
+def test_connections_go_back_to_the_pool_at_teardown(app):
+    with app.app_context():
+        before = get_storage().pool_stats()['in_use']
+    with app.test_request_context():
+        get_db_connection()
+        with app.app_context():
+            assert get_storage().pool_stats()['in_use'] == before + 1
+    with app.app_context():
+        assert get_storage().pool_stats()['in_use'] == before
+
+
+def test_identity_map_returns_copies(app, product):
+    with app.test_request_context():
+        loaded = get_product_by_id_service(product['id'])
+        loaded['stock'] = 0
+        assert current_unit_of_work().get('product', product['id'])['stock'] == 10
+
+
+def test_no_unit_of_work_outside_a_request(app):
+    with app.app_context():
+        assert current_unit_of_work() is None
+    unit_of_work = UnitOfWork()
+    unit_of_work.remember('product', 1, {'id': 1})
+    unit_of_work.forget('product', 1)
+    assert unit_of_work.get('product', 1) is None
@@ -229,7 +229,13 @@ PRODUCT_DATA_BANK = {
 }
 
 def get_db_connection_for_seeder(app_config):
-    """Establece la conexión con la base de datos MySQL."""
+    """Establece la conexión con la base de datos (MySQL o SQLite según STORAGE_ENGINE)."""
+    if app_config.get('STORAGE_ENGINE') == 'sqlite':
+        # Ejecutar como módulo desde backend2: python -m utils.database_seeder
+        from services.sqlite_engine import connect
+        connection = connect(app_config['SQLITE_PATH'])
+        print(f"✅ Base de datos SQLite abierta: {app_config['SQLITE_PATH']}")
+        return connection
     try:
         connection = pymysql.connect(
             host=app_config['MYSQL_HOST'],
@@ -314,9 +320,18 @@ def get_pexels_image_url(search_term):
     # Seleccionar una URL basada en el hash del término de búsqueda
     return generic_urls[hash(search_term) % len(generic_urls)]
 
-def create_tables(cursor):
-    """Crea todas las tablas necesarias."""
+def create_tables(cursor, storage_engine='mysql'):
+    """
+    Crea todas las tablas necesarias.
+    Para bases existentes los cambios de esquema van también en utils/migrations.py.
+    """
     try:
+        if storage_engine == 'sqlite':
+            from services.sqlite_engine import create_tables as create_sqlite_tables
+            create_sqlite_tables(cursor)
+            print("✅ Tablas creadas correctamente")
+            return
+        
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS categories (
                 id INT AUTO_INCREMENT PRIMARY KEY,
@@ -349,9 +364,31 @@ def create_tables(cursor):
                 image_url VARCHAR(500),
                 serial_number VARCHAR(100) UNIQUE,
                 specifications JSON,
+                -- Valores de specifications como texto, para el índice FULLTEXT
+                specifications_text TEXT AS (JSON_UNQUOTE(JSON_EXTRACT(specifications, '$.*'))) STORED,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (subcategory_id) REFERENCES subcategories(id) ON DELETE CASCADE
+                FOREIGN KEY (subcategory_id) REFERENCES subcategories(id) ON DELETE CASCADE,
+                -- Filtros y ordenaciones del listado paginado (keyset sobre id)
+                INDEX idx_products_subcategory_id (subcategory_id, id),
+                INDEX idx_products_sale_price_id (sale_price, id),
+                INDEX idx_products_stock_id (stock, id),
+                INDEX idx_products_name_id (name, id),
+                -- Búsqueda de productos (SEARCH_ENGINE=database)
+                FULLTEXT INDEX ft_products_name (name),
+                FULLTEXT INDEX ft_products_search (name, description, specifications_text)
+            )
+        """)
+        
+        # Registro de cambios del bus de invalidación (INVALIDATION_TRANSPORT=database)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                version BIGINT AUTO_INCREMENT PRIMARY KEY,
+                origin VARCHAR(100) NOT NULL,
+                kind VARCHAR(20) NOT NULL,
+                entity_id INT NULL,
+                stock_only BOOLEAN NOT NULL DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
@@ -482,6 +519,9 @@ def seed_database(app_config):
             # Limpiar tablas existentes
             print("🗑️ Limpiando tablas existentes...")
             tables_to_drop = ["products", "subcategories", "categories"]
+            if app_config.get('STORAGE_ENGINE', 'mysql') == 'sqlite':
+                # Índice FTS5 de búsqueda, se reconstruye con los productos
+                tables_to_drop.insert(0, "product_search")
             for table in tables_to_drop:
                 cursor.execute(f"DROP TABLE IF EXISTS {table};")
             
@@ -490,7 +530,7 @@ def seed_database(app_config):
             
             # Crear estructura de tablas
             print("🏗️ Creando estructura de base de datos...")
-            create_tables(cursor)
+            create_tables(cursor, app_config.get('STORAGE_ENGINE', 'mysql'))
             
             # Poblar datos
             print("🌱 Poblando base de datos...")
@@ -517,7 +557,9 @@ if __name__ == "__main__":
         'MYSQL_USER': os.environ.get('MYSQL_USER', 'root'),
         'MYSQL_PASSWORD': os.environ.get('MYSQL_PASSWORD', ''),
         'MYSQL_DB': os.environ.get('MYSQL_DB', 'soa_products'),
-        'MYSQL_PORT': int(os.environ.get('MYSQL_PORT', 3306))
+        'MYSQL_PORT': int(os.environ.get('MYSQL_PORT', 3306)),
+        'STORAGE_ENGINE': os.environ.get('STORAGE_ENGINE', 'mysql'),
+        'SQLITE_PATH': os.environ.get('SQLITE_PATH', 'catalog.db')
     }
     
     print("🚀 Iniciando seeder de producción...")
@@ -0,0 +1,127 @@
+"""
+Migraciones idempotentes del esquema MySQL.
+
+El seeder crea el esquema completo, pero borra y vuelve a crear todas las
+tablas. Este script lleva una base existente (o cada shard de MYSQL_SHARDS)
+al esquema actual sin tocar los datos: cada migración comprueba antes en
+information_schema si ya está aplicada, así que se puede ejecutar siempre.
+SQLite no lo necesita: su esquema se aplica con IF NOT EXISTS al arrancar.
+
+    cd backend2 && python -m utils.migrations
+"""
+import os
+
+import pymysql
+
+from services.sharding import parse_shards
+
+INDEX_EXISTS = """
+    SELECT 1 FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    LIMIT 1
+"""
+
+COLUMN_EXISTS = """
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    LIMIT 1
+"""
+
+# (descripción, comprobación, argumentos de la comprobación, sentencia), en orden
+MIGRATIONS = (
+    # Filtros y ordenaciones del listado paginado; INPLACE no bloquea las escrituras
+    (
+        "índice idx_products_subcategory_id",
+        INDEX_EXISTS, ('products', 'idx_products_subcategory_id'),
+        "ALTER TABLE products ADD INDEX idx_products_subcategory_id (subcategory_id, id), "
+        "ALGORITHM=INPLACE, LOCK=NONE",
+    ),
+    (
+        "índice idx_products_sale_price_id",
+        INDEX_EXISTS, ('products', 'idx_products_sale_price_id'),
+        "ALTER TABLE products ADD INDEX idx_products_sale_price_id (sale_price, id), "
+        "ALGORITHM=INPLACE, LOCK=NONE",
+    ),
+    (
+        "índice idx_products_stock_id",
+        INDEX_EXISTS, ('products', 'idx_products_stock_id'),
+        "ALTER TABLE products ADD INDEX idx_products_stock_id (stock, id), "
+        "ALGORITHM=INPLACE, LOCK=NONE",
+    ),
+    (
+        "índice idx_products_name_id",
+        INDEX_EXISTS, ('products', 'idx_products_name_id'),
+        "ALTER TABLE products ADD INDEX idx_products_name_id (name, id), "
+        "ALGORITHM=INPLACE, LOCK=NONE",
+    ),
+    # Búsqueda de productos (SEARCH_ENGINE=database); la columna generada STORED copia la tabla
+    (
+        "columna specifications_text",
+        COLUMN_EXISTS, ('products', 'specifications_text'),
+        "ALTER TABLE products ADD COLUMN specifications_text TEXT "
+        "AS (JSON_UNQUOTE(JSON_EXTRACT(specifications, '$.*'))) STORED AFTER specifications",
+    ),
+    (
+        "índice FULLTEXT ft_products_name",
+        INDEX_EXISTS, ('products', 'ft_products_name'),
+        "ALTER TABLE products ADD FULLTEXT INDEX ft_products_name (name)",
+    ),
+    (
+        "índice FULLTEXT ft_products_search",
+        INDEX_EXISTS, ('products', 'ft_products_search'),
+        "ALTER TABLE products ADD FULLTEXT INDEX ft_products_search (name, description, specifications_text)",
+    ),
+)
+
+
+def migrate(connection):
+    """Aplica las migraciones pendientes en connection; devuelve cuántas se aplicaron"""
+    applied = 0
+    with connection.cursor() as cursor:
+        for description, check, args, statement in MIGRATIONS:
+            cursor.execute(check, args)
+            if cursor.fetchone():
+                continue
+            print(f"🔧 Aplicando {description}...")
+            cursor.execute(statement)
+            applied += 1
+    connection.commit()
+    return applied
+
+
+def migration_targets(config):
+    """(host, puerto, base) de la base principal, o de cada shard si hay MYSQL_SHARDS"""
+    shards = parse_shards(config.get('MYSQL_SHARDS'), config['MYSQL_PORT'], config['MYSQL_DB'])
+    return shards or [(config['MYSQL_HOST'], config['MYSQL_PORT'], config['MYSQL_DB'])]
+
+
+def migrate_all(config):
+    for host, port, database in migration_targets(config):
+        connection = pymysql.connect(
+            host=host,
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            database=database,
+            port=port,
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor
+        )
+        try:
+            applied = migrate(connection)
+            print(f"✅ {host}:{port}/{database}: {applied} migraciones aplicadas")
+        finally:
+            connection.close()
+
+
+if __name__ == "__main__":
+    config = {
+        'MYSQL_HOST': os.environ.get('MYSQL_HOST', 'localhost'),
+        'MYSQL_USER': os.environ.get('MYSQL_USER', 'root'),
+        'MYSQL_PASSWORD': os.environ.get('MYSQL_PASSWORD', ''),
+        'MYSQL_DB': os.environ.get('MYSQL_DB', 'soa_products'),
+        'MYSQL_PORT': int(os.environ.get('MYSQL_PORT', 3306)),
+        'MYSQL_SHARDS': os.environ.get('MYSQL_SHARDS', ''),
+    }
+
+    print("🚀 Migrando el esquema MySQL...")
+    migrate_all(config)
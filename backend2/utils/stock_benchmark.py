@@ -0,0 +1,170 @@
+"""
+Benchmark de contención sobre el stock de un solo producto.
+
+N clientes concurrentes descuentan stock del mismo producto y se reporta
+throughput, latencias (p50/p99) y ventas por encima del stock inicial
+(oversell). --legacy usa el flujo antiguo de leer, comprobar y escribir.
+
+Ejecutar desde backend2:
+    python -m utils.stock_benchmark --clients 32 --stock 500
+    python -m utils.stock_benchmark --engine mysql --legacy
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def legacy_decrease_stock(product_id, quantity):
+    """Flujo anterior: SELECT, comprobación en Python y UPDATE con el valor calculado"""
+    from services.product_service import get_db_connection
+
+    connection = get_db_connection(product_id=product_id)
+    if not connection:
+        return None, "Error de conexión a la base de datos"
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT stock FROM products WHERE id = %s", (product_id,))
+            product = cursor.fetchone()
+            if not product:
+                connection.rollback()
+                return None, "Producto no encontrado"
+            if product['stock'] < quantity:
+                connection.rollback()
+                return None, f"Stock insuficiente. Disponible: {product['stock']}"
+            new_stock = product['stock'] - quantity
+            cursor.execute("UPDATE products SET stock = %s WHERE id = %s", (new_stock, product_id))
+            connection.commit()
+            return {'stock': new_stock}, None
+    except Exception as e:
+        connection.rollback()
+        return None, f"Error interno: {str(e)}"
+    finally:
+        connection.close()
+
+
+def run_benchmark(app, clients, requests_per_client, initial_stock, quantity, legacy=False):
+    from services.product_service import (
+        create_product_service,
+        decrease_stock_service,
+        delete_product_service,
+        get_product_by_id_service
+    )
+
+    decrease = legacy_decrease_stock if legacy else decrease_stock_service
+
+    with app.app_context():
+        product = create_product_service({
+            'name': 'Producto benchmark de stock',
+            'category_name': 'Benchmark',
+            'subcategory_name': 'Stock',
+            'purchase_price': 1,
+            'sale_price': 2,
+            'stock': initial_stock,
+            'serial_number': f"BENCH-{uuid.uuid4().hex[:12]}",
+        })
+    if not product:
+        raise SystemExit("❌ No se pudo crear el producto de prueba")
+    product_id = product['id']
+
+    latencies = []
+    outcomes = {'ok': 0, 'insufficient': 0, 'error': 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients)
+
+    def client():
+        local_latencies = []
+        local = {'ok': 0, 'insufficient': 0, 'error': 0}
+        with app.app_context():
+            start_barrier.wait()
+            for _ in range(requests_per_client):
+                started = time.perf_counter()
+                result, error = decrease(product_id, quantity)
+                local_latencies.append(time.perf_counter() - started)
+                if result is not None:
+                    local['ok'] += 1
+                elif error and 'insuficiente' in error.lower():
+                    local['insufficient'] += 1
+                else:
+                    local['error'] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            for key, value in local.items():
+                outcomes[key] += value
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        final = get_product_by_id_service(product_id, use_primary=True)
+        delete_product_service(product_id)
+
+    sold = outcomes['ok'] * quantity
+    final_stock = final['stock'] if final else None
+    return {
+        'mode': 'legacy' if legacy else 'conditional-update',
+        'clients': clients,
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3) if latencies else 0.0,
+        'successful': outcomes['ok'],
+        'insufficient_stock': outcomes['insufficient'],
+        'errors': outcomes['error'],
+        'initial_stock': initial_stock,
+        'final_stock': final_stock,
+        # Units confirmed to buyers that the stock never accounted for (lost updates)
+        'oversell': max(0, sold - (initial_stock - final_stock)) if final_stock is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de contención de stock")
+    parser.add_argument('--engine', choices=['sqlite', 'mysql'], default=os.environ.get('STORAGE_ENGINE', 'sqlite'))
+    parser.add_argument('--sqlite-path', default=None, help="Por defecto, un archivo temporal")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help="Solicitudes por cliente")
+    parser.add_argument('--stock', type=int, default=400)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--legacy', action='store_true', help="Flujo anterior de leer y escribir")
+    args = parser.parse_args()
+
+    # La configuración de app.py se lee al importarla
+    os.environ['STORAGE_ENGINE'] = args.engine
+    if args.engine == 'sqlite':
+        os.environ['SQLITE_PATH'] = args.sqlite_path or os.path.join(
+            tempfile.mkdtemp(prefix='stock-bench-'), 'catalog.db'
+        )
+    os.environ.setdefault('MYSQL_POOL_MAX_SIZE', str(args.clients))
+
+    from app import app
+
+    print(f"🏁 Benchmark de stock: {args.clients} clientes x {args.requests} solicitudes ({args.engine})")
+    report = run_benchmark(app, args.clients, args.requests, args.stock, args.quantity, args.legacy)
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+    if report['oversell']:
+        print(f"❌ Oversell detectado: {report['oversell']} unidades")
+    else:
+        print("✅ Sin oversell")
+
+
+if __name__ == "__main__":
+    main()